@@ -1,120 +1,12 @@
 from __future__ import annotations
 
-import json
-import re
 from pathlib import Path
 
-from src.chunking import Chunk
+from src.chunking import chunk_transcript, group_responses_by_moderator, parse_speakers
 from src.coding import build_chunk_dataframe, embed_chunks
-from src.embeddings import get_embedding
-from src.openai_client import get_client
-
-
-def parse_speakers(text: str) -> list[dict]:
-    """Parse transcript into speaker-text pairs.
-
-    Args:
-        text: Full transcript text with speaker labels
-
-    Returns:
-        List of dicts with 'speaker' and 'text' keys
-
-    """
-    lines = text.split("\n")
-    speakers = []
-    current_speaker = None
-    current_text = []
-
-    for line in lines:
-        # Match speaker labels (e.g., "MODERADOR:", "FACILITADOR 1:")
-        speaker_match = re.match(r"^([A-ZÁÉÍÓÚÑ\s]+\d*):\s*(.*)$", line, re.IGNORECASE)
-
-        if speaker_match:
-            # Save previous speaker's text
-            if current_speaker and current_text:
-                speakers.append(
-                    {"speaker": current_speaker, "text": " ".join(current_text).strip()}
-                )
-
-            # Start new speaker
-            current_speaker = speaker_match.group(1).strip()
-            current_text = (
-                [speaker_match.group(2)] if speaker_match.group(2).strip() else []
-            )
-        else:
-            # Continue current speaker's text
-            if line.strip():
-                current_text.append(line.strip())
-
-    # Add last speaker
-    if current_speaker and current_text:
-        speakers.append(
-            {"speaker": current_speaker, "text": " ".join(current_text).strip()}
-        )
-
-    return speakers
-
-
-def group_responses_by_moderator(responses: list[dict]) -> list[dict]:
-    """Group facilitator responses under each moderator question.
-
-    Args:
-        responses: List of speaker-text dicts
-
-    Returns:
-        List of grouped responses with 'moderator_question', 'responses', and 'joint' keys
-
-    """
-    grouped_responses = []
-    current_moderator_turn = None
-    facilitator_responses = []
-
-    for response in responses:
-        speaker = response["speaker"].upper()
-
-        # Check if this is a moderator
-        if "MODERADOR" in speaker or speaker == "MODERATOR":
-            # If there's a current moderator turn and collected responses, add them
-            if current_moderator_turn is not None:
-                # Join facilitator responses into a single string
-                combined_facilitator_text = "\n".join(
-                    [f"{r['speaker']}: {r['text']}" for r in facilitator_responses]
-                )
-
-                # Create joint text (moderator question + responses)
-                joint_text = f"{current_moderator_turn}\n\n{combined_facilitator_text}"
-
-                grouped_responses.append(
-                    {
-                        "moderator_question": current_moderator_turn,
-                        "responses": combined_facilitator_text,
-                        "joint": joint_text,
-                    }
-                )
-
-            # Start a new moderator turn
-            current_moderator_turn = response["text"]
-            facilitator_responses = []
-        else:
-            # Collect facilitator/participant responses
-            facilitator_responses.append(response)
-
-    # Add the last moderator turn and collected responses if any
-    if current_moderator_turn is not None and facilitator_responses:
-        combined_facilitator_text = "\n".join(
-            [f"{r['speaker']}: {r['text']}" for r in facilitator_responses]
-        )
-        joint_text = f"{current_moderator_turn}\n\n{combined_facilitator_text}"
-
-        grouped_responses.append(
-            {
-                "moderator_question": current_moderator_turn,
-                "responses": combined_facilitator_text,
-                "joint": joint_text,
-            }
-        )
-
-    return grouped_responses
+from src.dedup import find_near_duplicates
+from src.embedding_matrix import EmbeddingMatrix, sidecar_path
+from src.embeddings import embedding_client, get_embedding
 
 
 def chunk_by_moderator_question(text: str) -> str:
@@ -141,30 +33,53 @@ def chunk_by_moderator_question(text: str) -> str:
     return "\n\n---\n\n".join(chunks)
 
 
-def main() -> None:
-    """Create embeddings for transcript chunks and save to CSV."""
-    client = get_client()
+def main(dedup_threshold: float | None = 0.8, source_language: bool = False) -> None:
+    """Create embeddings for transcript chunks and save to CSV.
+
+    Chunks whose text is a near-duplicate (shingle Jaccard similarity of at
+    least `dedup_threshold`) of an earlier chunk reuse its embedding; the
+    `duplicate_of` column records which chunk each one was copied from. Pass
+    `dedup_threshold=None` to embed every chunk.
+
+    With `source_language=True` the Spanish transcript is chunked and embedded
+    even if a translation exists; later stages then translate only the chunks
+    they show (see `src/translation.py`).
+
+    With `EMBEDDING_BACKEND=local` the chunks are embedded offline, without an
+    API key (see `src/embeddings.py`).
+    """
+    client = embedding_client()
 
     # Use the Spanish sample transcript (or translated English if available)
     default_inp = Path("data/sample_transcripts/sample_spanish.md")
     translated = Path("data/sample_transcripts/sample_english.md")
-    inp = translated if translated.exists() else default_inp
+    inp = translated if translated.exists() and not source_language else default_inp
 
     text = inp.read_text(encoding="utf-8")
 
     # Chunk by moderator questions (each chunk = moderator question + participant responses)
-    speakers = parse_speakers(text)
-    grouped = group_responses_by_moderator(speakers)
-    chunks = [
-        Chunk(chunk_id=i + 1, text=item["joint"])
-        for i, item in enumerate(grouped)
-        if item["joint"].strip()
-    ]
+    chunks = chunk_transcript(text)
     print(f"Chunked transcript by moderator questions: {len(chunks)} chunks")
 
     df = build_chunk_dataframe(chunks)
-
-    df = embed_chunks(client, df, text_col="text")
+    if dedup_threshold is None:
+        df["duplicate_of"] = df["chunk_id"]
+        embeddings = embed_chunks(client, df, text_col="text")
+    else:
+        groups = find_near_duplicates(chunks, threshold=dedup_threshold)
+        reps = groups.representatives(chunks)
+        print(
+            f"Near-duplicates: {groups.n_duplicates} chunks reuse the embedding "
+            f"of one of {len(reps)} representatives"
+        )
+        rep_embeddings = embed_chunks(
+            client, build_chunk_dataframe(reps), text_col="text"
+        )
+        df["duplicate_of"] = df["chunk_id"].map(groups.duplicate_of)
+        embeddings = EmbeddingMatrix(
+            vectors=rep_embeddings.take(df["duplicate_of"]).vectors,
+            chunk_ids=df["chunk_id"],
+        )
 
     # Save embeddings as JSON strings (keeps this repo lightweight and dependency-free)
     out_dir = Path("outputs")
@@ -172,8 +87,10 @@ def main() -> None:
     out_path = out_dir / "01_chunks_with_embeddings.csv"
 
     df_to_save = df.copy()
-    df_to_save["embedding"] = df_to_save["embedding"].apply(json.dumps)
+    df_to_save["embedding"] = embeddings.to_json()
     df_to_save.to_csv(out_path, index=False)
+    # ...and as a float32 matrix that later steps memory-map instead
+    embeddings.save(sidecar_path(out_path))
 
     print(f"Wrote: {out_path}")
     print("Rows:", len(df_to_save))
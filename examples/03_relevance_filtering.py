@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 
 import pandas as pd
 
-from src.coding import compute_relevance_scores
-from src.embeddings import get_embedding
+from src.embedding_matrix import read_chunk_embeddings
+from src.embeddings import embedding_client
 from src.openai_client import get_client
+from src.questions import DEFAULT_QUESTION, load_questions, score_questions
+from src.translation import translate_selected
 
 
 def split_joint_text(text: str) -> tuple[str, str]:
@@ -21,9 +22,26 @@ def split_joint_text(text: str) -> tuple[str, str]:
     return text.strip(), ""
 
 
-def main() -> None:
-    """Filter chunks by relevance to research question using embeddings."""
-    client = get_client()
+def main(
+    translate_top: int = 0,
+    questions: str | None = None,
+    threshold: float = 0.20,
+    top_k: int | None = None,
+) -> None:
+    """Filter chunks by relevance to one or many research questions.
+
+    `questions` is a questions file (see `src/questions.py`); without one, the
+    built-in sample question is used. All questions are embedded in one batch
+    and scored in one pass over the chunk matrix. Each keeps the chunks scoring
+    at least `threshold`, at most `top_k` of them, unless the file sets its
+    own values.
+
+    With `translate_top > 0`, each question's most relevant chunks are
+    translated to English on demand (cached) and shown alongside the source
+    text.
+    """
+    # Only translation needs the API when embedding locally
+    client = get_client() if translate_top > 0 else embedding_client()
 
     # Load chunk embeddings created in step 02
     inp = Path("outputs/01_chunks_with_embeddings.csv")
@@ -32,52 +50,60 @@ def main() -> None:
             "Missing outputs/01_chunks_with_embeddings.csv. Run: python examples/02_create_embeddings.py"
         )
 
-    df = pd.read_csv(inp)
-    df["embedding"] = df["embedding"].apply(json.loads)
+    df, embeddings = read_chunk_embeddings(inp)
+    qs = load_questions(Path(questions)) if questions else [DEFAULT_QUESTION]
 
-    question = "What helped facilitators integrate Bloom with Love into existing family services?"
-    q_emb = get_embedding(client, question)
-
-    df = compute_relevance_scores(df, q_emb)
-    df_sorted = df.sort_values("question_similarity", ascending=False).reset_index(
-        drop=True
+    kept = score_questions(client, embeddings, qs, threshold=threshold, top_k=top_k)
+    kept = kept.rename(columns={"score": "question_similarity"}).merge(
+        df[["chunk_id", "text"]], on="chunk_id", how="left"
     )
 
-    # Filter by relevance threshold
-    threshold = 0.20
-    kept = df_sorted[df_sorted["question_similarity"] >= threshold].copy()
-
     # Split joint text into structured columns
     kept[["moderator_question", "responses"]] = kept["text"].apply(
         lambda t: pd.Series(split_joint_text(t))
     )
 
-    print(f"Question: {question}")
-    print(f"\n{'=' * 70}")
-    print(f"TOP 5 MOST RELEVANT CHUNKS (score >= {threshold})")
-    print(f"{'=' * 70}")
-    for _, row in kept.head(5).iterrows():
-        print(
-            f"\n[chunk_id={row['chunk_id']} | score={row['question_similarity']:.3f}]"
+    if translate_top > 0:
+        kept = translate_selected(
+            client, kept, kept.loc[kept["rank"] <= translate_top, "chunk_id"]
         )
-        print(f"\nMODERATOR:\n{row['moderator_question']}")
-        print(f"\nRESPONSES:\n{row['responses']}")
-        print(f"\n{'-' * 70}")
+
+    for question, hits in kept.groupby("question", sort=False):
+        print(f"Question: {question}")
+        print(f"  Kept {len(hits)}/{len(df)} chunks.")
+        if len(qs) > 1:
+            continue
+        print(f"\n{'=' * 70}")
+        print("TOP 5 MOST RELEVANT CHUNKS")
+        print(f"{'=' * 70}")
+        for _, row in hits.head(5).iterrows():
+            print(
+                f"\n[chunk_id={row['chunk_id']} | score={row['question_similarity']:.3f}]"
+            )
+            print(f"\nMODERATOR:\n{row['moderator_question']}")
+            print(f"\nRESPONSES:\n{row['responses']}")
+            if "text_en" in row and row["text_en"] != row["text"]:
+                print(f"\nENGLISH:\n{row['text_en']}")
+            print(f"\n{'-' * 70}")
 
     out_dir = Path("outputs")
     out_dir.mkdir(exist_ok=True)
     out_path = out_dir / "02_relevant_chunks.csv"
 
-    # Save structured columns (most relevant first), drop raw embedding
+    # Save one row per (question, chunk), most relevant first; drop raw text
     cols_to_save = [
+        "question",
         "chunk_id",
         "question_similarity",
+        "rank",
         "moderator_question",
         "responses",
     ]
+    if "text_en" in kept.columns:
+        cols_to_save.append("text_en")
     kept[cols_to_save].to_csv(out_path, index=False)
 
-    print(f"\nKept {len(kept)}/{len(df)} chunks with score >= {threshold}.")
+    print(f"\nKept {len(kept)} (question, chunk) pairs for {len(qs)} question(s).")
     print(f"Wrote: {out_path}")
 
 
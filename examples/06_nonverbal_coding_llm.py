@@ -1,227 +1,48 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 
-import pandas as pd
-
-from src.llm_tasks import code_nonverbal_cues
+from src.embedding_matrix import read_chunk_embeddings
+from src.journal import ResultJournal, text_digest
+from src.lexicon import ROUTE_AUDIT, ROUTE_SKIPPED, route_chunks
+from src.llm_tasks import code_nonverbal_cues, code_nonverbal_cues_batch
 from src.openai_client import get_client
-
-
-def generate_nonverbal_html_report(df: pd.DataFrame, output_path: Path) -> None:
-    """Generate an interactive HTML report of non-verbal cue coding."""
-    total_chunks = len(df)
-    chunks_with_cues = len(df[df["any_nonverbal_cue"] == "YES"])
-
-    # Count by cue type
-    cue_type_counts = df[df["any_nonverbal_cue"] == "YES"]["cue_type"].value_counts()
-
-    html = f"""<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Códigos No Verbales - Resultados</title>
-    <style>
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            margin: 0;
-            padding: 20px;
-            background: #f5f5f5;
-            line-height: 1.6;
-        }}
-        .container {{
-            max-width: 1200px;
-            margin: 0 auto;
-            background: white;
-            padding: 30px;
-            border-radius: 8px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }}
-        h1 {{
-            color: #2c3e50;
-            border-bottom: 3px solid #e74c3c;
-            padding-bottom: 10px;
-        }}
-        h2 {{
-            color: #34495e;
-            margin-top: 30px;
-            cursor: pointer;
-            padding: 15px;
-            background: #ecf0f1;
-            border-radius: 5px;
-            user-select: none;
-        }}
-        h2:hover {{
-            background: #dfe6e9;
-        }}
-        .stats {{
-            background: #fee;
-            padding: 20px;
-            border-radius: 5px;
-            margin: 20px 0;
-            border-left: 4px solid #e74c3c;
-        }}
-        .stats-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 15px;
-            margin-top: 15px;
-        }}
-        .stat-card {{
-            background: white;
-            padding: 15px;
-            border-radius: 5px;
-            text-align: center;
-        }}
-        .stat-number {{
-            font-size: 2em;
-            font-weight: bold;
-            color: #e74c3c;
-        }}
-        .stat-label {{
-            color: #7f8c8d;
-            font-size: 0.9em;
-        }}
-        .cue-type-section {{
-            margin: 30px 0;
-        }}
-        .chunk {{
-            background: #f8f9fa;
-            border-left: 4px solid #e74c3c;
-            padding: 15px;
-            margin: 10px 0;
-            border-radius: 4px;
-        }}
-        .chunk-meta {{
-            font-size: 0.85em;
-            color: #7f8c8d;
-            margin-bottom: 8px;
-        }}
-        .cue-badge {{
-            display: inline-block;
-            background: #e74c3c;
-            color: white;
-            padding: 3px 10px;
-            border-radius: 3px;
-            font-weight: bold;
-            font-size: 0.85em;
-            margin-left: 10px;
-        }}
-        .chunk-text {{
-            color: #2c3e50;
-            white-space: pre-wrap;
-            max-height: 300px;
-            overflow-y: auto;
-            background: white;
-            padding: 10px;
-            border-radius: 3px;
-        }}
-        .no-cues {{
-            color: #95a5a6;
-            font-style: italic;
-            padding: 20px;
-            text-align: center;
-            background: #ecf0f1;
-            border-radius: 5px;
-        }}
-        .toggle-indicator {{
-            float: right;
-            font-size: 0.8em;
-            color: #7f8c8d;
-        }}
-        .cue-content {{
-            display: none;
-            margin-top: 10px;
-        }}
-        .cue-content.active {{
-            display: block;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>🎭 Análisis de Códigos No Verbales</h1>
-
-        <div class="stats">
-            <strong>Resumen General</strong>
-            <div class="stats-grid">
-                <div class="stat-card">
-                    <div class="stat-number">{total_chunks}</div>
-                    <div class="stat-label">Total chunks analizados</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-number">{chunks_with_cues}</div>
-                    <div class="stat-label">Chunks con señales no verbales</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-number">{(chunks_with_cues / total_chunks * 100 if total_chunks > 0 else 0):.1f}%</div>
-                    <div class="stat-label">Porcentaje con señales</div>
-                </div>
-            </div>
-        </div>
-"""
-
-    # Add sections by cue type
-    if len(cue_type_counts) > 0:
-        html += """
-        <h2>Tipos de Señales No Verbales</h2>
-"""
-        for idx, (cue_type, count) in enumerate(cue_type_counts.items()):
-            if not cue_type or cue_type.strip() == "":
-                continue
-
-            chunks_with_this_cue = df[df["cue_type"] == cue_type]
-
-            html += f"""
-        <h2 onclick="toggleCue('cue-{idx}')">
-            {cue_type} ({count} chunks)
-            <span class="toggle-indicator">▼ Click para expandir</span>
-        </h2>
-        <div id="cue-{idx}" class="cue-content">
-"""
-
-            for _, row in chunks_with_this_cue.iterrows():
-                chunk_text = row["text"]
-                html += f"""
-            <div class="chunk">
-                <div class="chunk-meta">
-                    Chunk ID: {row["chunk_id"]}
-                    <span class="cue-badge">{cue_type}</span>
-                </div>
-                <div class="chunk-text">{chunk_text}</div>
-            </div>
-"""
-
-            html += """
-        </div>
-"""
-    else:
-        html += """
-        <div class="no-cues">
-            No se detectaron señales no verbales en los chunks analizados.
-        </div>
-"""
-
-    html += """
-    </div>
-
-    <script>
-        function toggleCue(id) {
-            const content = document.getElementById(id);
-            content.classList.toggle('active');
-        }
-    </script>
-</body>
-</html>
-"""
-
-    output_path.write_text(html, encoding="utf-8")
-
-
-def main() -> None:
-    """Code non-verbal cues from full transcript using structured LLM output."""
+from src.prompts import NONVERBAL, NONVERBAL_BATCH, CacheStats
+from src.report import (
+    nonverbal_report_ids,
+    write_nonverbal_report,
+    write_nonverbal_report_paged,
+)
+from src.translation import translate_selected
+
+
+def main(
+    batched: bool = True,
+    max_input_tokens: int = 6000,
+    lexicon_mode: str = "audit",
+    audit_fraction: float = 0.1,
+    journal_path: str = "outputs/journal/05_nonverbal_coding.jsonl",
+    translate_output: bool = False,
+    paged_report: bool = False,
+) -> None:
+    """Code non-verbal cues from full transcript using structured LLM output.
+
+    By default several chunks are packed into each request (up to
+    `max_input_tokens`); pass `batched=False` to send one chunk per request.
+
+    A local lexicon scan first routes chunks: with `lexicon_mode="candidates"`
+    only chunks with annotations like "(risas)" or "[pausa]" go to the LLM;
+    "audit" also sends `audit_fraction` of the others; "all" sends everything.
+
+    Every coded chunk is checkpointed to `journal_path`; rerunning after an
+    interruption only sends the chunks that are not in the journal yet.
+
+    With `translate_output=True`, only the chunks with cues (the ones either
+    report shows) are translated to English.
+
+    With `paged_report=True`, the HTML report loads chunks page by page from
+    data shards instead of inlining them.
+    """
     client = get_client()
 
     # Load full chunks (not just relevant ones)
@@ -232,38 +53,114 @@ def main() -> None:
         )
 
     print(f"Reading chunks from: {inp}")
-    df = pd.read_csv(inp)
-    df["embedding"] = df["embedding"].apply(json.loads)
-
-    print(f"\nAnalyzing {len(df)} chunks for non-verbal cues...")
+    df, embeddings = read_chunk_embeddings(inp)
+
+    routes = route_chunks(
+        df["text"].tolist(), mode=lexicon_mode, audit_fraction=audit_fraction
+    )
+    df["cue_route"] = routes
+    # Only chunks with identical text are coded once: near-duplicates from step
+    # 02 may differ exactly by the annotations ("(risas)") this step looks for
+    coded_as = df.groupby("text", sort=False)["chunk_id"].transform("first")
+    routed_reps = set(coded_as[routes != ROUTE_SKIPPED])
+    to_code = df[df["chunk_id"].isin(routed_reps)]
+    print(
+        f"\nLexicon scan: {len(to_code)}/{len(df)} chunks sent to the LLM "
+        f"({(routes == ROUTE_AUDIT).sum()} of them audit samples without markers)."
+    )
+
+    print(f"\nAnalyzing {len(to_code)} chunks for non-verbal cues...")
     print("This may take a few minutes...\n")
 
-    cue_yes: list[str] = []
-    cue_type: list[str] = []
-
-    for i, row in df.iterrows():
-        if (i + 1) % 10 == 0:
-            print(f"  Processed {i + 1}/{len(df)} chunks...")
-        res = code_nonverbal_cues(client, row["text"])
-        cue_yes.append(res.get("any_cues", "NO"))
-        cue_type.append(res.get("cue_type", ""))
+    # Chunks skipped by the lexicon are coded locally as having no cues
+    results: dict[int, dict[str, str]] = {
+        int(chunk_id): {"any_cues": "NO", "cue_type": ""} for chunk_id in df["chunk_id"]
+    }
+
+    stats = CacheStats()
+    template = NONVERBAL_BATCH if batched else NONVERBAL
+    with ResultJournal(Path(journal_path)) as journal:
+        # Answers are keyed by a digest of the chunk text, so a different
+        # transcript or an edited chunk is coded again
+        coded: dict[int, dict[str, str]] = {}
+        pending: list[tuple[int, str]] = []
+        for chunk_id, text in zip(to_code["chunk_id"], to_code["text"], strict=True):
+            hit = journal.get(
+                (template.name, int(chunk_id), text_digest(text), template.version)
+            )
+            if hit is None:
+                pending.append((int(chunk_id), text))
+            else:
+                coded[int(chunk_id)] = hit
+        print(f"Resuming: {len(coded)} chunks already coded in {journal_path}")
+        if batched:
+            coded.update(
+                code_nonverbal_cues_batch(
+                    client,
+                    pending,
+                    max_input_tokens=max_input_tokens,
+                    stats=stats,
+                    journal=journal,
+                )
+            )
+        else:
+            for i, (chunk_id, text) in enumerate(pending):
+                if (i + 1) % 10 == 0:
+                    print(f"  Processed {i + 1}/{len(pending)} chunks...")
+                res = code_nonverbal_cues(client, text, stats=stats)
+                coded[chunk_id] = {
+                    "any_cues": res.get("any_cues", "NO"),
+                    "cue_type": res.get("cue_type", ""),
+                }
+                journal.record(
+                    template.name,
+                    chunk_id,
+                    coded[chunk_id],
+                    theme=text_digest(text),
+                    version=template.version,
+                )
+    results.update(coded)
+
+    coded_from = [
+        int(rep) if rep in routed_reps else int(c)
+        for c, rep in zip(df["chunk_id"], coded_as, strict=True)
+    ]
+    df["any_nonverbal_cue"] = [results[c]["any_cues"] for c in coded_from]
+    df["cue_type"] = [results[c]["cue_type"] for c in coded_from]
+
+    print("\nPrompt cache usage:")
+    print(stats.summary())
+
+    audited = df[df["cue_route"] == ROUTE_AUDIT]
+    if len(audited) > 0:
+        missed = int((audited["any_nonverbal_cue"] == "YES").sum())
+        print(
+            f"Audit: the LLM found cues in {missed}/{len(audited)} sampled "
+            "chunks without lexicon markers."
+        )
 
-    df["any_nonverbal_cue"] = cue_yes
-    df["cue_type"] = cue_type
+    text_col = "text"
+    if translate_output:
+        # Inline and paged reports show the same chunks, so this covers both
+        df = translate_selected(client, df, nonverbal_report_ids(df))
+        text_col = "text_en"
 
     out_dir = Path("outputs")
     out_dir.mkdir(exist_ok=True)
     out_path = out_dir / "05_nonverbal_coding.csv"
 
     df_to_save = df.copy()
-    df_to_save["embedding"] = df_to_save["embedding"].apply(json.dumps)
+    df_to_save["embedding"] = embeddings.align(df["chunk_id"]).to_json()
     df_to_save.to_csv(out_path, index=False)
 
     print(f"\n✅ Wrote: {out_path}")
 
     # Generate HTML report
     html_path = out_dir / "05_nonverbal_coding_report.html"
-    generate_nonverbal_html_report(df, html_path)
+    if paged_report:
+        write_nonverbal_report_paged(df, html_path, text_col=text_col)
+    else:
+        write_nonverbal_report(df, html_path, text_col=text_col)
     print(f"✅ Wrote interactive report: {html_path}")
 
     # Print summary
@@ -290,9 +187,8 @@ def main() -> None:
             print(f"\nEjemplo #{i} - Tipo: {row['cue_type']}")
             print(f"Chunk ID: {row['chunk_id']}")
             print("-" * 60)
-            preview = (
-                row["text"][:200] + "..." if len(row["text"]) > 200 else row["text"]
-            )
+            text = row[text_col]
+            preview = text[:200] + "..." if len(text) > 200 else text
             print(preview)
     else:
         print("\n⚠️  No se detectaron señales no verbales en los chunks analizados.")
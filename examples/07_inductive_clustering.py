@@ -1,17 +1,20 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 
 import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.manifold import TSNE
 
+from src.clustering import cluster_embeddings, project_2d
+from src.embedding_matrix import read_chunk_embeddings
 
-def main() -> None:
-    """Perform inductive clustering on all chunks."""
+
+def main(label_with_llm: bool = False, n_representatives: int = 5) -> None:
+    """Perform inductive clustering on all chunks.
+
+    With `label_with_llm=True`, the chunks nearest each centroid are sent to the
+    LLM to name and define each cluster, and the result is written as a codebook
+    that `load_themes` can read.
+    """
     inp = Path("outputs/01_chunks_with_embeddings.csv")
     if not inp.exists():
         raise FileNotFoundError(
@@ -19,18 +22,19 @@ def main() -> None:
         )
 
     print(f"Reading chunks from: {inp}")
-    df = pd.read_csv(inp)
-    embeddings = np.vstack(df["embedding"].apply(json.loads).apply(np.array).values)
+    df, embeddings = read_chunk_embeddings(inp)
 
-    n_clusters = min(8, len(df))
-    print(f"\nPerforming K-Means clustering with {n_clusters} clusters...")
-    kmeans = KMeans(n_clusters=n_clusters, init="k-means++", random_state=42)
-    labels = kmeans.fit_predict(embeddings)
-    df["cluster"] = labels
+    print("\nChoosing the number of clusters and running MiniBatchKMeans...")
+    result = cluster_embeddings(embeddings)
+    n_clusters = result.k
+    for k, score in sorted(result.k_scores.items()):
+        print(f"  k={k:2d}  silhouette={score:.3f}")
+    df["cluster"] = result.labels
 
     out_dir = Path("outputs")
     out_dir.mkdir(exist_ok=True)
     out_csv = out_dir / "06_clusters.csv"
+    # Embeddings stay in step 02's .npy sidecar; join on chunk_id if needed
     df.to_csv(out_csv, index=False)
 
     print(f"\n✅ Wrote: {out_csv}")
@@ -38,14 +42,7 @@ def main() -> None:
     # 2D visualization
     if len(df) >= 3:
         print("\nGenerating t-SNE visualization...")
-        tsne = TSNE(
-            n_components=2,
-            perplexity=min(30, max(2, len(df) - 1)),
-            random_state=42,
-            init="random",
-            learning_rate=200,
-        )
-        coords = tsne.fit_transform(embeddings)
+        coords = project_2d(result.reduced)
         df["x"] = coords[:, 0]
         df["y"] = coords[:, 1]
 
@@ -95,6 +92,25 @@ def main() -> None:
         print(preview)
         print()
 
+    if label_with_llm:
+        from src.cluster_labels import label_clusters, write_codebook
+        from src.openai_client import get_client
+
+        print("\n🏷️  Labelling clusters from their most central chunks...")
+        labels = label_clusters(
+            get_client(),
+            df["text"].tolist(),
+            df["chunk_id"].tolist(),
+            result,
+            n_representatives=n_representatives,
+        )
+        out_codebook = out_dir / "06_cluster_codebook.json"
+        write_codebook(labels, out_codebook)
+        for label in labels:
+            print(f"Cluster {label.cluster} ({label.size} chunks): {label.name}")
+            print(f"   {label.definition}")
+        print(f"\n✅ Wrote: {out_codebook}")
+
 
 if __name__ == "__main__":
     main()
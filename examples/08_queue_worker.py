@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+
+from src.coding import load_themes
+from src.openai_client import get_client
+from src.work_queue import (
+    TASKS,
+    WorkQueue,
+    chunk_items,
+    default_worker_id,
+    run_worker,
+    yes_no_items,
+)
+
+
+def main(
+    queue: str = "outputs/queue/coding.sqlite",
+    enqueue: str | None = None,
+    status: bool = False,
+    codebook: str = "data/themes/help_themes.json",
+    concurrency: int = 8,
+    batch_size: int = 16,
+    lease_seconds: float = 120.0,
+) -> None:
+    """Fill or drain a shared coding queue.
+
+    - `enqueue="yes_no"` adds every (chunk, theme) pair of step 02's chunks and
+      the codebook ("yes_no_vote" codes each pair by self-consistency voting,
+      see `src/voting.py`; "yes_no_cascade" escalates from a fast model only
+      when it is unsure, see `src/cascade.py`); "nonverbal" and "translate"
+      add one item per chunk.
+    - `status=True` prints queue counts and writes the finished results to
+      outputs/08_queue_<task>.csv.
+    - Otherwise a worker is started. Run as many as you like, on any machine
+      that sees the queue file; each exits when the queue is drained.
+      Rate-limited or timed-out requests are retried after a backoff without
+      counting against an item's attempts, so extra workers only fill the
+      account's rate limit.
+    """
+    q = WorkQueue(Path(queue), lease_seconds=lease_seconds)
+
+    if enqueue is not None:
+        inp = Path("outputs/01_chunks_with_embeddings.csv")
+        if not inp.exists():
+            raise FileNotFoundError(
+                "Missing outputs/01_chunks_with_embeddings.csv. Run step 02 first."
+            )
+        df = pd.read_csv(inp, usecols=["chunk_id", "text"])
+        chunks = list(zip(df["chunk_id"], df["text"], strict=True))
+        if enqueue in ("yes_no", "yes_no_vote", "yes_no_cascade"):
+            themes = load_themes(Path(codebook))
+            items = yes_no_items(
+                chunks,
+                {t.short_name: t.full_definition for t in themes},
+                task=enqueue,
+            )
+        else:
+            items = chunk_items(enqueue, chunks)
+        added = q.enqueue(items)
+        print(f"Enqueued {added} new '{enqueue}' items ({len(items) - added} existed).")
+        print(q.counts())
+        return
+
+    if status:
+        print(q.counts())
+        out_dir = Path("outputs")
+        for task in TASKS:
+            results = q.results(task)
+            if not results:
+                continue
+            rows = [
+                {"chunk_id": chunk_id, "theme": theme, **result}
+                for (chunk_id, theme), result in sorted(results.items())
+            ]
+            out_path = out_dir / f"08_queue_{task}.csv"
+            pd.DataFrame(rows).to_csv(out_path, index=False)
+            print(f"✅ Wrote {len(rows)} '{task}' results: {out_path}")
+        return
+
+    worker_id = default_worker_id()
+    print(f"Worker {worker_id} pulling from {queue}")
+    written = run_worker(
+        q,
+        get_client(),
+        worker_id=worker_id,
+        concurrency=concurrency,
+        batch_size=batch_size,
+    )
+    print(f"Worker {worker_id} wrote {written} results. Queue: {q.counts()}")
+
+
+if __name__ == "__main__":
+    main()
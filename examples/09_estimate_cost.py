@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from src.chunking import chunk_transcript
+from src.coding import load_themes
+from src.dedup import find_near_duplicates
+from src.lexicon import ROUTE_SKIPPED, route_chunks, scan_markers
+from src.openai_client import load_config
+from src.preflight import load_rates, plan_run, project, token_counter_name
+from src.questions import DEFAULT_QUESTION, load_questions
+from src.report import EXEMPLARS_PER_THEME
+
+
+def main(
+    source_language: bool = False,
+    codebook: str = "data/themes/help_themes.json",
+    questions: str | None = None,
+    dedup_threshold: float | None = 0.8,
+    lexicon_mode: str = "audit",
+    max_input_tokens: int = 6000,
+    yes_no_samples: int = 1,
+    translate_top: int = 0,
+    translate_output: bool = False,
+    concurrency: int = 8,
+    rates: str | None = None,
+) -> None:
+    """Dry run: project the calls, tokens, cost and time of a full run.
+
+    No request is sent. The transcript is chunked as step 02 would chunk it,
+    every prompt of steps 01-06 (and YES/NO coding of every chunk against the
+    codebook, as the queue worker does) is rendered and its tokens counted, and
+    the totals are projected per stage and model under `concurrency` and the
+    rate limits in `src/preflight.py` (or the JSON file `rates`).
+
+    With `source_language`, `translate_top` and `translate_output` plan the
+    on-demand translations those options of steps 03, 04 and 06 incur. Which
+    chunks they show depends on scores the dry run cannot compute, so the
+    plan takes an upper bound: every chunk carrying a transcriber annotation
+    (the likely cue examples), then the longest remaining chunks, up to
+    `translate_top` per question plus the theme exemplars.
+    """
+    cfg = load_config()
+
+    spanish = Path("data/sample_transcripts/sample_spanish.md")
+    english = Path("data/sample_transcripts/sample_english.md")
+    translate = not source_language
+    # Without a translation yet, the Spanish text stands in for its size
+    inp = english if translate and english.exists() else spanish
+    text = inp.read_text(encoding="utf-8")
+
+    # Chunk exactly as step 02 does
+    chunks = chunk_transcript(text)
+    reps = chunks
+    if dedup_threshold is not None:
+        reps = find_near_duplicates(chunks, threshold=dedup_threshold).representatives(
+            chunks
+        )
+    # Step 06 codes each distinct text, not each near-duplicate group
+    distinct = list({c.text: c for c in reversed(chunks)}.values())[::-1]
+    routes = route_chunks([c.text for c in distinct], mode=lexicon_mode)
+    nonverbal = [
+        (c.chunk_id, c.text)
+        for c, r in zip(distinct, routes, strict=True)
+        if r != ROUTE_SKIPPED
+    ]
+
+    themes = load_themes(Path(codebook))
+    if questions:
+        qs = [q.text for q in load_questions(Path(questions))]
+    else:
+        qs = [DEFAULT_QUESTION]
+
+    translated = []
+    if source_language:
+        budget = translate_top * len(qs)
+        if translate_output:
+            budget += EXEMPLARS_PER_THEME * len(themes)
+            marked = scan_markers([c.text for c in distinct])
+            translated = [c for c, m in zip(distinct, marked, strict=True) if m]
+        seen = {c.chunk_id for c in translated}
+        longest = sorted(
+            (c for c in chunks if c.chunk_id not in seen), key=lambda c: -len(c.text)
+        )
+        translated += longest[:budget]
+
+    plan = plan_run(
+        transcript=spanish.read_text(encoding="utf-8"),
+        chunks=[(c.chunk_id, c.text) for c in reps],
+        theme_definitions={t.short_name: t.full_definition for t in themes},
+        llm_model=cfg.llm_model,
+        embedding_model=(
+            cfg.embedding_model if cfg.embedding_backend == "openai" else None
+        ),
+        theme_extraction_model=cfg.theme_extraction_model,
+        theme_extraction_effort=cfg.theme_extraction_reasoning_effort,
+        nonverbal_chunks=nonverbal,
+        max_input_tokens=max_input_tokens,
+        questions=qs,
+        translate=translate,
+        yes_no_samples=yes_no_samples,
+        yes_no_chunks=[(c.chunk_id, c.text) for c in chunks],
+        translated_chunks=[(c.chunk_id, c.text) for c in translated],
+    )
+    estimate = project(
+        plan,
+        load_rates(Path(rates) if rates else None),
+        concurrency=concurrency,
+    )
+
+    print(f"Chunks: {len(chunks)} ({len(reps)} after dedup), themes: {len(themes)}")
+    print(f"Tokens counted with: {token_counter_name()}\n")
+    print(
+        estimate.to_string(
+            index=False,
+            formatters={"cost_usd": "${:,.4f}".format, "minutes": "{:,.1f}".format},
+        )
+    )
+    unknown = sorted(set(estimate.loc[estimate["cost_usd"].isna(), "model"]))
+    if unknown:
+        print(f"\nNo rates for {', '.join(unknown)}; pass a rates JSON file.")
+    print(
+        f"\nTOTAL: {estimate['calls'].sum()} calls, "
+        f"{estimate['input_tokens'].sum():,} input + "
+        f"{estimate['output_tokens'].sum():,} output tokens, "
+        f"${estimate['cost_usd'].sum():,.2f}, "
+        f"~{estimate['minutes'].sum():,.1f} min at concurrency {concurrency}"
+    )
+
+    out_dir = Path("outputs")
+    out_dir.mkdir(exist_ok=True)
+    out_path = out_dir / "00_preflight_estimate.csv"
+    estimate.to_csv(out_path, index=False)
+    print(f"\n✅ Wrote: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from src.bm25 import BM25Index, hybrid_scores, load_or_build_index, top_chunks
+from src.embedding_matrix import EmbeddingMatrix, read_chunk_embeddings
+from src.embeddings import embedding_client, get_embedding
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+def show(
+    df: pd.DataFrame,
+    index: BM25Index,
+    embeddings: EmbeddingMatrix,
+    query: str,
+    top_k: int,
+    alpha: float,
+    embed_query: bool = False,
+    client: OpenAI | None = None,
+) -> None:
+    """Score one query and print its best chunks."""
+    start = time.perf_counter()
+    query_embedding = get_embedding(client, query) if embed_query else None
+    scores = hybrid_scores(
+        index, embeddings, query, alpha=alpha, query_embedding=query_embedding
+    )
+    hits = top_chunks(index.chunk_ids, scores, top_k)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"\n🔎 {query!r}: {len(hits)} chunks in {elapsed:.1f} ms")
+    texts = df.set_index("chunk_id")["text"]
+    for hit in hits.itertuples(index=False):
+        snippet = " ".join(str(texts[hit.chunk_id]).split())[:160]
+        print(f"  {hit.rank:>3}. [chunk {hit.chunk_id} | {hit.score:.3f}]")
+        print(f"       {snippet}...")
+
+
+def main(
+    queries: list[str] | None = None,
+    top_k: int = 10,
+    alpha: float = 0.5,
+    embed_query: bool = False,
+) -> None:
+    """Answer keyword queries from the BM25 index, fused with embeddings.
+
+    The index over the step 02 chunks is built on first use and saved next to
+    the chunks CSV (see `src/bm25.py`). `alpha` weights the lexical score:
+    1.0 ranks by BM25 alone, 0.0 by embedding similarity alone. Without
+    `embed_query`, the embedding side uses the best BM25 matches as the query,
+    so no API call is made; with it, each query is embedded by the configured
+    backend.
+
+    Without `queries`, reads queries interactively until an empty line.
+    """
+    inp = Path("outputs/01_chunks_with_embeddings.csv")
+    if not inp.exists():
+        raise FileNotFoundError(
+            "Missing outputs/01_chunks_with_embeddings.csv. Run step 02 first."
+        )
+
+    df, embeddings = read_chunk_embeddings(inp)
+    start = time.perf_counter()
+    index = load_or_build_index(inp, df)
+    print(
+        f"BM25 index: {len(index)} chunks, {len(index.terms)} terms "
+        f"({(time.perf_counter() - start) * 1000:.0f} ms to load or build)"
+    )
+
+    client = embedding_client() if embed_query else None
+    if queries:
+        for query in queries:
+            show(df, index, embeddings, query, top_k, alpha, embed_query, client)
+        return
+
+    print("Enter a keyword query (empty line to quit).")
+    while True:
+        try:
+            query = input("> ").strip()
+        except EOFError:
+            break
+        if not query:
+            break
+        show(df, index, embeddings, query, top_k, alpha, embed_query, client)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,20 @@
 This package contains small, reusable helpers used by the runnable scripts in `examples/`.
 """
 
-from .openai_client import get_client, load_config
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .openai_client import get_client, load_config
 
 __all__ = ["get_client", "load_config"]
+
+
+def __getattr__(name: str) -> Any:
+    """Import the client helpers on first use so `import src` stays cheap."""
+    if name in __all__:
+        from . import openai_client
+
+        return getattr(openai_client, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,191 @@
+"""Active learning: local per-theme classifiers trained on LLM codes.
+
+For each theme, a random seed set of chunks is coded by the LLM
+(`code_yes_no_for_theme` by default), and a logistic-regression classifier is
+trained on the stored chunk embeddings. Each round:
+
+1. the classifier scores every chunk not yet coded by the LLM,
+2. chunks with P(YES) >= `confidence` or <= 1 - `confidence` are auto-coded,
+3. the `batch_size` most uncertain chunks are sent to the LLM and added to the
+   training set.
+
+The loop stops when nothing uncertain is left, when `max_rounds` is reached, or
+when the marginal gain (chunks newly auto-coded per LLM label spent in the
+round) drops below `min_gain`.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from .llm_tasks import code_yes_no_for_theme
+from .prompts import codebook_block
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+Coder = Callable[..., str]
+
+SOURCE_LLM = "llm"
+SOURCE_MODEL = "model"
+SOURCE_UNCERTAIN = "model_uncertain"
+
+
+@dataclass
+class RoundStats:
+    """Progress of one active-learning round."""
+
+    round: int
+    llm_labels: int
+    auto_coded: int
+    uncertain: int
+    gain: float
+
+
+@dataclass
+class ActiveLearningResult:
+    """Final codes for one theme.
+
+    `labels` holds 1 (YES) / 0 (NO) per chunk, `source` says whether each code
+    came from the LLM, a confident model prediction, or an uncertain one. If
+    the LLM only ever answered one way, no model could be trained: the chunks
+    it did not code are left at 0 and marked uncertain.
+    """
+
+    labels: np.ndarray
+    source: np.ndarray
+    p_yes: np.ndarray
+    rounds: list[RoundStats] = field(default_factory=list)
+
+    @property
+    def llm_calls(self) -> int:
+        """Number of chunks coded by the LLM."""
+        return int((self.source == SOURCE_LLM).sum())
+
+
+def _code_with_llm(
+    client: OpenAI,
+    texts: list[str],
+    indices: np.ndarray,
+    theme_definition: str,
+    coder: Coder,
+    max_workers: int,
+    codebook: str,
+) -> np.ndarray:
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        answers = pool.map(
+            lambda i: coder(client, texts[i], theme_definition, codebook=codebook),
+            indices,
+        )
+        return np.array([a == "YES" for a in answers], dtype=np.int8)
+
+
+def active_learning_for_theme(
+    client: OpenAI,
+    texts: list[str],
+    embeddings: np.ndarray,
+    theme_definition: str,
+    seed_size: int = 100,
+    batch_size: int = 20,
+    confidence: float = 0.9,
+    min_gain: float = 1.0,
+    max_rounds: int = 20,
+    coder: Coder = code_yes_no_for_theme,
+    max_workers: int = 8,
+    random_state: int = 42,
+    codebook: str = "",
+) -> ActiveLearningResult:
+    """Code every chunk for one theme with as few LLM calls as possible.
+
+    `embeddings` must be row-aligned with `texts`. `coder` is any function with
+    the signature of `code_yes_no_for_theme`, e.g. a cascade wrapper; it is
+    called with `codebook` as a keyword argument.
+    """
+    n = len(texts)
+    rng = np.random.default_rng(random_state)
+    labels = np.zeros(n, dtype=np.int8)
+    is_llm = np.zeros(n, dtype=bool)
+    p_yes = np.full(n, 0.5)
+    rounds: list[RoundStats] = []
+    if n == 0:
+        return ActiveLearningResult(
+            labels=labels, source=np.array([], dtype=object), p_yes=p_yes
+        )
+
+    query = rng.choice(n, size=min(seed_size, n), replace=False)
+    prev_confident = 0
+    trained = False
+    for round_no in range(1, max_rounds + 1):
+        labels[query] = _code_with_llm(
+            client, texts, query, theme_definition, coder, max_workers, codebook
+        )
+        is_llm[query] = True
+        pool = np.flatnonzero(~is_llm)
+        if len(pool) == 0:
+            break
+
+        y = labels[is_llm]
+        trained = y.min() != y.max()
+        if trained:
+            model = LogisticRegression(class_weight="balanced", max_iter=1000)
+            model.fit(embeddings[is_llm], y)
+            p_yes[pool] = model.predict_proba(embeddings[pool])[:, 1]
+            sure = (p_yes[pool] >= confidence) | (p_yes[pool] <= 1 - confidence)
+            confident = int(sure.sum())
+            order = np.argsort(np.abs(p_yes[pool] - 0.5))
+            uncertain_order = pool[order][~sure[order]]
+        else:
+            # Only one class coded so far: keep sampling at random
+            confident = 0
+            uncertain_order = rng.permutation(pool)
+
+        gain = (confident - prev_confident) / max(len(query), 1)
+        rounds.append(
+            RoundStats(
+                round=round_no,
+                llm_labels=int(is_llm.sum()),
+                auto_coded=confident,
+                uncertain=len(pool) - confident,
+                gain=gain,
+            )
+        )
+        prev_confident = confident
+        if len(uncertain_order) == 0 or (trained and round_no > 1 and gain < min_gain):
+            break
+        query = uncertain_order[:batch_size]
+
+    pool = ~is_llm
+    source = np.full(n, SOURCE_LLM, dtype=object)
+    if trained:
+        labels[pool] = (p_yes[pool] >= 0.5).astype(np.int8)
+        confident_mask = (p_yes >= confidence) | (p_yes <= 1 - confidence)
+        source[pool & confident_mask] = SOURCE_MODEL
+        source[pool & ~confident_mask] = SOURCE_UNCERTAIN
+    else:
+        source[pool] = SOURCE_UNCERTAIN
+    return ActiveLearningResult(
+        labels=labels, source=source, p_yes=p_yes, rounds=rounds
+    )
+
+
+def active_learning_sweep(
+    client: OpenAI,
+    texts: list[str],
+    embeddings: np.ndarray,
+    theme_definitions: Mapping[str, str],
+    **kwargs: Any,
+) -> dict[str, ActiveLearningResult]:
+    """Run `active_learning_for_theme` for every theme, sharing one codebook."""
+    codebook = codebook_block(theme_definitions.values())
+    return {
+        name: active_learning_for_theme(
+            client, texts, embeddings, definition, codebook=codebook, **kwargs
+        )
+        for name, definition in theme_definitions.items()
+    }
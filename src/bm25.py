@@ -0,0 +1,251 @@
+"""BM25 lexical index over chunk texts, and hybrid lexical + embedding scoring.
+
+Embedding similarity finds paraphrases but can miss exact terminology such as
+program names ("Bloom with Love", "UDS"), and scoring a new query needs an
+API call to embed it. `BM25Index` is an inverted index answering keyword
+queries in process: chunk texts are accent- and case-folded and split into
+words and word bigrams (so multi-word names also match as phrases). The
+BM25 weight of every (chunk, term) pair is computed once at build time and
+stored in a sparse column-major matrix, whose columns are the postings lists.
+A query then only reads the columns of its own terms: a few milliseconds,
+even on large corpora.
+
+The index is saved as a single `.npz` next to the chunks CSV and rebuilt by
+`load_or_build_index` when the CSV is newer or its chunks changed.
+
+`hybrid_scores` fuses BM25 with embedding similarity. Each score is min-max
+scaled per query and mixed with weight `alpha` on the lexical side. Without
+a query embedding, the centroid of the chunks BM25 ranks highest stands in
+for it (pseudo-relevance feedback), so hybrid queries need no API call
+either.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import unicodedata
+import zipfile
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .embedding_matrix import EmbeddingMatrix
+
+_WORD = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def analyze(text: str, max_ngram: int = 2) -> list[str]:
+    """Return the index terms of a text: folded words and word n-grams."""
+    words = _WORD.findall(fold(text))
+    terms = list(words)
+    for n in range(2, max_ngram + 1):
+        terms.extend(" ".join(words[i : i + n]) for i in range(len(words) - n + 1))
+    return terms
+
+
+@dataclass(frozen=True, eq=False)
+class BM25Index:
+    """Precomputed BM25 weights, one row per chunk and one column per term."""
+
+    weights: sparse.csc_array
+    terms: list[str]
+    chunk_ids: np.ndarray
+    k1: float = 1.5
+    b: float = 0.75
+    max_ngram: int = 2
+
+    @cached_property
+    def _vocab(self) -> dict[str, int]:
+        return {t: j for j, t in enumerate(self.terms)}
+
+    def __len__(self) -> int:
+        """Return the number of chunks."""
+        return len(self.chunk_ids)
+
+    @classmethod
+    def build(
+        cls,
+        chunk_ids: Iterable[int],
+        texts: Sequence[str],
+        k1: float = 1.5,
+        b: float = 0.75,
+        max_ngram: int = 2,
+    ) -> BM25Index:
+        """Index the texts.
+
+        Term frequencies are saturated by `k1` and normalized for chunk length
+        by `b`; the idf is the non-negative Lucene variant.
+        """
+        vocab: dict[str, int] = {}
+        indices: list[int] = []
+        indptr = [0]
+        for text in texts:
+            indices.extend(
+                vocab.setdefault(t, len(vocab)) for t in analyze(text, max_ngram)
+            )
+            indptr.append(len(indices))
+        counts = sparse.csr_array(
+            (
+                np.ones(len(indices), dtype=np.float32),
+                np.asarray(indices, dtype=np.int64),
+                np.asarray(indptr, dtype=np.int64),
+            ),
+            shape=(len(texts), len(vocab)),
+        )
+        counts.sum_duplicates()
+
+        n_docs = max(len(texts), 1)
+        lengths = np.diff(np.asarray(indptr)).astype(np.float32)
+        avg_length = max(float(lengths.mean()) if len(lengths) else 0.0, 1.0)
+        doc_freq = np.bincount(counts.indices, minlength=len(vocab))
+        idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+        tf = counts.data
+        rows = np.repeat(np.arange(len(texts)), np.diff(counts.indptr))
+        norm = k1 * (1 - b + b * lengths[rows] / avg_length)
+        counts.data = idf[counts.indices] * tf * (k1 + 1) / (tf + norm)
+
+        return cls(
+            weights=counts.tocsc(),
+            terms=list(vocab),
+            chunk_ids=np.fromiter((int(c) for c in chunk_ids), dtype=np.int64),
+            k1=k1,
+            b=b,
+            max_ngram=max_ngram,
+        )
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for a keyword query (0 if no term matches)."""
+        cols, counts = np.unique(
+            [
+                self._vocab[t]
+                for t in analyze(query, self.max_ngram)
+                if t in self._vocab
+            ],
+            return_counts=True,
+        )
+        if not len(cols):
+            return np.zeros(len(self), dtype=np.float32)
+        return self.weights[:, cols] @ counts.astype(np.float32)
+
+    def save(self, path: Path) -> None:
+        """Write the index to one `.npz` file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as f:
+            np.savez(
+                f,
+                data=self.weights.data,
+                indices=self.weights.indices,
+                indptr=self.weights.indptr,
+                shape=np.asarray(self.weights.shape),
+                # terms never contain newlines; one string avoids a fixed-width
+                # array padded to the longest term
+                terms=np.asarray("\n".join(self.terms)),
+                chunk_ids=self.chunk_ids,
+                params=np.asarray([self.k1, self.b, self.max_ngram], dtype=np.float64),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> BM25Index:
+        """Read an index written by `save`."""
+        with np.load(path, allow_pickle=False) as z:
+            k1, b, max_ngram = z["params"].tolist()
+            return cls(
+                weights=sparse.csc_array(
+                    (z["data"], z["indices"], z["indptr"]), shape=tuple(z["shape"])
+                ),
+                terms=str(z["terms"]).split("\n") if z["shape"][1] else [],
+                chunk_ids=z["chunk_ids"],
+                k1=k1,
+                b=b,
+                max_ngram=int(max_ngram),
+            )
+
+
+def index_path(csv_path: Path) -> Path:
+    """Return the BM25 index file saved next to a chunks CSV."""
+    return Path(csv_path).with_suffix(".bm25.npz")
+
+
+def load_or_build_index(csv_path: Path, df: pd.DataFrame) -> BM25Index:
+    """Load the index of a chunks CSV, (re)building it if stale.
+
+    `df` holds the CSV's chunk_id and text columns. The saved index is reused
+    if it is at least as new as the CSV and covers the same chunk ids.
+    """
+    path = index_path(csv_path)
+    if path.exists() and path.stat().st_mtime >= Path(csv_path).stat().st_mtime:
+        try:
+            index = BM25Index.load(path)
+        except (ValueError, KeyError, OSError, zipfile.BadZipFile):
+            pass
+        else:
+            if np.array_equal(index.chunk_ids, df["chunk_id"].to_numpy()):
+                return index
+    index = BM25Index.build(df["chunk_id"], df["text"].fillna("").tolist())
+    index.save(path)
+    return index
+
+
+def _minmax(x: np.ndarray) -> np.ndarray:
+    if not x.size:
+        return x.astype(np.float32)
+    lo, hi = float(x.min()), float(x.max())
+    if hi <= lo:
+        return np.zeros_like(x, dtype=np.float32)
+    return ((x - lo) / (hi - lo)).astype(np.float32)
+
+
+def hybrid_scores(
+    index: BM25Index,
+    embeddings: EmbeddingMatrix,
+    query: str,
+    alpha: float = 0.5,
+    query_embedding: Sequence[float] | None = None,
+    feedback: int = 5,
+) -> np.ndarray:
+    """Fuse BM25 and embedding similarity into one score per indexed chunk.
+
+    Both are min-max scaled to [0, 1]; the result is `alpha * lexical +
+    (1 - alpha) * semantic`, in the order of `index.chunk_ids`. Without
+    `query_embedding`, the semantic side is the similarity to the mean
+    embedding of the `feedback` best BM25 matches.
+    """
+    lexical = index.scores(query)
+    vectors = embeddings.align(index.chunk_ids).vectors
+    if query_embedding is None:
+        k = min(feedback, int(np.count_nonzero(lexical)))
+        if k == 0:
+            return alpha * _minmax(lexical)
+        top = np.argpartition(-lexical, k - 1)[:k]
+        centroid = vectors[top].mean(axis=0)
+        query_embedding = centroid / (np.linalg.norm(centroid) or 1.0)
+    semantic = vectors @ np.asarray(query_embedding, dtype=np.float32)
+    return alpha * _minmax(lexical) + (1 - alpha) * _minmax(semantic)
+
+
+def top_chunks(chunk_ids: np.ndarray, scores: np.ndarray, k: int = 10) -> pd.DataFrame:
+    """Return the `k` best-scoring chunks (score > 0): chunk_id, score, rank."""
+    k = min(k, int(np.count_nonzero(scores > 0)))
+    if k == 0:
+        return pd.DataFrame({"chunk_id": [], "score": [], "rank": []})
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return pd.DataFrame(
+        {"chunk_id": chunk_ids[top], "score": scores[top], "rank": np.arange(1, k + 1)}
+    )
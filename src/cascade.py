@@ -0,0 +1,200 @@
+"""Confidence-based model cascade for YES/NO theme coding.
+
+Each (chunk, theme) pair is first coded by a cheap, fast model with logprobs
+enabled. If the probability margin |P(YES) - P(NO)| clears the threshold, that
+answer is kept; otherwise the pair is escalated to the stronger model
+(`cfg.llm_model`). A small random `audit_fraction` of confident pairs can also
+be sent to the strong model to measure how often the fast tier is right above
+the threshold. Audit draws are seeded per pair, so a rerun with the same
+`seed` audits the same pairs whatever order the threads finish in.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from .llm_tasks import code_yes_no_for_theme, code_yes_no_with_logprobs
+from .openai_client import load_config
+from .prompts import CacheStats, codebook_block
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+@dataclass
+class CascadeStats:
+    """Per-tier call counts and fast/strong agreement for threshold tuning."""
+
+    fast_calls: int = 0
+    strong_calls: int = 0
+    accepted: int = 0
+    escalated: int = 0
+    audited: int = 0
+    escalated_agree: int = 0
+    audited_agree: int = 0
+    # (margin, fast answer, strong answer or None) for every pair
+    records: list[tuple[float, str, str | None]] = field(default_factory=list)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def record(
+        self, margin: float, fast: str, strong: str | None, escalated: bool
+    ) -> None:
+        """Add the outcome of one pair."""
+        with self._lock:
+            self.fast_calls += 1
+            self.records.append((margin, fast, strong))
+            if strong is not None:
+                self.strong_calls += 1
+            if escalated:
+                self.escalated += 1
+                self.escalated_agree += fast == strong
+            else:
+                self.accepted += 1
+                if strong is not None:
+                    self.audited += 1
+                    self.audited_agree += fast == strong
+
+    @property
+    def escalation_rate(self) -> float:
+        """Share of pairs that needed the strong model."""
+        return self.escalated / self.fast_calls if self.fast_calls else 0.0
+
+    def agreement_at(self, threshold: float) -> tuple[int, float]:
+        """Fast/strong agreement among compared pairs with margin >= threshold.
+
+        Returns (number of compared pairs, agreement rate).
+        """
+        compared = [
+            (fast, strong)
+            for margin, fast, strong in self.records
+            if strong is not None and margin >= threshold
+        ]
+        if not compared:
+            return 0, 0.0
+        agree = sum(fast == strong for fast, strong in compared)
+        return len(compared), agree / len(compared)
+
+    def summary(self) -> str:
+        """Human-readable counts for printing."""
+        lines = [
+            f"fast-tier calls:   {self.fast_calls}",
+            f"strong-tier calls: {self.strong_calls}",
+            f"accepted at fast tier: {self.accepted} ({1 - self.escalation_rate:.1%})",
+            f"escalated: {self.escalated} ({self.escalation_rate:.1%})",
+        ]
+        if self.escalated:
+            lines.append(
+                f"fast/strong agreement on escalated pairs: "
+                f"{self.escalated_agree / self.escalated:.1%}"
+            )
+        if self.audited:
+            lines.append(
+                f"fast/strong agreement on audited confident pairs: "
+                f"{self.audited_agree / self.audited:.1%} (n={self.audited})"
+            )
+        return "\n".join(lines)
+
+
+def code_yes_no_cascade(
+    client: OpenAI,
+    chunk_text: str,
+    theme_definition: str,
+    threshold: float = 0.8,
+    audit_fraction: float = 0.0,
+    stats: CascadeStats | None = None,
+    cache_stats: CacheStats | None = None,
+    seed: int | str | None = None,
+    codebook: str = "",
+) -> dict[str, Any]:
+    """Code one (chunk, theme) pair through the fast -> strong cascade.
+
+    `seed` makes the audit draw reproducible; None draws from fresh entropy.
+    `codebook` is passed on to both tiers.
+
+    Returns a dict with keys:
+      - answer: 'YES'|'NO' (from the strong model when it was called)
+      - tier: 'fast' or 'strong'
+      - p_yes, margin: fast-tier probabilities
+    """
+    cfg = load_config()
+    fast, p_yes, p_no = code_yes_no_with_logprobs(
+        client,
+        chunk_text,
+        theme_definition,
+        model=cfg.cascade_fast_model,
+        stats=cache_stats,
+        codebook=codebook,
+    )
+    margin = abs(p_yes - p_no)
+    escalate = fast not in ("YES", "NO") or margin < threshold
+    audit = (
+        not escalate
+        and audit_fraction > 0
+        and random.Random(seed).random() < audit_fraction
+    )
+
+    strong = None
+    if escalate or audit:
+        strong = code_yes_no_for_theme(
+            client, chunk_text, theme_definition, stats=cache_stats, codebook=codebook
+        )
+    if stats is not None:
+        stats.record(margin, fast, strong, escalated=escalate)
+
+    return {
+        "answer": strong if escalate else fast,
+        "tier": "strong" if escalate else "fast",
+        "p_yes": p_yes,
+        "margin": margin,
+    }
+
+
+def cascade_sweep(
+    client: OpenAI,
+    chunks: list[tuple[int, str]],
+    theme_definitions: Mapping[str, str],
+    threshold: float = 0.8,
+    audit_fraction: float = 0.0,
+    max_workers: int = 8,
+    stats: CascadeStats | None = None,
+    cache_stats: CacheStats | None = None,
+    seed: int = 1,
+) -> dict[tuple[int, str], dict[str, Any]]:
+    """Run the cascade over every (chunk, theme) pair, grouped by theme.
+
+    Each pair's audit draw is seeded with `seed`, its chunk id and theme name.
+
+    Returns {(chunk_id, theme_name): result of `code_yes_no_cascade`}.
+    """
+    codebook = codebook_block(theme_definitions.values())
+    pairs = [
+        (chunk_id, text, name)
+        for name in theme_definitions
+        for chunk_id, text in chunks
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(
+            lambda p: code_yes_no_cascade(
+                client,
+                p[1],
+                theme_definitions[p[2]],
+                threshold=threshold,
+                audit_fraction=audit_fraction,
+                stats=stats,
+                cache_stats=cache_stats,
+                seed=f"{seed}:{p[0]}:{p[2]}",
+                codebook=codebook,
+            ),
+            pairs,
+        )
+        return {
+            (chunk_id, name): result
+            for (chunk_id, _, name), result in zip(pairs, results, strict=True)
+        }
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import re
 from collections.abc import Iterable
 from dataclasses import dataclass
 
@@ -63,3 +64,125 @@ def make_chunks(md_text: str, min_chars: int = 300) -> list[Chunk]:
     paras = split_markdown_into_paragraphs(md_text)
     merged = merge_short_paragraphs(paras, min_chars=min_chars)
     return [Chunk(chunk_id=i + 1, text=t) for i, t in enumerate(merged)]
+
+
+def parse_speakers(text: str) -> list[dict]:
+    """Parse transcript into speaker-text pairs.
+
+    Args:
+        text: Full transcript text with speaker labels
+
+    Returns:
+        List of dicts with 'speaker' and 'text' keys
+
+    """
+    lines = text.split("\n")
+    speakers = []
+    current_speaker = None
+    current_text = []
+
+    for line in lines:
+        # Match speaker labels (e.g., "MODERADOR:", "FACILITADOR 1:")
+        speaker_match = re.match(r"^([A-ZÁÉÍÓÚÑ\s]+\d*):\s*(.*)$", line, re.IGNORECASE)
+
+        if speaker_match:
+            # Save previous speaker's text
+            if current_speaker and current_text:
+                speakers.append(
+                    {"speaker": current_speaker, "text": " ".join(current_text).strip()}
+                )
+
+            # Start new speaker
+            current_speaker = speaker_match.group(1).strip()
+            current_text = (
+                [speaker_match.group(2)] if speaker_match.group(2).strip() else []
+            )
+        else:
+            # Continue current speaker's text
+            if line.strip():
+                current_text.append(line.strip())
+
+    # Add last speaker
+    if current_speaker and current_text:
+        speakers.append(
+            {"speaker": current_speaker, "text": " ".join(current_text).strip()}
+        )
+
+    return speakers
+
+
+def group_responses_by_moderator(responses: list[dict]) -> list[dict]:
+    """Group facilitator responses under each moderator question.
+
+    Args:
+        responses: List of speaker-text dicts
+
+    Returns:
+        List of grouped responses with 'moderator_question', 'responses', and 'joint' keys
+
+    """
+    grouped_responses = []
+    current_moderator_turn = None
+    facilitator_responses = []
+
+    for response in responses:
+        speaker = response["speaker"].upper()
+
+        # Check if this is a moderator
+        if "MODERADOR" in speaker or speaker == "MODERATOR":
+            # If there's a current moderator turn and collected responses, add them
+            if current_moderator_turn is not None:
+                # Join facilitator responses into a single string
+                combined_facilitator_text = "\n".join(
+                    [f"{r['speaker']}: {r['text']}" for r in facilitator_responses]
+                )
+
+                # Create joint text (moderator question + responses)
+                joint_text = f"{current_moderator_turn}\n\n{combined_facilitator_text}"
+
+                grouped_responses.append(
+                    {
+                        "moderator_question": current_moderator_turn,
+                        "responses": combined_facilitator_text,
+                        "joint": joint_text,
+                    }
+                )
+
+            # Start a new moderator turn
+            current_moderator_turn = response["text"]
+            facilitator_responses = []
+        else:
+            # Collect facilitator/participant responses
+            facilitator_responses.append(response)
+
+    # Add the last moderator turn and collected responses if any
+    if current_moderator_turn is not None and facilitator_responses:
+        combined_facilitator_text = "\n".join(
+            [f"{r['speaker']}: {r['text']}" for r in facilitator_responses]
+        )
+        joint_text = f"{current_moderator_turn}\n\n{combined_facilitator_text}"
+
+        grouped_responses.append(
+            {
+                "moderator_question": current_moderator_turn,
+                "responses": combined_facilitator_text,
+                "joint": joint_text,
+            }
+        )
+
+    return grouped_responses
+
+
+def chunk_transcript(text: str) -> list[Chunk]:
+    """Chunk a transcript by moderator question, numbering chunks from 1.
+
+    Each chunk is a moderator question followed by all participant responses
+    (the 'joint' text of `group_responses_by_moderator`); empty ones are
+    dropped.
+    """
+    grouped = group_responses_by_moderator(parse_speakers(text))
+    return [
+        Chunk(chunk_id=i + 1, text=item["joint"])
+        for i, item in enumerate(grouped)
+        if item["joint"].strip()
+    ]
@@ -0,0 +1,411 @@
+"""Command-line entry point for the workflow stages.
+
+Usage (from the repository root):
+
+    quali translate
+    quali embed
+    quali cluster --label
+
+Each subcommand runs the `main()` of the matching script in `examples/`. Stage
+scripts, and with them pandas, scikit-learn, openai, etc., are only imported
+after a subcommand has been chosen, so `quali --help` starts instantly.
+"""
+
+from __future__ import annotations
+
+import argparse
+import runpy
+from pathlib import Path
+from typing import Any
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent / "examples"
+
+# subcommand -> (script in examples/, help text)
+STAGES: dict[str, tuple[str, str]] = {
+    "translate": (
+        "01_translate_transcript.py",
+        "Translate the Spanish sample transcript to English.",
+    ),
+    "embed": (
+        "02_create_embeddings.py",
+        "Chunk the transcript by moderator question and embed each chunk.",
+    ),
+    "filter": (
+        "03_relevance_filtering.py",
+        "Filter chunks by relevance to a research question.",
+    ),
+    "classify": (
+        "04_theme_classification_embeddings.py",
+        "Classify chunks against the codebook by embedding similarity.",
+    ),
+    "extract": (
+        "05_extract_themes_llm.py",
+        "Extract themes from the full transcript with the LLM.",
+    ),
+    "nonverbal": (
+        "06_nonverbal_coding_llm.py",
+        "Code non-verbal cues in every chunk with the LLM.",
+    ),
+    "cluster": (
+        "07_inductive_clustering.py",
+        "Cluster chunk embeddings for inductive coding.",
+    ),
+    "worker": (
+        "08_queue_worker.py",
+        "Fill, drain or inspect a shared multi-worker coding queue.",
+    ),
+    "estimate": (
+        "09_estimate_cost.py",
+        "Dry run: project calls, tokens, cost and time without calling the API.",
+    ),
+    "search": (
+        "10_keyword_search.py",
+        "Keyword search over chunks with a BM25 index fused with embeddings.",
+    ),
+}
+
+
+def load_stage(stage: str) -> dict[str, Any]:
+    """Execute a stage script's module body and return its namespace."""
+    script, _ = STAGES[stage]
+    return runpy.run_path(str(EXAMPLES_DIR / script), run_name=f"quali_{stage}")
+
+
+def run_stage(stage: str, **kwargs: Any) -> None:
+    """Run a stage's `main()` with the given keyword arguments."""
+    load_stage(stage)["main"](**kwargs)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser (imports nothing beyond the standard library)."""
+    parser = argparse.ArgumentParser(
+        prog="quali",
+        description="LLM qualitative coding workflow. Run from the repository root.",
+    )
+    sub = parser.add_subparsers(dest="stage", required=True, metavar="STAGE")
+    parsers = {
+        name: sub.add_parser(name, help=help_text, description=help_text)
+        for name, (_, help_text) in STAGES.items()
+    }
+    for stage_parser in parsers.values():
+        stage_parser.add_argument(
+            "--profile",
+            nargs="?",
+            const="outputs/profiles",
+            default=None,
+            metavar="DIR",
+            help=(
+                "Profile CPU, memory and API waits; write the bundle under DIR "
+                "(default: outputs/profiles)."
+            ),
+        )
+
+    cluster = parsers["cluster"]
+    cluster.add_argument(
+        "--label",
+        dest="label_with_llm",
+        action="store_true",
+        help="Name each cluster with the LLM and write a codebook JSON.",
+    )
+    cluster.add_argument(
+        "--representatives",
+        dest="n_representatives",
+        metavar="N",
+        type=int,
+        default=5,
+        help="Chunks nearest each centroid to send for labelling (default: 5).",
+    )
+
+    embed = parsers["embed"]
+    dedup = embed.add_mutually_exclusive_group()
+    dedup.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=0.8,
+        metavar="S",
+        help="Similarity above which chunks share one embedding (default: 0.8).",
+    )
+    dedup.add_argument(
+        "--no-dedup",
+        dest="dedup_threshold",
+        action="store_const",
+        const=None,
+        help="Embed every chunk, even near-duplicates.",
+    )
+
+    embed.add_argument(
+        "--source-language",
+        action="store_true",
+        help="Chunk and embed the Spanish source even if a translation exists.",
+    )
+
+    filt = parsers["filter"]
+    filt.add_argument(
+        "--questions",
+        metavar="PATH",
+        help="JSON list or one-per-line file of research questions to score.",
+    )
+    filt.add_argument(
+        "--threshold",
+        type=float,
+        default=0.20,
+        help="Similarity a chunk needs to be kept (default: 0.2).",
+    )
+    filt.add_argument(
+        "--top-k",
+        type=int,
+        default=None,
+        metavar="K",
+        help="Keep at most K chunks per question.",
+    )
+    filt.add_argument(
+        "--translate-top",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Translate each question's N most relevant chunks (default: 0).",
+    )
+
+    classify = parsers["classify"]
+    classify.add_argument(
+        "--top-k",
+        type=int,
+        default=3,
+        metavar="K",
+        help="Themes kept per chunk in the multi-label table (default: 3).",
+    )
+    classify.add_argument(
+        "--min-score",
+        type=float,
+        default=0.3,
+        help="Similarity a theme needs to be assigned (default: 0.3).",
+    )
+    classify.add_argument(
+        "--codebook",
+        default="data/themes/help_themes.json",
+        metavar="PATH",
+        help="Flat or hierarchical codebook JSON (default: %(default)s).",
+    )
+    classify.add_argument(
+        "--beam",
+        type=int,
+        default=2,
+        metavar="N",
+        help="Parents expanded per level in hierarchical search (default: 2).",
+    )
+    classify.add_argument(
+        "--margin",
+        type=float,
+        default=None,
+        help="Also drop parents scoring more than this below the best one.",
+    )
+
+    for stage in ("classify", "nonverbal"):
+        # The paged theme report lists every chunk, so translating only the
+        # shown ones would mean translating them all
+        report = (
+            parsers[stage].add_mutually_exclusive_group()
+            if stage == "classify"
+            else parsers[stage]
+        )
+        report.add_argument(
+            "--translate-output",
+            action="store_true",
+            help="Translate only the chunks shown in the report to English.",
+        )
+        report.add_argument(
+            "--paged-report",
+            action="store_true",
+            help="Write the HTML report as a shell with lazily loaded data pages.",
+        )
+
+    nonverbal = parsers["nonverbal"]
+    nonverbal.add_argument(
+        "--no-batch",
+        dest="batched",
+        action="store_false",
+        help="Send one chunk per request instead of packing several.",
+    )
+    nonverbal.add_argument(
+        "--max-input-tokens",
+        type=int,
+        default=6000,
+        metavar="N",
+        help="Token budget per packed request (default: 6000).",
+    )
+    nonverbal.add_argument(
+        "--lexicon",
+        dest="lexicon_mode",
+        choices=("all", "candidates", "audit"),
+        default="audit",
+        help=(
+            "Send all chunks, only chunks with cue annotations, or those plus a "
+            "sample of the rest (default: audit)."
+        ),
+    )
+    nonverbal.add_argument(
+        "--audit-fraction",
+        type=float,
+        default=0.1,
+        metavar="F",
+        help="Fraction of marker-free chunks sampled in audit mode (default: 0.1).",
+    )
+    nonverbal.add_argument(
+        "--journal",
+        dest="journal_path",
+        default="outputs/journal/05_nonverbal_coding.jsonl",
+        metavar="PATH",
+        help="Checkpoint file; chunks already in it are not re-sent.",
+    )
+
+    worker = parsers["worker"]
+    worker.add_argument(
+        "--queue",
+        default="outputs/queue/coding.sqlite",
+        metavar="PATH",
+        help="Queue database shared by all workers (default: %(default)s).",
+    )
+    mode = worker.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--enqueue",
+        choices=("yes_no", "yes_no_vote", "yes_no_cascade", "nonverbal", "translate"),
+        help="Add items for this task instead of working.",
+    )
+    mode.add_argument(
+        "--status",
+        action="store_true",
+        help="Print queue counts and export finished results.",
+    )
+    worker.add_argument(
+        "--codebook",
+        default="data/themes/help_themes.json",
+        metavar="PATH",
+        help="Codebook for --enqueue yes_no* (default: %(default)s).",
+    )
+    worker.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        metavar="N",
+        help="Concurrent requests per worker (default: 8).",
+    )
+    worker.add_argument(
+        "--batch-size",
+        type=int,
+        default=16,
+        metavar="N",
+        help="Items leased at a time (default: 16).",
+    )
+    worker.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=120.0,
+        metavar="S",
+        help="Lease length; expired items are re-dispatched (default: 120).",
+    )
+
+    estimate = parsers["estimate"]
+    estimate.add_argument(
+        "--source-language",
+        action="store_true",
+        help="Plan a run on the Spanish source, without up-front translation.",
+    )
+    estimate.add_argument(
+        "--codebook",
+        default="data/themes/help_themes.json",
+        metavar="PATH",
+        help="Codebook for YES/NO coding (default: %(default)s).",
+    )
+    estimate.add_argument(
+        "--questions",
+        metavar="PATH",
+        help="Research questions file, as for `quali filter`.",
+    )
+    estimate.add_argument(
+        "--yes-no-samples",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Samples per (chunk, theme) pair, e.g. ~2 when voting (default: 1).",
+    )
+    estimate.add_argument(
+        "--translate-top",
+        type=int,
+        default=0,
+        metavar="N",
+        help="With --source-language: plan `quali filter --translate-top N`.",
+    )
+    estimate.add_argument(
+        "--translate-output",
+        action="store_true",
+        help="With --source-language: plan classify/nonverbal --translate-output.",
+    )
+    estimate.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        metavar="N",
+        help="Concurrent requests (default: 8).",
+    )
+    estimate.add_argument(
+        "--rates",
+        metavar="PATH",
+        help="JSON file overriding per-model prices and rate limits.",
+    )
+
+    search = parsers["search"]
+    search.add_argument(
+        "queries",
+        nargs="*",
+        metavar="QUERY",
+        help="Keyword queries; without any, read them interactively.",
+    )
+    search.add_argument(
+        "--top-k",
+        type=int,
+        default=10,
+        metavar="K",
+        help="Chunks shown per query (default: 10).",
+    )
+    search.add_argument(
+        "--alpha",
+        type=float,
+        default=0.5,
+        help="Weight of BM25 vs embedding similarity, 0-1 (default: 0.5).",
+    )
+    search.add_argument(
+        "--embed-query",
+        action="store_true",
+        help="Embed each query instead of using the best BM25 matches as query.",
+    )
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Parse arguments and run the selected stage."""
+    parser = build_parser()
+    args = vars(parser.parse_args(argv))
+    stage = args.pop("stage")
+    script = EXAMPLES_DIR / STAGES[stage][0]
+    if not script.is_file():
+        parser.error(
+            f"stage script {script} not found. quali runs the scripts in "
+            "examples/ of a source checkout: install the project editable "
+            "(`just venv` or `pip install -e .`) and run it from the "
+            "repository root."
+        )
+    profile_dir = args.pop("profile")
+    if profile_dir is None:
+        run_stage(stage, **args)
+        return
+
+    from .profiling import StageProfiler
+
+    profiler = StageProfiler(stage, out_dir=Path(profile_dir))
+    with profiler:
+        run_stage(stage, **args)
+    print(profiler.report())
+
+
+if __name__ == "__main__":
+    main()
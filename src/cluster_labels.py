@@ -0,0 +1,95 @@
+"""LLM labelling of clusters from their centroid-nearest chunks.
+
+Instead of sending the whole transcript to `extract_general_themes`, only the
+few chunks closest to each cluster centroid are sent to the LLM, one request
+per cluster, run concurrently. The result is written as a codebook in the same
+format as `data/themes/help_themes.json` so it can be passed to `load_themes`.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .clustering import ClusteringResult, representative_indices
+from .llm_tasks import label_cluster
+from .prompts import CacheStats
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+@dataclass
+class ClusterLabel:
+    """LLM-assigned name and definition for one cluster."""
+
+    cluster: int
+    name: str
+    definition: str
+    size: int
+    representative_chunk_ids: list[int]
+
+
+def label_clusters(
+    client: OpenAI,
+    texts: Sequence[str],
+    chunk_ids: Sequence[int],
+    result: ClusteringResult,
+    n_representatives: int = 5,
+    max_workers: int = 8,
+    stats: CacheStats | None = None,
+) -> list[ClusterLabel]:
+    """Label every non-empty cluster from its `n_representatives` nearest chunks.
+
+    `texts` and `chunk_ids` must be aligned with the rows clustered in `result`.
+    """
+    reps = representative_indices(
+        result.reduced, result.labels, result.centroids, n=n_representatives
+    )
+    clusters = sorted(reps)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        answers = list(
+            pool.map(
+                lambda c: label_cluster(
+                    client, [texts[i] for i in reps[c]], stats=stats
+                ),
+                clusters,
+            )
+        )
+
+    sizes = {c: int((result.labels == c).sum()) for c in clusters}
+    return [
+        ClusterLabel(
+            cluster=c,
+            name=answer["name"],
+            definition=answer["definition"],
+            size=sizes[c],
+            representative_chunk_ids=[int(chunk_ids[i]) for i in reps[c]],
+        )
+        for c, answer in zip(clusters, answers, strict=True)
+    ]
+
+
+def codebook_entries(labels: list[ClusterLabel]) -> list[str]:
+    """Format labels as 'Name: definition' strings, making names unique."""
+    seen: dict[str, int] = {}
+    entries: list[str] = []
+    for label in labels:
+        name = label.name
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f"{name} ({seen[name]})"
+        entries.append(f"{name}: {label.definition}")
+    return entries
+
+
+def write_codebook(labels: list[ClusterLabel], path: Path) -> None:
+    """Write labels as a themes JSON file readable by `load_themes`."""
+    path.write_text(
+        json.dumps(codebook_entries(labels), indent=2, ensure_ascii=False) + "\n",
+        encoding="utf-8",
+    )
@@ -0,0 +1,260 @@
+"""Scalable inductive clustering of chunk embeddings.
+
+Designed to keep memory bounded for very large corpora (1M+ chunks):
+
+- PCA is fitted on a random sample and applied in batches, producing a compact
+  float32 matrix (n x n_components) that everything else works on.
+- k is chosen by fitting MiniBatchKMeans for each candidate on a sample, in
+  parallel, and comparing silhouette scores computed on a smaller sub-sample,
+  so each job's pairwise distances stay small.
+- The 2D map is computed with t-SNE on a sample only; the remaining points are
+  placed out-of-sample by distance-weighted k-nearest-neighbour regression.
+
+The input may be an `EmbeddingMatrix` or a plain array, including an
+`np.memmap`; it is only ever read in `batch_size` row slices.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import PCA
+from sklearn.manifold import TSNE
+from sklearn.metrics import silhouette_score
+from sklearn.neighbors import KNeighborsRegressor
+
+from .embedding_matrix import EmbeddingMatrix
+
+
+@dataclass
+class ClusteringResult:
+    """Output of `cluster_embeddings`."""
+
+    labels: np.ndarray
+    centroids: np.ndarray
+    reduced: np.ndarray
+    k: int
+    k_scores: dict[int, float]
+    chunk_ids: np.ndarray | None = None
+
+
+def _sample_indices(n: int, size: int, random_state: int) -> np.ndarray:
+    """Return sorted row indices for a uniform sample of at most `size` rows."""
+    if n <= size:
+        return np.arange(n)
+    rng = np.random.default_rng(random_state)
+    return np.sort(rng.choice(n, size=size, replace=False))
+
+
+def _batches(n: int, batch_size: int) -> Iterable[slice]:
+    for start in range(0, n, batch_size):
+        yield slice(start, min(start + batch_size, n))
+
+
+def _as_array(embeddings: np.ndarray | EmbeddingMatrix) -> np.ndarray:
+    if isinstance(embeddings, EmbeddingMatrix):
+        return embeddings.vectors
+    return embeddings
+
+
+def reduce_embeddings(
+    embeddings: np.ndarray | EmbeddingMatrix,
+    n_components: int = 50,
+    sample_size: int = 20_000,
+    batch_size: int = 10_000,
+    random_state: int = 42,
+) -> np.ndarray:
+    """Project embeddings onto their top principal components as float32.
+
+    PCA is fitted on at most `sample_size` rows; the full matrix is then
+    transformed `batch_size` rows at a time.
+    """
+    embeddings = _as_array(embeddings)
+    n, dim = embeddings.shape
+    idx = _sample_indices(n, sample_size, random_state)
+    sample = np.asarray(embeddings[idx], dtype=np.float32)
+    n_components = min(n_components, len(idx), dim)
+
+    pca = PCA(n_components=n_components, random_state=random_state)
+    pca.fit(sample)
+
+    reduced = np.empty((n, n_components), dtype=np.float32)
+    for rows in _batches(n, batch_size):
+        batch = np.asarray(embeddings[rows], dtype=np.float32)
+        reduced[rows] = pca.transform(batch)
+    return reduced
+
+
+def _silhouette_for_k(
+    sample: np.ndarray,
+    k: int,
+    batch_size: int,
+    silhouette_size: int,
+    random_state: int,
+) -> tuple[int, float]:
+    model = MiniBatchKMeans(
+        n_clusters=k, batch_size=batch_size, n_init=3, random_state=random_state
+    )
+    labels = model.fit_predict(sample)
+    if len(np.unique(labels)) < 2:
+        return k, -1.0
+    score = silhouette_score(
+        sample,
+        labels,
+        sample_size=min(silhouette_size, len(sample)),
+        random_state=random_state,
+    )
+    return k, float(score)
+
+
+def choose_k(
+    reduced: np.ndarray,
+    candidates: Iterable[int] = range(4, 21, 2),
+    sample_size: int = 10_000,
+    batch_size: int = 4096,
+    n_jobs: int = -1,
+    random_state: int = 42,
+    silhouette_size: int = 2_000,
+) -> tuple[int, dict[int, float]]:
+    """Pick the number of clusters with the best silhouette score on a sample.
+
+    Candidates are fitted on at most `sample_size` rows and evaluated in
+    parallel with joblib; each silhouette score uses at most `silhouette_size`
+    of those rows, so memory per job does not grow with the sample. Returns the
+    chosen k and the score of every candidate that could be evaluated.
+    """
+    idx = _sample_indices(len(reduced), sample_size, random_state)
+    sample = reduced[idx]
+    valid = [k for k in candidates if 2 <= k < len(sample)]
+    if not valid:
+        return max(1, min(len(sample) - 1, 2)), {}
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_silhouette_for_k)(sample, k, batch_size, silhouette_size, random_state)
+        for k in valid
+    )
+    scores = dict(results)
+    best_k = max(scores, key=scores.__getitem__)
+    return best_k, scores
+
+
+def fit_clusters(
+    reduced: np.ndarray,
+    k: int,
+    batch_size: int = 4096,
+    random_state: int = 42,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Fit MiniBatchKMeans and return (labels, centroids) in the reduced space."""
+    model = MiniBatchKMeans(
+        n_clusters=k, batch_size=batch_size, n_init=3, random_state=random_state
+    )
+    model.fit(reduced)
+
+    labels = np.empty(len(reduced), dtype=np.int32)
+    for rows in _batches(len(reduced), batch_size * 16):
+        labels[rows] = model.predict(reduced[rows])
+    return labels, model.cluster_centers_.astype(np.float32)
+
+
+def cluster_embeddings(
+    embeddings: np.ndarray | EmbeddingMatrix,
+    k: int | None = None,
+    candidates: Iterable[int] = range(4, 21, 2),
+    n_components: int = 50,
+    n_jobs: int = -1,
+    random_state: int = 42,
+) -> ClusteringResult:
+    """Reduce, choose k (unless given) and cluster an embedding matrix.
+
+    For an `EmbeddingMatrix`, the result carries its `chunk_ids`.
+    """
+    reduced = reduce_embeddings(
+        embeddings, n_components=n_components, random_state=random_state
+    )
+    k_scores: dict[int, float] = {}
+    if k is None:
+        k, k_scores = choose_k(
+            reduced, candidates=candidates, n_jobs=n_jobs, random_state=random_state
+        )
+    k = max(1, min(k, len(reduced)))
+    labels, centroids = fit_clusters(reduced, k, random_state=random_state)
+    return ClusteringResult(
+        labels=labels,
+        centroids=centroids,
+        reduced=reduced,
+        k=k,
+        k_scores=k_scores,
+        chunk_ids=(
+            embeddings.chunk_ids if isinstance(embeddings, EmbeddingMatrix) else None
+        ),
+    )
+
+
+def project_2d(
+    reduced: np.ndarray,
+    sample_size: int = 5_000,
+    n_neighbors: int = 10,
+    batch_size: int = 50_000,
+    random_state: int = 42,
+) -> np.ndarray:
+    """Compute 2D coordinates for plotting.
+
+    t-SNE runs on at most `sample_size` points; every other point is placed at
+    the distance-weighted mean of its nearest sampled neighbours' coordinates.
+    """
+    n = len(reduced)
+    coords = np.empty((n, 2), dtype=np.float32)
+    idx = _sample_indices(n, sample_size, random_state)
+    sample = reduced[idx]
+
+    tsne = TSNE(
+        n_components=2,
+        perplexity=min(30, max(2, len(idx) - 1)),
+        random_state=random_state,
+        init="pca",
+        learning_rate="auto",
+    )
+    coords[idx] = tsne.fit_transform(sample)
+    if len(idx) == n:
+        return coords
+
+    knn = KNeighborsRegressor(
+        n_neighbors=min(n_neighbors, len(idx)), weights="distance"
+    )
+    knn.fit(sample, coords[idx])
+    in_sample = np.zeros(n, dtype=bool)
+    in_sample[idx] = True
+    for rows in _batches(n, batch_size):
+        mask = ~in_sample[rows]
+        if mask.any():
+            positions = np.arange(rows.start, rows.stop)[mask]
+            coords[positions] = knn.predict(reduced[positions])
+    return coords
+
+
+def representative_indices(
+    reduced: np.ndarray,
+    labels: np.ndarray,
+    centroids: np.ndarray,
+    n: int = 5,
+) -> dict[int, np.ndarray]:
+    """Return the row indices of the `n` points nearest each cluster centroid.
+
+    Indices within each cluster are ordered nearest first.
+    """
+    reps: dict[int, np.ndarray] = {}
+    for cluster, centroid in enumerate(centroids):
+        members = np.flatnonzero(labels == cluster)
+        if len(members) == 0:
+            continue
+        dist = np.linalg.norm(reduced[members] - centroid, axis=1)
+        if len(members) > n:
+            nearest = np.argpartition(dist, n - 1)[:n]
+        else:
+            nearest = np.arange(len(members))
+        reps[cluster] = members[nearest[np.argsort(dist[nearest])]]
+    return reps
@@ -0,0 +1,179 @@
+"""Compiled codebook artifacts loaded by memory map.
+
+`compile_codebook` embeds every leaf theme of a (flat or hierarchical)
+codebook JSON once and writes a single binary file:
+
+    b"QCODEBK1" | uint64 header length | JSON header | padding | float32 matrix
+
+The header holds the theme names and definitions, the embedding model, the
+matrix shape and the SHA-256 of the source JSON. The matrix rows are
+L2-normalized and start at a 64-byte aligned offset, so `load_codebook_artifact`
+maps them with `np.memmap` without reading or copying them.
+
+`load_or_compile_codebook` reuses an existing artifact only if its source hash
+and embedding model still match, and recompiles it otherwise.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from .coding import Theme, embed_themes
+from .embeddings import get_backend
+from .hierarchy import iter_leaves, parse_codebook
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+MAGIC = b"QCODEBK1"
+FORMAT_VERSION = 1
+_ALIGN = 64
+_LENGTH = struct.Struct("<Q")
+
+
+@dataclass(frozen=True)
+class CompiledCodebook:
+    """Leaf themes of a codebook with their embeddings as one float32 matrix."""
+
+    path: Path
+    names: list[str]
+    definitions: list[str]
+    matrix: np.ndarray  # (n_themes, dim), read-only memmap
+    model: str
+    source_hash: str
+
+    @property
+    def dim(self) -> int:
+        """Embedding dimension."""
+        return self.matrix.shape[1]
+
+    def themes(self) -> list[Theme]:
+        """Return the themes as `Theme` objects with list embeddings."""
+        return [
+            Theme(short_name=name, full_definition=definition, embedding=row.tolist())
+            for name, definition, row in zip(
+                self.names, self.definitions, self.matrix, strict=True
+            )
+        ]
+
+
+def source_hash(json_path: Path) -> str:
+    """SHA-256 of the codebook JSON file's bytes."""
+    return hashlib.sha256(json_path.read_bytes()).hexdigest()
+
+
+def default_artifact_path(json_path: Path) -> Path:
+    """Return where the compiled artifact for a codebook JSON is kept by default."""
+    return Path("outputs") / "codebooks" / f"{json_path.stem}.codebook"
+
+
+def write_codebook_artifact(
+    path: Path,
+    themes: list[Theme],
+    model: str,
+    source: str,
+) -> None:
+    """Write embedded themes as a compiled artifact (atomically)."""
+    matrix = np.asarray([t.embedding for t in themes], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+
+    header = json.dumps(
+        {
+            "format_version": FORMAT_VERSION,
+            "model": model,
+            "source_hash": source,
+            "shape": list(matrix.shape),
+            "dtype": "<f4",
+            "names": [t.short_name for t in themes],
+            "definitions": [t.full_definition for t in themes],
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    prefix_len = len(MAGIC) + _LENGTH.size + len(header)
+    padding = b" " * (-prefix_len % _ALIGN)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(MAGIC)
+        f.write(_LENGTH.pack(len(header) + len(padding)))
+        f.write(header + padding)
+        f.write(matrix.astype("<f4").tobytes())
+    os.replace(tmp, path)
+
+
+def _read_header(path: Path) -> tuple[dict[str, Any], int]:
+    with path.open("rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a compiled codebook.")
+        try:
+            (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+        except struct.error as e:
+            raise ValueError(f"{path} is truncated.") from e
+        header = json.loads(f.read(length))
+    return header, len(MAGIC) + _LENGTH.size + length
+
+
+def load_codebook_artifact(path: Path) -> CompiledCodebook:
+    """Map a compiled codebook; the matrix is not read until it is used."""
+    header, offset = _read_header(path)
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{path} has unsupported format version.")
+    n, dim = header["shape"]
+    matrix = np.memmap(path, dtype="<f4", mode="r", offset=offset, shape=(n, dim))
+    return CompiledCodebook(
+        path=path,
+        names=header["names"],
+        definitions=header["definitions"],
+        matrix=matrix,
+        model=header["model"],
+        source_hash=header["source_hash"],
+    )
+
+
+def compile_codebook(
+    client: OpenAI | None, json_path: Path, artifact_path: Path | None = None
+) -> CompiledCodebook:
+    """Embed the leaf themes of a codebook JSON and write its artifact."""
+    artifact_path = artifact_path or default_artifact_path(json_path)
+    raw = json_path.read_bytes()
+    leaves = list(iter_leaves(parse_codebook(json.loads(raw))))
+    write_codebook_artifact(
+        artifact_path,
+        embed_themes(client, leaves),
+        model=get_backend(client).model,
+        source=hashlib.sha256(raw).hexdigest(),
+    )
+    return load_codebook_artifact(artifact_path)
+
+
+def load_or_compile_codebook(
+    client: OpenAI | None, json_path: Path, artifact_path: Path | None = None
+) -> CompiledCodebook:
+    """Load the compiled artifact for a codebook, recompiling it if stale.
+
+    The artifact is stale if it is missing or unreadable, or if the JSON file
+    or the configured embedding model changed since it was compiled.
+    """
+    artifact_path = artifact_path or default_artifact_path(json_path)
+    if artifact_path.exists():
+        try:
+            compiled = load_codebook_artifact(artifact_path)
+        except (ValueError, KeyError, OSError):
+            pass
+        else:
+            if (
+                compiled.source_hash == source_hash(json_path)
+                and compiled.model == get_backend(client).model
+            ):
+                return compiled
+    return compile_codebook(client, json_path, artifact_path)
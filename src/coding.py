@@ -3,14 +3,16 @@ from __future__ import annotations
 import json
 from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import pandas as pd
-from openai import OpenAI
-from tqdm import tqdm
 
 from .chunking import Chunk
-from .embeddings import get_embedding
-from .similarity import dot_similarity
+from .embedding_matrix import EmbeddingMatrix
+from .embeddings import get_embeddings
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 
 @dataclass
@@ -27,14 +29,16 @@ def load_markdown(path: Path) -> str:
     return path.read_text(encoding="utf-8")
 
 
+def parse_theme(item: str) -> Theme:
+    """Parse a 'Name: definition' codebook entry into a Theme."""
+    short = item.split(":")[0].strip() if ":" in item else item[:40].strip()
+    return Theme(short_name=short, full_definition=item)
+
+
 def load_themes(path: Path) -> list[Theme]:
     """Load themes from JSON file and parse into Theme objects."""
     data = json.loads(path.read_text(encoding="utf-8"))
-    themes: list[Theme] = []
-    for item in data:
-        short = item.split(":")[0].strip() if ":" in item else item[:40].strip()
-        themes.append(Theme(short_name=short, full_definition=item))
-    return themes
+    return [parse_theme(item) for item in data]
 
 
 def build_chunk_dataframe(chunks: list[Chunk]) -> pd.DataFrame:
@@ -43,25 +47,32 @@ def build_chunk_dataframe(chunks: list[Chunk]) -> pd.DataFrame:
 
 
 def embed_chunks(
-    client: OpenAI, df: pd.DataFrame, text_col: str = "text"
-) -> pd.DataFrame:
-    """Generate embeddings for text chunks in DataFrame."""
-    embeddings: list[list[float]] = []
-    for text in tqdm(df[text_col].tolist(), desc="Embedding chunks"):
-        embeddings.append(get_embedding(client, text))
-    df = df.copy()
-    df["embedding"] = embeddings
-    return df
+    client: OpenAI | None, df: pd.DataFrame, text_col: str = "text"
+) -> EmbeddingMatrix:
+    """Generate embeddings for text chunks, one matrix row per DataFrame row.
+
+    Texts are embedded in batches by the configured backend; `client` may be
+    None for the local backend.
+    """
+    vectors = get_embeddings(client, df[text_col].tolist())
+    return EmbeddingMatrix(vectors=vectors, chunk_ids=df["chunk_id"])
 
 
 def compute_relevance_scores(
-    df: pd.DataFrame, question_embedding: list[float]
+    df: pd.DataFrame,
+    question_embedding: list[float],
+    embeddings: EmbeddingMatrix | None = None,
 ) -> pd.DataFrame:
-    """Compute similarity scores between chunks and a question embedding."""
+    """Compute similarity scores between chunks and a question embedding.
+
+    `embeddings` defaults to the DataFrame's "embedding" column.
+    """
+    if embeddings is None:
+        embeddings = EmbeddingMatrix.from_frame(df)
     df = df.copy()
-    df["question_similarity"] = [
-        dot_similarity(e, question_embedding) for e in df["embedding"]
-    ]
+    df["question_similarity"] = embeddings.align(df["chunk_id"]).scores(
+        question_embedding
+    )
     return df
 
 
@@ -74,27 +85,38 @@ def filter_relevant(df: pd.DataFrame, threshold: float = 0.20) -> pd.DataFrame:
     )
 
 
-def embed_themes(client: OpenAI, themes: list[Theme]) -> list[Theme]:
-    """Generate embeddings for theme definitions."""
-    out: list[Theme] = []
-    for t in tqdm(themes, desc="Embedding themes"):
-        emb = get_embedding(client, t.full_definition)
-        out.append(
-            Theme(
-                short_name=t.short_name,
-                full_definition=t.full_definition,
-                embedding=emb,
-            )
+def embed_themes(client: OpenAI | None, themes: list[Theme]) -> list[Theme]:
+    """Generate embeddings for theme definitions, in one batch."""
+    matrix = get_embeddings(client, [t.full_definition for t in themes])
+    return [
+        Theme(
+            short_name=t.short_name,
+            full_definition=t.full_definition,
+            embedding=row.tolist(),
         )
-    return out
+        for t, row in zip(themes, matrix, strict=True)
+    ]
 
 
-def add_theme_similarity_columns(df: pd.DataFrame, themes: list[Theme]) -> pd.DataFrame:
-    """Add similarity score columns for each theme to DataFrame."""
-    df = df.copy()
+def add_theme_similarity_columns(
+    df: pd.DataFrame,
+    themes: list[Theme],
+    embeddings: EmbeddingMatrix | None = None,
+) -> pd.DataFrame:
+    """Add similarity score columns for each theme to DataFrame.
+
+    `embeddings` defaults to the DataFrame's "embedding" column.
+    """
+    if embeddings is None:
+        embeddings = EmbeddingMatrix.from_frame(df)
+    theme_matrix = []
     for t in themes:
         assert t.embedding is not None
-        df[t.short_name] = [dot_similarity(e, t.embedding) for e in df["embedding"]]
+        theme_matrix.append(t.embedding)
+    scores = embeddings.align(df["chunk_id"]).scores(theme_matrix)
+    df = df.copy()
+    for j, t in enumerate(themes):
+        df[t.short_name] = scores[:, j]
     return df
 
 
@@ -0,0 +1,135 @@
+"""Polars lazy backend for the embedding-based coding steps.
+
+The functions mirror `src/coding.py` but take and return `pl.LazyFrame`s. Each
+step only appends expressions to the query plan, so chaining them, e.g.
+
+    lf = (
+        scan_embeddings_csv(path)
+        .pipe(compute_relevance_scores, q_emb)
+        .pipe(filter_relevant, 0.20)
+        .pipe(add_theme_similarity_columns, themes)
+        .pipe(classify_by_max_theme, theme_cols)
+    )
+
+is optimized and executed in a single pass on `collect()`, without the
+intermediate frame copies of the pandas version. Embeddings are stored as a
+fixed-size `pl.Array(pl.Float32, dim)` column.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from .chunking import Chunk
+from .coding import Theme
+from .embeddings import get_embeddings
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+EMBEDDING_COL = "embedding"
+
+
+def _embedding_dim(lf: pl.LazyFrame) -> int:
+    """Return the width of the fixed-size embedding column."""
+    dtype = lf.collect_schema()[EMBEDDING_COL]
+    if not isinstance(dtype, pl.Array):
+        raise TypeError(
+            f"'{EMBEDDING_COL}' must be a fixed-size pl.Array column, got {dtype}."
+        )
+    return dtype.size
+
+
+def _vector_literal(vector: list[float], dim: int) -> pl.Expr:
+    """Wrap a single vector as an array literal that broadcasts over rows."""
+    if len(vector) != dim:
+        raise ValueError(f"Vector has {len(vector)} dimensions, embeddings have {dim}.")
+    return pl.lit(
+        pl.Series(
+            [np.asarray(vector, dtype=np.float32)], dtype=pl.Array(pl.Float32, dim)
+        )
+    )
+
+
+def _dot(vector: list[float], dim: int) -> pl.Expr:
+    """Expression for the dot product of each row's embedding with `vector`."""
+    return (pl.col(EMBEDDING_COL) * _vector_literal(vector, dim)).arr.sum()
+
+
+def build_chunk_lazyframe(chunks: list[Chunk]) -> pl.LazyFrame:
+    """Convert list of Chunk objects to a Polars LazyFrame."""
+    return pl.LazyFrame(
+        {"chunk_id": [c.chunk_id for c in chunks], "text": [c.text for c in chunks]}
+    )
+
+
+def from_pandas(df: pd.DataFrame) -> pl.LazyFrame:
+    """Convert a pandas frame with a list-of-floats embedding column."""
+    lf = pl.from_pandas(df.drop(columns=[EMBEDDING_COL])).lazy()
+    matrix = np.vstack(df[EMBEDDING_COL].to_numpy()).astype(np.float32)
+    return lf.with_columns(pl.Series(EMBEDDING_COL, matrix))
+
+
+def scan_embeddings_csv(path: Path) -> pl.LazyFrame:
+    """Lazily scan a CSV written by step 02 (embeddings stored as JSON strings)."""
+    first = pl.read_csv(path, n_rows=1)
+    dim = len(first[EMBEDDING_COL].str.json_decode(pl.List(pl.Float32))[0])
+    return pl.scan_csv(path).with_columns(
+        pl.col(EMBEDDING_COL).str.json_decode(pl.List(pl.Float32)).list.to_array(dim)
+    )
+
+
+def embed_chunks(
+    client: OpenAI | None, lf: pl.LazyFrame, text_col: str = "text"
+) -> pl.LazyFrame:
+    """Generate embeddings for text chunks and attach them as an array column.
+
+    Embedding forces one materialization of the input; the embeddings are
+    then appended column-wise without copying the existing columns.
+    """
+    df = lf.collect()
+    matrix = get_embeddings(client, df[text_col].to_list())
+    return df.with_columns(pl.Series(EMBEDDING_COL, matrix)).lazy()
+
+
+def compute_relevance_scores(
+    lf: pl.LazyFrame,
+    question_embedding: list[float],
+    out_col: str = "question_similarity",
+) -> pl.LazyFrame:
+    """Add the similarity between each chunk and a question embedding."""
+    return lf.with_columns(_dot(question_embedding, _embedding_dim(lf)).alias(out_col))
+
+
+def filter_relevant(
+    lf: pl.LazyFrame,
+    threshold: float = 0.20,
+    score_col: str = "question_similarity",
+) -> pl.LazyFrame:
+    """Keep only chunks above the relevance threshold, most relevant first."""
+    return lf.filter(pl.col(score_col) >= threshold).sort(score_col, descending=True)
+
+
+def add_theme_similarity_columns(lf: pl.LazyFrame, themes: list[Theme]) -> pl.LazyFrame:
+    """Add one similarity score column per theme."""
+    dim = _embedding_dim(lf)
+    exprs = []
+    for t in themes:
+        assert t.embedding is not None
+        exprs.append(_dot(t.embedding, dim).alias(t.short_name))
+    return lf.with_columns(exprs)
+
+
+def classify_by_max_theme(
+    lf: pl.LazyFrame, theme_columns: list[str], out_col: str = "most_similar_theme"
+) -> pl.LazyFrame:
+    """Classify chunks by the theme with highest similarity score."""
+    names = pl.Series(theme_columns, dtype=pl.String)
+    # pl.concat_arr (still marked unstable) first shipped in polars 1.15
+    best = pl.concat_arr(theme_columns).arr.arg_max()
+    return lf.with_columns(pl.lit(names).gather(best).alias(out_col))
@@ -0,0 +1,183 @@
+"""Near-duplicate chunk detection with MinHash and LSH banding.
+
+Moderator questions and scripted introductions repeat almost verbatim across
+sessions. Each chunk's text is normalized and cut into character shingles,
+and the shingles are summarized by a MinHash signature. Signatures are split
+into bands, and only chunks sharing a whole band in the same LSH bucket
+become candidate pairs, so the search is sub-quadratic. Each chunk joins the
+lowest-id representative whose estimated Jaccard similarity to it reaches the
+threshold, so no member is further than that from its representative.
+
+Downstream stages embed and code only the representatives, then copy the
+results to the other members with `DuplicateGroups.propagate`. The mapping
+(`duplicate_of` per chunk) is kept so every propagated result stays traceable.
+Normalization drops punctuation, so chunks differing only by annotations such
+as "(risas)" can share a group: do not propagate results that depend on them
+(step 06 codes non-verbal cues per distinct text instead).
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+from collections import defaultdict
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .chunking import Chunk
+
+_PRIME = np.uint64((1 << 31) - 1)
+_WS = re.compile(r"\s+")
+_PUNCT = re.compile(r"[^\w\s]")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return _WS.sub(" ", _PUNCT.sub(" ", text.lower())).strip()
+
+
+def shingle_hashes(text: str, size: int = 5) -> np.ndarray:
+    """CRC32 hashes of the distinct character shingles of the normalized text."""
+    norm = normalize_text(text)
+    if len(norm) <= size:
+        grams = {norm}
+    else:
+        grams = {norm[i : i + size] for i in range(len(norm) - size + 1)}
+    return np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) for g in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+
+
+def minhash_signatures(
+    texts: Sequence[str], num_perm: int = 128, shingle_size: int = 5, seed: int = 1
+) -> np.ndarray:
+    """MinHash signature matrix of shape (len(texts), num_perm)."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+    b = rng.integers(0, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+    out = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for i, text in enumerate(texts):
+        x = shingle_hashes(text, shingle_size) % _PRIME
+        out[i] = ((a * x[None, :] + b) % _PRIME).min(axis=1)
+    return out
+
+
+def choose_bands(
+    num_perm: int, threshold: float, recall: float = 0.95
+) -> tuple[int, int]:
+    """Pick (bands, rows), bands * rows == num_perm, for a similarity threshold.
+
+    A pair with similarity s becomes a candidate with probability
+    1 - (1 - s**rows) ** bands. The split with the most rows (fewest spurious
+    candidates) that still reaches `recall` at `threshold` is chosen.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    good = [(b, r) for b, r in options if 1 - (1 - threshold**r) ** b >= recall]
+    return max(good, key=lambda br: br[1]) if good else (num_perm, 1)
+
+
+@dataclass
+class DuplicateGroups:
+    """Mapping from every chunk to the representative of its near-duplicate group."""
+
+    duplicate_of: dict[int, int]
+    similarity: dict[int, float]
+
+    @property
+    def representative_ids(self) -> list[int]:
+        """Chunk ids that stand for their group (including singletons)."""
+        return sorted({rep for rep in self.duplicate_of.values()})
+
+    @property
+    def n_duplicates(self) -> int:
+        """Number of chunks that are not their own representative."""
+        return sum(cid != rep for cid, rep in self.duplicate_of.items())
+
+    def representatives(self, chunks: Sequence[Chunk]) -> list[Chunk]:
+        """Return the chunks that need embedding or coding, in input order."""
+        return [c for c in chunks if self.duplicate_of[c.chunk_id] == c.chunk_id]
+
+    def propagate[T](self, results: Mapping[int, T]) -> dict[int, T]:
+        """Expand {representative_id: result} to every chunk in the groups."""
+        return {
+            cid: results[rep]
+            for cid, rep in self.duplicate_of.items()
+            if rep in results
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the mapping as columns chunk_id, duplicate_of, similarity."""
+        ids = sorted(self.duplicate_of)
+        return pd.DataFrame(
+            {
+                "chunk_id": ids,
+                "duplicate_of": [self.duplicate_of[c] for c in ids],
+                "similarity": [self.similarity[c] for c in ids],
+            }
+        )
+
+
+def find_near_duplicates(
+    chunks: Sequence[Chunk],
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    shingle_size: int = 5,
+    seed: int = 1,
+) -> DuplicateGroups:
+    """Group chunks whose estimated shingle Jaccard similarity >= `threshold`.
+
+    Chunks with identical signatures are collapsed first. The rest are
+    assigned in chunk_id order: each is compared only with the representatives
+    already sharing one of its LSH buckets, and joins the lowest-id one that
+    passes the threshold, or becomes a representative itself. A bucket full
+    of near-identical chunks thus costs one comparison per chunk, and every
+    member is within `threshold` of its representative (no chaining through
+    other members); `similarity` records that estimated similarity.
+    """
+    ids = [c.chunk_id for c in chunks]
+    sigs = minhash_signatures(
+        [c.text for c in chunks],
+        num_perm=num_perm,
+        shingle_size=shingle_size,
+        seed=seed,
+    )
+    bands, rows = choose_bands(num_perm, threshold)
+
+    # one entry per distinct signature, listing its chunks in id order
+    by_signature: dict[bytes, list[int]] = defaultdict(list)
+    for m in sorted(range(len(chunks)), key=lambda m: ids[m]):
+        by_signature[sigs[m].tobytes()].append(m)
+
+    # (band, band key) -> representatives in that bucket
+    buckets: dict[tuple[int, bytes], list[int]] = defaultdict(list)
+    rep_of: dict[int, int] = {}
+    for members in by_signature.values():
+        first = members[0]
+        keys = [
+            (band, sigs[first, band * rows : (band + 1) * rows].tobytes())
+            for band in range(bands)
+        ]
+        candidates = {rep for key in keys for rep in buckets.get(key, ())}
+        matches = [
+            rep for rep in candidates if (sigs[first] == sigs[rep]).mean() >= threshold
+        ]
+        if matches:
+            rep = min(matches, key=lambda m: ids[m])
+        else:
+            rep = first
+            for key in keys:
+                buckets[key].append(rep)
+        for m in members:
+            rep_of[m] = rep
+
+    duplicate_of: dict[int, int] = {}
+    similarity: dict[int, float] = {}
+    for m, rep in rep_of.items():
+        duplicate_of[ids[m]] = ids[rep]
+        similarity[ids[m]] = float((sigs[m] == sigs[rep]).mean())
+    return DuplicateGroups(duplicate_of=duplicate_of, similarity=similarity)
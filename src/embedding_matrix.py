@@ -0,0 +1,163 @@
+"""Chunk embeddings as one contiguous float32 matrix.
+
+Storing embeddings as a DataFrame column of Python lists costs ~4x the memory
+of float32, scatters the vectors across the heap and turns every similarity
+into a per-row Python loop. `EmbeddingMatrix` keeps them as a single
+(n_chunks, dim) float32 array plus an aligned `chunk_id` index, so scoring
+against a question, a codebook or a clustering model is one matrix product.
+
+Step 02 still writes embeddings as JSON in `01_chunks_with_embeddings.csv`,
+and additionally saves the matrix as a `.npy` sidecar next to it. Later
+stages load the sidecar memory-mapped and never parse the JSON column.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True, eq=False)
+class EmbeddingMatrix:
+    """Float32 embeddings, one row per chunk, with the chunk ids of the rows."""
+
+    vectors: np.ndarray
+    chunk_ids: np.ndarray
+
+    def __post_init__(self) -> None:
+        """Coerce to float32 / int64 (without copying when already so) and check."""
+        vectors = np.asarray(self.vectors, dtype=np.float32)
+        chunk_ids = np.asarray(self.chunk_ids, dtype=np.int64)
+        if vectors.ndim != 2:
+            raise ValueError(f"Expected a 2-D embedding matrix, got {vectors.shape}")
+        if chunk_ids.shape != (len(vectors),):
+            raise ValueError(
+                f"{len(chunk_ids)} chunk ids for {len(vectors)} embedding rows"
+            )
+        object.__setattr__(self, "vectors", vectors)
+        object.__setattr__(self, "chunk_ids", chunk_ids)
+
+    def __len__(self) -> int:
+        """Return the number of chunks."""
+        return len(self.vectors)
+
+    @property
+    def dim(self) -> int:
+        """Embedding dimension."""
+        return self.vectors.shape[1]
+
+    @classmethod
+    def from_rows(
+        cls, chunk_ids: Iterable[int], rows: Sequence[Sequence[float]]
+    ) -> EmbeddingMatrix:
+        """Stack per-chunk vectors (lists, arrays or JSON strings) into a matrix."""
+        ids = np.fromiter((int(c) for c in chunk_ids), dtype=np.int64)
+        dim = len(_parse(rows[0])) if len(rows) else 0
+        vectors = np.empty((len(rows), dim), dtype=np.float32)
+        for i, row in enumerate(rows):
+            vectors[i] = _parse(row)
+        return cls(vectors=vectors, chunk_ids=ids)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, col: str = "embedding") -> EmbeddingMatrix:
+        """Build from a DataFrame's `chunk_id` column and embedding column."""
+        return cls.from_rows(df["chunk_id"], df[col].tolist())
+
+    @cached_property
+    def _positions(self) -> dict[int, int]:
+        return {int(c): i for i, c in enumerate(self.chunk_ids)}
+
+    def row(self, chunk_id: int) -> np.ndarray:
+        """Return the embedding of one chunk (a view, not a copy)."""
+        return self.vectors[self._positions[int(chunk_id)]]
+
+    def rows(self) -> list[np.ndarray]:
+        """Return one view per row, e.g. to put in a DataFrame column."""
+        return list(self.vectors)
+
+    def take(self, chunk_ids: Iterable[int]) -> EmbeddingMatrix:
+        """Return the rows of the given chunks, in that order (copied)."""
+        ids = np.fromiter((int(c) for c in chunk_ids), dtype=np.int64)
+        positions = np.fromiter(
+            (self._positions[c] for c in ids.tolist()), dtype=np.intp, count=len(ids)
+        )
+        return EmbeddingMatrix(vectors=self.vectors[positions], chunk_ids=ids)
+
+    def align(self, chunk_ids: Iterable[int]) -> EmbeddingMatrix:
+        """Like `take`, but returns `self` when the ids already match row for row."""
+        ids = np.fromiter((int(c) for c in chunk_ids), dtype=np.int64)
+        if np.array_equal(ids, self.chunk_ids):
+            return self
+        return self.take(ids)
+
+    def scores(self, query: Sequence[float] | np.ndarray) -> np.ndarray:
+        """Dot products with one query vector (n,) or a query matrix (n, m)."""
+        return self.vectors @ np.asarray(query, dtype=np.float32).T
+
+    def to_json(self) -> list[str]:
+        """Return each row as a JSON list, the format of the step 02 CSV."""
+        return [json.dumps(row) for row in self.vectors.tolist()]
+
+    def save(self, path: Path) -> None:
+        """Write the vectors to `path` (.npy) and the chunk ids next to it."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for target, array in ((path, self.vectors), (ids_path(path), self.chunk_ids)):
+            tmp = target.with_name(target.name + ".tmp")
+            with tmp.open("wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp, target)
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> EmbeddingMatrix:
+        """Read a matrix written by `save`, memory-mapped by default."""
+        path = Path(path)
+        return cls(
+            vectors=np.load(path, mmap_mode="r" if mmap else None),
+            chunk_ids=np.load(ids_path(path)),
+        )
+
+
+def _parse(row: Sequence[float] | str) -> Sequence[float]:
+    return json.loads(row) if isinstance(row, str) else row
+
+
+def ids_path(path: Path) -> Path:
+    """Return the chunk-id file that accompanies a saved matrix."""
+    return path.with_name(path.stem + ".ids.npy")
+
+
+def sidecar_path(csv_path: Path) -> Path:
+    """Return the `.npy` matrix saved next to a chunks CSV."""
+    return Path(csv_path).with_suffix(".npy")
+
+
+def read_chunk_embeddings(
+    csv_path: Path, col: str = "embedding"
+) -> tuple[pd.DataFrame, EmbeddingMatrix]:
+    """Read a chunks CSV and its embeddings; the DataFrame omits the `col` column.
+
+    The `.npy` sidecar is used when it is at least as new as the CSV and holds
+    the same chunk ids; otherwise the JSON column is parsed.
+    """
+    csv_path = Path(csv_path)
+    npy = sidecar_path(csv_path)
+    if (
+        npy.exists()
+        and ids_path(npy).exists()
+        and npy.stat().st_mtime >= csv_path.stat().st_mtime
+    ):
+        df = pd.read_csv(csv_path, usecols=lambda c: c != col)
+        embeddings = EmbeddingMatrix.load(npy)
+        if np.array_equal(embeddings.chunk_ids, df["chunk_id"].to_numpy()):
+            return df, embeddings
+    df = pd.read_csv(csv_path)
+    embeddings = EmbeddingMatrix.from_frame(df, col)
+    return df.drop(columns=col), embeddings
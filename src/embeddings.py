@@ -1,16 +1,160 @@
+"""Embedding backends, selected with `EMBEDDING_BACKEND` (see `load_config`).
+
+- `openai` (default): the OpenAI embeddings endpoint, `batch_size` texts per
+  request.
+- `local`: `HashingEmbedder`, a hashed character n-gram projection computed on
+  the CPU. It needs no API key or network, is free and deterministic, and
+  embeds hundreds of chunks per second on one core, in sparse batches. It
+  captures shared wording rather than meaning, so use it for fast offline
+  iterations and tests of the pipeline, not for final coding.
+
+Each backend embeds a list of texts into a (n, dim) float32 matrix; callers go
+through `get_embedding` / `get_embeddings`, so the code in `src/coding.py` is
+the same for every backend. The hashing embedder is stateless: chunks, research
+questions and codebook themes embedded in separate runs share one space.
+"""
+
 from __future__ import annotations
 
-from openai import OpenAI
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Protocol
 
-from .openai_client import load_config
+import numpy as np
 
+from .openai_client import ModelConfig, get_client, load_config
 
-def get_embedding(client: OpenAI, text: str) -> list[float]:
-    """Create a single embedding vector for the given text."""
-    cfg = load_config()
-    # Embeddings endpoint takes a plain string (no roles/messages)
-    response = client.embeddings.create(
-        model=cfg.embedding_model,
-        input=text,
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+class EmbeddingBackend(Protocol):
+    """Anything that embeds a batch of texts into unit-length rows."""
+
+    @property
+    def model(self) -> str:
+        """Identifier of the embedding space (stored with compiled codebooks)."""
+        ...
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Return a (len(texts), dim) float32 matrix, one row per text."""
+        ...
+
+
+# Output width of the OpenAI embedding models, for results with no rows
+OPENAI_EMBEDDING_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+@dataclass(frozen=True)
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI API."""
+
+    client: OpenAI
+    model: str
+    batch_size: int = 256
+
+    @property
+    def dim(self) -> int:
+        """Width of the model's vectors (0 for a model not in the table)."""
+        return OPENAI_EMBEDDING_DIMS.get(self.model, 0)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Embed `batch_size` texts per request, in input order."""
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        rows: list[list[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            # Embeddings endpoint takes plain strings (no roles/messages)
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=texts[start : start + self.batch_size],
+            )
+            rows.extend(
+                d.embedding for d in sorted(response.data, key=lambda d: d.index)
+            )
+        return np.asarray(rows, dtype=np.float32).reshape(len(texts), -1)
+
+
+@dataclass(frozen=True)
+class HashingEmbedder:
+    """Offline embeddings: hashed character n-gram counts, L2-normalized.
+
+    Character n-grams within word boundaries (`ngram_range`, accent- and
+    case-folded) are hashed into `dim` signed buckets. Counts are damped with
+    log1p so long chunks are not dominated by frequent n-grams. The dot
+    product of two rows approximates the cosine similarity of their n-gram
+    profiles.
+    """
+
+    dim: int = 1024
+    ngram_range: tuple[int, int] = (3, 5)
+    batch_size: int = 4096
+
+    @property
+    def model(self) -> str:
+        """Identifier of the embedding space."""
+        lo, hi = self.ngram_range
+        return f"local-hash-char{lo}-{hi}-{self.dim}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Embed `batch_size` texts per sparse-to-dense step."""
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        vectorizer = HashingVectorizer(
+            analyzer="char_wb",
+            ngram_range=self.ngram_range,
+            n_features=self.dim,
+            strip_accents="unicode",
+            alternate_sign=True,
+            norm=None,
+        )
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            counts = vectorizer.transform(texts[start : start + self.batch_size])
+            counts.data = np.sign(counts.data) * np.log1p(np.abs(counts.data))
+            out[start : start + counts.shape[0]] = counts.toarray()
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+BACKENDS = ("openai", "local")
+
+
+def get_backend(
+    client: OpenAI | None = None, cfg: ModelConfig | None = None
+) -> EmbeddingBackend:
+    """Return the configured embedding backend.
+
+    The OpenAI backend uses `client`, or creates one if it is None.
+    """
+    cfg = cfg or load_config()
+    if cfg.embedding_backend == "local":
+        return HashingEmbedder(dim=cfg.local_embedding_dim)
+    if cfg.embedding_backend == "openai":
+        return OpenAIEmbedder(client or get_client(), cfg.embedding_model)
+    raise ValueError(
+        f"Unknown EMBEDDING_BACKEND {cfg.embedding_backend!r}; "
+        f"expected one of {', '.join(BACKENDS)}"
     )
-    return response.data[0].embedding
+
+
+def embedding_client() -> OpenAI | None:
+    """Return an OpenAI client if the configured backend needs one, else None.
+
+    Lets embedding-only stages run without an API key on the local backend.
+    """
+    return None if load_config().embedding_backend == "local" else get_client()
+
+
+def get_embedding(client: OpenAI | None, text: str) -> list[float]:
+    """Create a single embedding vector for the given text."""
+    return get_backend(client).embed([text])[0].tolist()
+
+
+def get_embeddings(client: OpenAI | None, texts: list[str]) -> np.ndarray:
+    """Embed many texts in batches; return a (len(texts), dim) float32 matrix."""
+    return get_backend(client).embed(texts)
@@ -0,0 +1,307 @@
+"""Hierarchical codebooks and coarse-to-fine similarity search.
+
+A hierarchical codebook is a JSON list whose entries are either a plain
+"Name: definition" string (a leaf theme, as in `help_themes.json`) or an
+object with child entries:
+
+    [
+      {"theme": "Parent: definition", "children": ["Child A: ...", "Child B: ..."]},
+      "Standalone theme: ..."
+    ]
+
+Parents may be nested to any depth. Only leaves are assigned to chunks; parent
+embeddings are used to prune the search. A chunk is first scored against the
+top level, and only the `beam` best parents (optionally, only those within
+`margin` of the best one) are expanded, level by level, down to the leaves.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal
+
+import numpy as np
+
+from .coding import Theme, embed_themes, parse_theme
+from .embeddings import get_embedding
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+ParentEmbedding = Literal["pooled", "definition", "both"]
+
+
+@dataclass
+class CodebookNode:
+    """A theme and its child themes (none for a leaf)."""
+
+    theme: Theme
+    children: list[CodebookNode] = field(default_factory=list)
+
+    @property
+    def is_leaf(self) -> bool:
+        """True if the node has no children."""
+        return not self.children
+
+
+def parse_codebook(data: list[Any]) -> list[CodebookNode]:
+    """Build codebook nodes from decoded JSON (flat or nested)."""
+    nodes: list[CodebookNode] = []
+    for item in data:
+        if isinstance(item, str):
+            nodes.append(CodebookNode(parse_theme(item)))
+        else:
+            nodes.append(
+                CodebookNode(
+                    parse_theme(item["theme"]),
+                    parse_codebook(item.get("children", [])),
+                )
+            )
+    return nodes
+
+
+def load_codebook(path: Path) -> list[CodebookNode]:
+    """Load a flat or hierarchical codebook JSON file."""
+    return parse_codebook(json.loads(path.read_text(encoding="utf-8")))
+
+
+def iter_leaves(nodes: list[CodebookNode]) -> Iterator[Theme]:
+    """Yield leaf themes depth-first, in file order."""
+    for node in nodes:
+        if node.is_leaf:
+            yield node.theme
+        else:
+            yield from iter_leaves(node.children)
+
+
+def is_hierarchical(nodes: list[CodebookNode]) -> bool:
+    """Return True if any top-level entry has children."""
+    return any(not node.is_leaf for node in nodes)
+
+
+def _unit(vec: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def embed_codebook(
+    client: OpenAI | None,
+    nodes: list[CodebookNode],
+    parent_embedding: ParentEmbedding = "pooled",
+    leaves: list[Theme] | None = None,
+) -> list[CodebookNode]:
+    """Embed every theme in the codebook, in place, and return the nodes.
+
+    Leaves are embedded from their definitions, unless already-embedded
+    `leaves` (in `iter_leaves` order, e.g. from a compiled codebook) are given.
+    Parent embeddings are the normalized mean of their children's ("pooled",
+    no API calls), the embedding of the parent's own definition ("definition"),
+    or the normalized average of the two ("both").
+    """
+    if leaves is None:
+        leaves = embed_themes(client, list(iter_leaves(nodes)))
+    embedded = iter(leaves)
+    _attach_embeddings(client, nodes, embedded, parent_embedding)
+    return nodes
+
+
+def _attach_embeddings(
+    client: OpenAI | None,
+    nodes: list[CodebookNode],
+    embedded: Iterator[Theme],
+    parent_embedding: ParentEmbedding,
+) -> None:
+    for node in nodes:
+        if node.is_leaf:
+            node.theme = next(embedded)
+            continue
+        _attach_embeddings(client, node.children, embedded, parent_embedding)
+        pooled = _unit(
+            np.mean([_unit(np.asarray(c.theme.embedding)) for c in node.children], 0)
+        )
+        if parent_embedding == "pooled":
+            vec = pooled
+        else:
+            own = _unit(np.asarray(get_embedding(client, node.theme.full_definition)))
+            vec = own if parent_embedding == "definition" else _unit(own + pooled)
+        node.theme.embedding = vec.tolist()
+
+
+@dataclass
+class _IndexNode:
+    matrix: np.ndarray  # (n_children, dim) child embeddings
+    leaf_ids: np.ndarray  # leaf index per child, -1 for parents
+    children: list[_IndexNode | None]
+
+
+@dataclass
+class CodebookIndex:
+    """Embedding matrices for flat and coarse-to-fine search over one codebook."""
+
+    leaves: list[Theme]
+    leaf_matrix: np.ndarray
+    root: _IndexNode
+
+    @property
+    def leaf_names(self) -> list[str]:
+        """Short names of the leaf themes, in index order."""
+        return [t.short_name for t in self.leaves]
+
+
+def build_index(nodes: list[CodebookNode]) -> CodebookIndex:
+    """Build a search index from an embedded codebook."""
+    leaves: list[Theme] = []
+
+    def build(level: list[CodebookNode]) -> _IndexNode:
+        leaf_ids, children = [], []
+        for node in level:
+            if node.is_leaf:
+                leaf_ids.append(len(leaves))
+                leaves.append(node.theme)
+                children.append(None)
+            else:
+                leaf_ids.append(-1)
+                children.append(build(node.children))
+        matrix = np.asarray([n.theme.embedding for n in level], dtype=np.float32)
+        return _IndexNode(matrix, np.asarray(leaf_ids), children)
+
+    root = build(nodes)
+    leaf_matrix = np.asarray([t.embedding for t in leaves], dtype=np.float32)
+    return CodebookIndex(leaves=leaves, leaf_matrix=leaf_matrix, root=root)
+
+
+@dataclass
+class SearchResult:
+    """Best leaf per chunk, its score, and the number of dot products computed."""
+
+    leaf: np.ndarray
+    score: np.ndarray
+    comparisons: int
+
+    def labels(self, index: CodebookIndex) -> np.ndarray:
+        """Leaf short names per chunk."""
+        return np.asarray(index.leaf_names, dtype=object)[self.leaf]
+
+
+def search_flat(index: CodebookIndex, embeddings: np.ndarray) -> SearchResult:
+    """Score every chunk against every leaf theme."""
+    scores = np.asarray(embeddings, dtype=np.float32) @ index.leaf_matrix.T
+    best = scores.argmax(axis=1)
+    return SearchResult(
+        leaf=best,
+        score=scores[np.arange(len(best)), best],
+        comparisons=scores.size,
+    )
+
+
+def search_hierarchical(
+    index: CodebookIndex,
+    embeddings: np.ndarray,
+    beam: int = 2,
+    margin: float | None = None,
+) -> SearchResult:
+    """Coarse-to-fine search: expand only the best parents at each level.
+
+    At every level each chunk keeps its `beam` highest-scoring parents; with
+    `margin`, parents scoring more than `margin` below the chunk's best parent
+    are dropped as well. Leaves met on the way always compete for the result.
+    """
+    emb = np.asarray(embeddings, dtype=np.float32)
+    n = len(emb)
+    best_leaf = np.full(n, -1)
+    best_score = np.full(n, -np.inf, dtype=np.float32)
+    comparisons = 0
+
+    frontier: list[tuple[np.ndarray, _IndexNode]] = [(np.arange(n), index.root)]
+    while frontier:
+        rows, node = frontier.pop()
+        scores = emb[rows] @ node.matrix.T
+        comparisons += scores.size
+
+        is_leaf = node.leaf_ids >= 0
+        if is_leaf.any():
+            leaf_scores = scores[:, is_leaf]
+            top = leaf_scores.argmax(axis=1)
+            top_score = leaf_scores[np.arange(len(rows)), top]
+            better = top_score > best_score[rows]
+            best_score[rows[better]] = top_score[better]
+            best_leaf[rows[better]] = node.leaf_ids[is_leaf][top[better]]
+
+        parents = np.flatnonzero(~is_leaf)
+        if len(parents) == 0:
+            continue
+        parent_scores = scores[:, parents]
+        keep = np.zeros_like(parent_scores, dtype=bool)
+        if beam >= len(parents):
+            keep[:] = True
+        else:
+            top = np.argpartition(-parent_scores, beam - 1, axis=1)[:, :beam]
+            np.put_along_axis(keep, top, True, axis=1)
+        if margin is not None:
+            keep &= parent_scores >= parent_scores.max(axis=1, keepdims=True) - margin
+        for j, col in enumerate(parents):
+            selected = rows[keep[:, j]]
+            if len(selected):
+                frontier.append((selected, node.children[col]))
+
+    return SearchResult(leaf=best_leaf, score=best_score, comparisons=comparisons)
+
+
+@dataclass
+class SearchComparison:
+    """Speed and agreement of coarse-to-fine search against flat search."""
+
+    flat_seconds: float
+    hierarchical_seconds: float
+    flat_comparisons: int
+    hierarchical_comparisons: int
+    agreement: float
+
+    @property
+    def speedup(self) -> float:
+        """Flat wall time divided by hierarchical wall time."""
+        return self.flat_seconds / max(self.hierarchical_seconds, 1e-9)
+
+    def summary(self) -> str:
+        """Human-readable comparison for printing."""
+        ratio = self.hierarchical_comparisons / max(self.flat_comparisons, 1)
+        return "\n".join(
+            [
+                f"flat search:         {self.flat_seconds * 1000:8.1f} ms "
+                f"{self.flat_comparisons:10d} dot products",
+                f"hierarchical search: {self.hierarchical_seconds * 1000:8.1f} ms "
+                f"{self.hierarchical_comparisons:10d} dot products ({ratio:.1%})",
+                f"speedup: {self.speedup:.2f}x",
+                f"agreement with flat search: {self.agreement:.1%}",
+            ]
+        )
+
+
+def compare_search(
+    index: CodebookIndex,
+    embeddings: np.ndarray,
+    beam: int = 2,
+    margin: float | None = None,
+) -> tuple[SearchResult, SearchResult, SearchComparison]:
+    """Run flat and hierarchical search and compare them.
+
+    Returns (flat result, hierarchical result, comparison).
+    """
+    start = time.perf_counter()
+    flat = search_flat(index, embeddings)
+    flat_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    hier = search_hierarchical(index, embeddings, beam=beam, margin=margin)
+    hier_seconds = time.perf_counter() - start
+    comparison = SearchComparison(
+        flat_seconds=flat_seconds,
+        hierarchical_seconds=hier_seconds,
+        flat_comparisons=flat.comparisons,
+        hierarchical_comparisons=hier.comparisons,
+        agreement=float((flat.leaf == hier.leaf).mean()) if len(flat.leaf) else 1.0,
+    )
+    return flat, hier, comparison
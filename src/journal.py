@@ -0,0 +1,188 @@
+"""Append-only result journal for checkpointing long LLM coding loops.
+
+Every finished item is appended to a JSON-lines file as soon as it is paid
+for, and the file is flushed and fsync'd before the call returns, so a crash
+or Ctrl-C loses at most the requests in flight. Entries are keyed by
+(task, chunk_id, theme, prompt_version); a rerun opens the same journal and
+skips every key already present. Changing a prompt's version starts a fresh
+set of keys for that task. Callers put a `text_digest` of their inputs (chunk
+text, theme definition) in the theme slot, so an edited definition or a
+different transcript under the same chunk ids is coded again instead of
+reusing stale answers.
+
+A torn last line (from a crash mid-write) is dropped on open. Because later
+entries for a key override earlier ones, the file is periodically compacted
+to one line per key, written to a temporary file and atomically swapped in.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+JournalKey = tuple[str, int, str, str]
+
+
+def text_digest(*parts: str) -> str:
+    """Short SHA-256 digest of one or more texts, for journal keys."""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class ResultJournal:
+    """Durable {(task, chunk_id, theme, prompt_version): result} store.
+
+    Use as a context manager, or call `close()`, to compact on exit.
+    """
+
+    def __init__(self, path: Path, compact_every: int = 1000) -> None:
+        """Open or create the journal at `path` and replay its entries."""
+        self.path = Path(path)
+        self.compact_every = compact_every
+        self._entries: dict[JournalKey, dict[str, Any]] = {}
+        self._lines = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._load()
+        self._file = self.path.open("a", encoding="utf-8")
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        raw = self.path.read_bytes()
+        end = raw.rfind(b"\n") + 1
+        if end < len(raw):
+            # Torn write from an interrupted run: drop the partial line
+            with self.path.open("r+b") as f:
+                f.truncate(end)
+        for line in raw[:end].splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            key = (
+                entry["task"],
+                int(entry["chunk_id"]),
+                entry["theme"],
+                entry["version"],
+            )
+            self._entries[key] = entry["result"]
+            self._lines += 1
+
+    def __enter__(self) -> ResultJournal:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: JournalKey) -> bool:
+        return key in self._entries
+
+    def get(self, key: JournalKey) -> dict[str, Any] | None:
+        """Return the stored result for a key, or None."""
+        return self._entries.get(key)
+
+    def record(
+        self,
+        task: str,
+        chunk_id: int,
+        result: dict[str, Any],
+        theme: str = "",
+        version: str = "",
+    ) -> None:
+        """Append one result and fsync it."""
+        self.record_many(task, [(chunk_id, theme, result)], version=version)
+
+    def record_many(
+        self,
+        task: str,
+        items: Iterable[tuple[int, str, dict[str, Any]]],
+        version: str = "",
+    ) -> None:
+        """Append (chunk_id, theme, result) items with a single fsync."""
+        lines = []
+        with self._lock:
+            for chunk_id, theme, result in items:
+                self._entries[(task, int(chunk_id), theme, version)] = result
+                lines.append(
+                    json.dumps(
+                        {
+                            "task": task,
+                            "chunk_id": int(chunk_id),
+                            "theme": theme,
+                            "version": version,
+                            "result": result,
+                        },
+                        ensure_ascii=False,
+                    )
+                )
+            if not lines:
+                return
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._lines += len(lines)
+            if self._lines - len(self._entries) >= self.compact_every:
+                self._compact_locked()
+
+    def results(
+        self, task: str, version: str = ""
+    ) -> dict[tuple[int, str], dict[str, Any]]:
+        """Return {(chunk_id, theme): result} for a task/version."""
+        with self._lock:
+            return {
+                (chunk_id, theme): result
+                for (t, chunk_id, theme, v), result in self._entries.items()
+                if t == task and v == version
+            }
+
+    def to_dataframe(self, task: str, version: str = "") -> pd.DataFrame:
+        """Rebuild a long DataFrame (chunk_id, theme, result fields) from the journal."""
+        rows = [
+            {"chunk_id": chunk_id, "theme": theme, **result}
+            for (chunk_id, theme), result in self.results(task, version).items()
+        ]
+        if not rows:
+            return pd.DataFrame(columns=["chunk_id", "theme"])
+        return pd.DataFrame(rows)
+
+    def compact(self) -> None:
+        """Rewrite the journal with one line per key."""
+        with self._lock:
+            self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for (task, chunk_id, theme, version), result in self._entries.items():
+                entry = {
+                    "task": task,
+                    "chunk_id": chunk_id,
+                    "theme": theme,
+                    "version": version,
+                    "result": result,
+                }
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp, self.path)
+        self._file = self.path.open("a", encoding="utf-8")
+        self._lines = len(self._entries)
+
+    def close(self) -> None:
+        """Compact if the file holds superseded lines, then close it."""
+        with self._lock:
+            if self._file.closed:
+                return
+            if self._lines > len(self._entries):
+                self._compact_locked()
+            self._file.close()
@@ -0,0 +1,139 @@
+"""Local scanner for transcriber annotations of non-verbal cues.
+
+Transcribers mark cues with short annotations such as `(risas)`, `[pausa]`,
+`(laughter)` or `[inaudible]`. Chunks without any such marker rarely contain
+cues, so they can be coded locally instead of being sent to the LLM.
+
+All markers are compiled into one regular expression, and the scan runs over
+the whole text column at once with Polars' native regex engine.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import numpy as np
+import polars as pl
+
+# Stems matched case-insensitively at the start of an annotation (Spanish and
+# English). Stems match any ending, e.g. "laugh" covers laughter/laughs/laughing.
+MARKER_STEMS: tuple[str, ...] = (
+    # laughter / smiling
+    "risa",
+    "ríe",
+    "sonr",
+    "carcajada",
+    "laugh",
+    "giggl",
+    "chuckl",
+    "smil",
+    # pauses / silence
+    "pausa",
+    "pause",
+    "silencio",
+    "silence",
+    "silent",
+    # unclear audio / overlap
+    "inaudible",
+    "ininteligible",
+    "incomprensible",
+    "unintelligible",
+    "unclear",
+    "crosstalk",
+    "cross-talk",
+    "hablan al mismo tiempo",
+    "varias voces",
+    "overlapping",
+    "interrump",
+    "interrup",
+    # other vocal or body cues
+    "suspir",
+    "sigh",
+    "llor",
+    "llanto",
+    "cry",
+    "cries",
+    "tos\\b",
+    "cough",
+    "aplaus",
+    "applau",
+    "asiente",
+    "nod",
+    "gesto",
+    "gestur",
+    "shrug",
+    "ruido",
+    "noise",
+    # unclear passages noted in words, e.g. "(minuto 2 no se le entiende)"
+    "entiende",
+    "understand",
+    "understood",
+)
+
+# Candidate routes assigned by `route_chunks`.
+ROUTE_ALL = "all"
+ROUTE_MARKER = "marker"
+ROUTE_AUDIT = "audit"
+ROUTE_SKIPPED = "skipped"
+
+LEXICON_MODES = ("all", "candidates", "audit")
+
+
+def build_marker_pattern(stems: Sequence[str] = MARKER_STEMS) -> str:
+    """Combine marker stems into a single regex over annotation positions.
+
+    A stem counts as an annotation when it starts a word within a parenthesis
+    or bracket, or when it starts a line or follows a free-standing dash and
+    its word ends the annotation (end of line, a dash or closing punctuation),
+    as in "Risas." or "- pausa -". Words merely starting with a stem in prose
+    ("Noise was fine", "semi-silent") or inside other words ("(Marisa)") do
+    not count.
+    """
+    alternatives = "|".join(stems)
+    bracketed = rf"[\(\[][^\)\]]{{0,60}}?\b(?:{alternatives})"
+    standalone = (
+        rf"(?:^[\s\-–—]*|(?:^|\s)[\-–—]\s*)\b(?:{alternatives})\w*\s*"
+        r"(?:$|[\-–—.…:;!?\)\]])"
+    )
+    return rf"(?im){bracketed}|{standalone}"
+
+
+MARKER_PATTERN = build_marker_pattern()
+
+
+def scan_markers(texts: Sequence[str], pattern: str = MARKER_PATTERN) -> np.ndarray:
+    """Return a boolean mask of texts containing at least one cue annotation."""
+    series = pl.Series("text", list(texts), dtype=pl.String)
+    return series.str.contains(pattern).fill_null(False).to_numpy()
+
+
+def route_chunks(
+    texts: Sequence[str],
+    mode: str = "audit",
+    audit_fraction: float = 0.1,
+    random_state: int = 42,
+) -> np.ndarray:
+    """Decide which chunks need LLM coding.
+
+    Modes:
+      - "all": send every chunk (route "all").
+      - "candidates": send only chunks with markers ("marker"); the rest are
+        "skipped" and coded as having no cues.
+      - "audit": as "candidates", but also send a random `audit_fraction` of
+        the marker-free chunks ("audit") so lexicon misses can be measured.
+    """
+    if mode not in LEXICON_MODES:
+        raise ValueError(f"mode must be one of {LEXICON_MODES}, got {mode!r}.")
+    n = len(texts)
+    if mode == "all":
+        return np.full(n, ROUTE_ALL, dtype=object)
+
+    has_marker = scan_markers(texts)
+    routes = np.where(has_marker, ROUTE_MARKER, ROUTE_SKIPPED).astype(object)
+    if mode == "audit":
+        negatives = np.flatnonzero(~has_marker)
+        n_audit = int(round(len(negatives) * audit_fraction))
+        if n_audit:
+            rng = np.random.default_rng(random_state)
+            routes[rng.choice(negatives, size=n_audit, replace=False)] = ROUTE_AUDIT
+    return routes
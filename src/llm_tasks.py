@@ -1,129 +1,246 @@
 from __future__ import annotations
 
 import json
-from typing import Any
-
-from openai import OpenAI
+import math
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
 
+from .journal import ResultJournal, text_digest
 from .openai_client import load_config
+from .prompts import (
+    CANDIDATE_THEMES,
+    CLUSTER_LABEL,
+    GENERAL_THEMES,
+    NONVERBAL,
+    NONVERBAL_BATCH,
+    TRANSLATE,
+    YES_NO,
+    CacheStats,
+    PromptTemplate,
+    codebook_block,
+)
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+def _respond(
+    client: OpenAI,
+    template: PromptTemplate,
+    content: str,
+    shared: Mapping[str, Any] | None = None,
+    stats: CacheStats | None = None,
+    **create_kwargs: Any,
+) -> Any:
+    """Render a template, call the Responses API and record cache usage."""
+    response = client.responses.create(
+        input=template.render(shared, text=content),
+        prompt_cache_key=template.cache_key(shared),
+        **create_kwargs,
+    )
+    if stats is not None:
+        stats.record(template.name, response)
+    return response
 
 
-def translate_to_english(client: OpenAI, spanish_text: str) -> str:
+def translate_to_english(
+    client: OpenAI, spanish_text: str, stats: CacheStats | None = None
+) -> str:
     """Translate Spanish text to English using LLM."""
     cfg = load_config()
-    response = client.responses.create(
-        model=cfg.llm_model,
-        input=[
-            {
-                "role": "developer",
-                "content": "You are a translator specializing in Spanish-to-English transcripts.",
-            },
-            {
-                "role": "user",
-                "content": "Translate the Spanish transcript below into English. Keep formatting as close as possible.\n\nTRANSCRIPT:\n"
-                + spanish_text,
-            },
-        ],
+    response = _respond(
+        client, TRANSLATE, spanish_text, stats=stats, model=cfg.llm_model
     )
     return response.output_text
 
 
 def extract_candidate_themes(
-    client: OpenAI, english_transcript: str, research_question: str
+    client: OpenAI,
+    english_transcript: str,
+    research_question: str,
+    stats: CacheStats | None = None,
 ) -> str:
     """Extract candidate themes from transcript based on research question."""
     cfg = load_config()
-    response = client.responses.create(
+    response = _respond(
+        client,
+        CANDIDATE_THEMES,
+        english_transcript,
+        shared={"research_question": research_question},
+        stats=stats,
         model=cfg.theme_extraction_model,
         reasoning={"effort": cfg.theme_extraction_reasoning_effort},
-        input=[
-            {
-                "role": "developer",
-                "content": (
-                    "You are a PhD-level qualitative researcher. Your job is to propose a codebook (themes) from focus group transcripts. "
-                    "Use rigorous, research-appropriate language."
-                ),
-            },
-            {
-                "role": "user",
-                "content": (
-                    "I will give you an English focus group transcript.\n"
-                    "Please extract candidate themes specifically relevant to the research question below.\n"
-                    "Return two sections: 'Helps integration' and 'Hinders integration'.\n\n"
-                    f"RESEARCH QUESTION:\n{research_question}\n\n"
-                    f"TRANSCRIPT:\n{english_transcript}"
-                ),
-            },
-        ],
     )
     return response.output_text
 
 
-def extract_general_themes(client: OpenAI, transcript: str) -> str:
+def extract_general_themes(
+    client: OpenAI, transcript: str, stats: CacheStats | None = None
+) -> str:
     """Extract general themes from transcript without a specific research question.
 
     This function performs inductive coding by asking the LLM to identify
     recurring themes, patterns, and topics across the entire transcript.
     """
     cfg = load_config()
-    response = client.responses.create(
+    response = _respond(
+        client,
+        GENERAL_THEMES,
+        transcript,
+        stats=stats,
         model=cfg.theme_extraction_model,
         reasoning={"effort": cfg.theme_extraction_reasoning_effort},
-        input=[
-            {
-                "role": "developer",
-                "content": (
-                    "You are a PhD-level qualitative researcher. Your job is to analyze "
-                    "focus group transcripts and identify recurring themes, patterns, and topics. "
-                    "Use rigorous, research-appropriate language."
-                ),
-            },
-            {
-                "role": "user",
-                "content": (
-                    "I will give you a focus group transcript.\n"
-                    "Please read through the entire transcript and identify the main themes, patterns, and topics discussed.\n"
-                    "For each theme:\n"
-                    "1. Provide a clear, concise theme name\n"
-                    "2. Write a detailed definition (1-2 sentences)\n"
-                    "3. Mention key examples or quotes that illustrate the theme\n\n"
-                    "Organize themes logically and aim for 8-15 distinct themes that capture the breadth of discussion.\n\n"
-                    f"TRANSCRIPT:\n{transcript}"
-                ),
-            },
-        ],
     )
     return response.output_text
 
 
 def code_yes_no_for_theme(
-    client: OpenAI, chunk_text: str, theme_definition: str
+    client: OpenAI,
+    chunk_text: str,
+    theme_definition: str,
+    stats: CacheStats | None = None,
+    codebook: str = "",
 ) -> str:
-    """Return 'YES' or 'NO' depending on whether the chunk substantively relates to the theme."""
+    """Return 'YES' or 'NO' depending on whether the chunk substantively relates to the theme.
+
+    `codebook` is the shared context from `codebook_block`; pass the same one
+    for every pair of a sweep so their prompt prefix is cached. Returns '' if
+    the model's output was empty.
+    """
     cfg = load_config()
-    response = client.responses.create(
+    response = _respond(
+        client,
+        YES_NO,
+        chunk_text,
+        shared={"codebook": codebook, "theme_definition": theme_definition},
+        stats=stats,
         model=cfg.llm_model,
         reasoning={"effort": "low"},
-        input=[
-            {
-                "role": "developer",
-                "content": "You are a PhD qualitative researcher coding transcript chunks.",
-            },
-            {
-                "role": "user",
-                "content": (
-                    "Decide whether the CHUNK below substantively discusses the THEME. "
-                    "Only output one token: YES or NO.\n\n"
-                    f"THEME:\n{theme_definition}\n\n"
-                    f"CHUNK:\n{chunk_text}"
-                ),
-            },
-        ],
     )
-    return response.output_text.strip().split()[0].upper()
+    words = response.output_text.strip().split()
+    return words[0].upper() if words else ""
+
+
+def yes_no_probabilities(response: Any) -> tuple[float, float]:
+    """Return (P(YES), P(NO)) from the first output token's top logprobs."""
+    p_yes = p_no = 0.0
+    for item in getattr(response, "output", []) or []:
+        for part in getattr(item, "content", None) or []:
+            logprobs = getattr(part, "logprobs", None)
+            if not logprobs:
+                continue
+            first = logprobs[0]
+            candidates = list(first.top_logprobs or []) or [first]
+            for cand in candidates:
+                token = cand.token.strip().upper()
+                if token == "YES":
+                    p_yes += math.exp(cand.logprob)
+                elif token == "NO":
+                    p_no += math.exp(cand.logprob)
+            return p_yes, p_no
+    return p_yes, p_no
+
+
+def code_yes_no_with_logprobs(
+    client: OpenAI,
+    chunk_text: str,
+    theme_definition: str,
+    model: str,
+    stats: CacheStats | None = None,
+    codebook: str = "",
+) -> tuple[str, float, float]:
+    """Code one (chunk, theme) pair with a non-reasoning model and logprobs enabled.
+
+    Returns (answer, P(YES), P(NO)); answer is '' if the output was empty.
+    """
+    response = _respond(
+        client,
+        YES_NO,
+        chunk_text,
+        shared={"codebook": codebook, "theme_definition": theme_definition},
+        stats=stats,
+        model=model,
+        max_output_tokens=16,
+        top_logprobs=5,
+        include=["message.output_text.logprobs"],
+    )
+    words = response.output_text.strip().split()
+    answer = words[0].upper().strip(".") if words else ""
+    p_yes, p_no = yes_no_probabilities(response)
+    return answer, p_yes, p_no
+
+
+def code_yes_no_sweep(
+    client: OpenAI,
+    chunks: list[tuple[int, str]],
+    theme_definitions: Mapping[str, str],
+    max_workers: int = 8,
+    stats: CacheStats | None = None,
+    journal: ResultJournal | None = None,
+) -> dict[tuple[int, str], str]:
+    """Code every (chunk, theme) pair, theme by theme, to maximise cache hits.
+
+    `chunks` is a list of (chunk_id, text) and `theme_definitions` maps theme
+    names to definitions. Every prompt starts with the whole codebook, and
+    pairs are queued so that all chunks for one theme, which share the rest
+    of the prompt prefix, are sent back-to-back.
+
+    With a `journal`, each answer is persisted as soon as it arrives and pairs
+    already journaled for the current YES_NO prompt version, codebook, theme
+    definition and chunk text are not re-sent.
+
+    Returns {(chunk_id, theme_name): "YES"|"NO"}.
+    """
+    codebook = codebook_block(theme_definitions.values())
+
+    def key(name: str, text: str) -> str:
+        return f"{name}#{text_digest(codebook, theme_definitions[name], text)}"
+
+    done: dict[tuple[int, str], str] = {}
+    if journal is not None:
+        for chunk_id, text in chunks:
+            for name in theme_definitions:
+                hit = journal.get(
+                    (YES_NO.name, int(chunk_id), key(name, text), YES_NO.version)
+                )
+                if hit is not None:
+                    done[(int(chunk_id), name)] = hit["answer"]
+    pairs = [
+        (int(chunk_id), text, name)
+        for name in theme_definitions
+        for chunk_id, text in chunks
+        if (int(chunk_id), name) not in done
+    ]
+
+    def code(pair: tuple[int, str, str]) -> str:
+        chunk_id, text, name = pair
+        answer = code_yes_no_for_theme(
+            client, text, theme_definitions[name], stats=stats, codebook=codebook
+        )
+        if journal is not None:
+            journal.record(
+                YES_NO.name,
+                chunk_id,
+                {"answer": answer},
+                theme=key(name, text),
+                version=YES_NO.version,
+            )
+        return answer
+
+    results = dict(done)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        answers = pool.map(code, pairs)
+        results.update(
+            ((chunk_id, name), answer)
+            for (chunk_id, _, name), answer in zip(pairs, answers, strict=True)
+        )
+    return results
 
 
-def code_nonverbal_cues(client: OpenAI, chunk_text: str) -> dict[str, Any]:
+def code_nonverbal_cues(
+    client: OpenAI, chunk_text: str, stats: CacheStats | None = None
+) -> dict[str, Any]:
     """Extract non-verbal cue metadata from a chunk.
 
     Returns a dict with keys:
@@ -133,23 +250,13 @@ def code_nonverbal_cues(client: OpenAI, chunk_text: str) -> dict[str, Any]:
     The model is asked to return JSON only; we parse defensively.
     """
     cfg = load_config()
-    response = client.responses.create(
+    response = _respond(
+        client,
+        NONVERBAL,
+        chunk_text,
+        stats=stats,
         model=cfg.llm_model,
         reasoning={"effort": "low"},
-        input=[
-            {
-                "role": "developer",
-                "content": "You are a qualitative researcher extracting non-verbal cues from transcript notes.",
-            },
-            {
-                "role": "user",
-                "content": (
-                    "From the CHUNK below, detect whether there is any explicit non-verbal cue info (e.g., laughter, pauses, confusion). "
-                    'Return ONLY valid JSON with exactly these keys: {"any_cues": "YES"|"NO", "cue_type": <short string or empty>}.\n\n'
-                    f"CHUNK:\n{chunk_text}"
-                ),
-            },
-        ],
     )
 
     text = response.output_text.strip()
@@ -172,3 +279,205 @@ def code_nonverbal_cues(client: OpenAI, chunk_text: str) -> dict[str, Any]:
         )
         cue_type = "Laughter" if any_cues == "YES" else ""
         return {"any_cues": any_cues, "cue_type": cue_type}
+
+
+def label_cluster(
+    client: OpenAI, excerpts: list[str], stats: CacheStats | None = None
+) -> dict[str, str]:
+    """Name and define the theme shared by a cluster's representative excerpts.
+
+    Returns a dict with keys:
+      - name: short theme name
+      - definition: one or two sentence definition
+    """
+    cfg = load_config()
+    joined = "\n\n".join(f"EXCERPT {i}:\n{text}" for i, text in enumerate(excerpts, 1))
+    response = _respond(
+        client,
+        CLUSTER_LABEL,
+        joined,
+        stats=stats,
+        model=cfg.llm_model,
+        reasoning={"effort": "low"},
+        text={
+            "format": {
+                "type": "json_schema",
+                "name": "cluster_label",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "definition": {"type": "string"},
+                    },
+                    "required": ["name", "definition"],
+                    "additionalProperties": False,
+                },
+            }
+        },
+    )
+    data = json.loads(response.output_text)
+    return {
+        "name": str(data["name"]).replace(":", " -").strip(),
+        "definition": str(data["definition"]).strip(),
+    }
+
+
+NONVERBAL_BATCH_SCHEMA: dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "chunk_id": {"type": "integer"},
+                    "any_cues": {"type": "string", "enum": ["YES", "NO"]},
+                    "cue_type": {"type": "string"},
+                },
+                "required": ["chunk_id", "any_cues", "cue_type"],
+                "additionalProperties": False,
+            },
+        }
+    },
+    "required": ["results"],
+    "additionalProperties": False,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token) used for packing requests."""
+    return len(text) // 4 + 1
+
+
+def pack_chunks(
+    chunks: list[tuple[int, str]], max_input_tokens: int
+) -> list[list[tuple[int, str]]]:
+    """Greedily pack (chunk_id, text) pairs into groups under a token budget.
+
+    A chunk larger than the budget on its own gets a group to itself.
+    """
+    packs: list[list[tuple[int, str]]] = []
+    current: list[tuple[int, str]] = []
+    used = 0
+    for chunk_id, text in chunks:
+        cost = estimate_tokens(text) + 10  # id header and separators
+        if current and used + cost > max_input_tokens:
+            packs.append(current)
+            current, used = [], 0
+        current.append((chunk_id, text))
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def format_pack(pack: list[tuple[int, str]]) -> str:
+    """Join a pack of (chunk_id, text) pairs under numbered chunk headers."""
+    return "\n\n".join(f"=== CHUNK {chunk_id} ===\n{text}" for chunk_id, text in pack)
+
+
+def _code_nonverbal_pack(
+    client: OpenAI, pack: list[tuple[int, str]], stats: CacheStats | None = None
+) -> dict[int, dict[str, str]]:
+    """Code one pack of chunks in a single schema-constrained request.
+
+    Chunks missing from the answer are left out of the result. A response
+    that is incomplete (e.g. cut off at the output-token cap), refused or not
+    valid JSON counts as missing every chunk of the pack.
+    """
+    cfg = load_config()
+    response = _respond(
+        client,
+        NONVERBAL_BATCH,
+        format_pack(pack),
+        stats=stats,
+        model=cfg.llm_model,
+        reasoning={"effort": "low"},
+        text={
+            "format": {
+                "type": "json_schema",
+                "name": "nonverbal_cues",
+                "strict": True,
+                "schema": NONVERBAL_BATCH_SCHEMA,
+            }
+        },
+    )
+    if getattr(response, "status", "completed") != "completed":
+        return {}
+    try:
+        items = json.loads(response.output_text)["results"]
+    except (ValueError, KeyError, TypeError):
+        return {}
+    wanted = {chunk_id for chunk_id, _ in pack}
+    out: dict[int, dict[str, str]] = {}
+    for item in items:
+        chunk_id = int(item["chunk_id"])
+        if chunk_id in wanted:
+            out[chunk_id] = {
+                "any_cues": item["any_cues"],
+                "cue_type": item["cue_type"].strip()
+                if item["any_cues"] == "YES"
+                else "",
+            }
+    return out
+
+
+def code_nonverbal_cues_batch(
+    client: OpenAI,
+    chunks: list[tuple[int, str]],
+    max_input_tokens: int = 6000,
+    max_attempts: int = 3,
+    stats: CacheStats | None = None,
+    journal: ResultJournal | None = None,
+) -> dict[int, dict[str, str]]:
+    """Code non-verbal cues for many chunks, packing several into each request.
+
+    `chunks` is a list of (chunk_id, text). Chunks are packed greedily up to
+    `max_input_tokens` per request and the model must answer with a strict JSON
+    schema. Any chunk missing from a response (including every chunk of a
+    truncated, refused or unparseable response) is re-queued into the next
+    round, which packs with half the token budget so a pack that overflowed
+    the output is split in two. A RuntimeError is raised if some are still
+    missing after `max_attempts`.
+
+    With a `journal`, each pack's results are persisted as soon as they arrive
+    and chunks already journaled for the current prompt version and text are
+    skipped.
+
+    Returns {chunk_id: {"any_cues": "YES"|"NO", "cue_type": str}}.
+    """
+    task, version = NONVERBAL_BATCH.name, NONVERBAL_BATCH.version
+    pending = [(int(chunk_id), text) for chunk_id, text in chunks]
+    digests = {chunk_id: text_digest(text) for chunk_id, text in pending}
+    results: dict[int, dict[str, str]] = {}
+    if journal is not None:
+        for chunk_id, _ in pending:
+            hit = journal.get((task, chunk_id, digests[chunk_id], version))
+            if hit is not None:
+                results[chunk_id] = hit
+        pending = [(cid, text) for cid, text in pending if cid not in results]
+
+    budget = max_input_tokens
+    for _ in range(max_attempts):
+        if not pending:
+            break
+        for pack in pack_chunks(pending, budget):
+            coded = _code_nonverbal_pack(client, pack, stats=stats)
+            if journal is not None:
+                journal.record_many(
+                    task,
+                    ((cid, digests[cid], res) for cid, res in coded.items()),
+                    version=version,
+                )
+            results.update(coded)
+        pending = [(cid, text) for cid, text in pending if cid not in results]
+        budget = max(budget // 2, 1)
+
+    if pending:
+        missing = [cid for cid, _ in pending]
+        raise RuntimeError(
+            f"No non-verbal coding returned for chunk ids {missing} "
+            f"after {max_attempts} attempts."
+        )
+    return results
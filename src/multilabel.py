@@ -0,0 +1,103 @@
+"""Vectorized multi-label theme assignment for large codebooks.
+
+Works on the chunk x theme similarity matrix instead of one DataFrame column
+per theme. A chunk is assigned every theme whose score clears that theme's
+threshold, limited to its `top_k` best themes (found with `argpartition`, so
+cost is linear in the number of themes). The result is a sparse CSR matrix
+holding the scores of the assigned cells, which can be exported to a long
+(chunk_id, theme, score, rank) table.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def _thresholds(thresholds: float | Sequence[float] | np.ndarray, m: int) -> np.ndarray:
+    arr = np.asarray(thresholds, dtype=np.float32)
+    if arr.ndim == 0:
+        return np.full(m, arr, dtype=np.float32)
+    if arr.shape != (m,):
+        raise ValueError(f"Expected {m} per-theme thresholds, got {arr.shape[0]}.")
+    return arr
+
+
+def assign_themes(
+    scores: np.ndarray,
+    thresholds: float | Sequence[float] | np.ndarray = 0.0,
+    top_k: int | None = 3,
+) -> sparse.csr_matrix:
+    """Assign themes from a dense (n_chunks, n_themes) score block.
+
+    Returns a CSR matrix of the same shape whose stored values are the scores
+    of the assigned (chunk, theme) cells.
+    """
+    n, m = scores.shape
+    thr = _thresholds(thresholds, m)
+
+    if top_k is None or top_k >= m:
+        rows, cols = np.nonzero(scores >= thr)
+        return sparse.csr_matrix(
+            (scores[rows, cols], (rows, cols)), shape=(n, m), dtype=np.float32
+        )
+
+    top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    keep = top_scores >= thr[top]
+    indptr = np.concatenate(([0], np.cumsum(keep.sum(axis=1))))
+    out = sparse.csr_matrix(
+        (top_scores[keep].astype(np.float32), top[keep], indptr), shape=(n, m)
+    )
+    out.sort_indices()
+    return out
+
+
+def classify_multilabel(
+    chunk_embeddings: np.ndarray,
+    theme_embeddings: np.ndarray,
+    thresholds: float | Sequence[float] | np.ndarray = 0.0,
+    top_k: int | None = 3,
+    batch_size: int = 20_000,
+) -> sparse.csr_matrix:
+    """Score and assign themes in row batches, never holding the full score matrix.
+
+    `chunk_embeddings` is (n_chunks, dim) and `theme_embeddings` is
+    (n_themes, dim); both are used as float32.
+    """
+    themes_t = np.ascontiguousarray(theme_embeddings, dtype=np.float32).T
+    blocks = []
+    for start in range(0, len(chunk_embeddings), batch_size):
+        batch = np.asarray(
+            chunk_embeddings[start : start + batch_size], dtype=np.float32
+        )
+        blocks.append(assign_themes(batch @ themes_t, thresholds, top_k))
+    if not blocks:
+        return sparse.csr_matrix((0, themes_t.shape[1]), dtype=np.float32)
+    return sparse.vstack(blocks, format="csr")
+
+
+def assignments_to_long(
+    assignments: sparse.csr_matrix,
+    chunk_ids: Sequence[int] | np.ndarray,
+    theme_names: Sequence[str],
+) -> pd.DataFrame:
+    """Export assignments as one row per (chunk, theme), best theme first.
+
+    Columns: chunk_id, theme, score, rank (1 = highest-scoring theme for the chunk).
+    """
+    coo = assignments.tocoo()
+    df = pd.DataFrame(
+        {
+            "chunk_id": np.asarray(chunk_ids)[coo.row],
+            "theme": np.asarray(theme_names, dtype=object)[coo.col],
+            "score": coo.data,
+            "_row": coo.row,
+        }
+    )
+    df = df.sort_values(["_row", "score"], ascending=[True, False], kind="stable")
+    df["rank"] = df.groupby("_row").cumcount() + 1
+    return df.drop(columns="_row").reset_index(drop=True)
@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
-from openai import OpenAI
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 
 @dataclass(frozen=True)
@@ -15,6 +18,9 @@ class ModelConfig:
     theme_extraction_model: str
     theme_extraction_reasoning_effort: str
     embedding_model: str
+    cascade_fast_model: str = "gpt-4.1-nano"
+    embedding_backend: str = "openai"
+    local_embedding_dim: int = 1024
 
 
 def load_config() -> ModelConfig:
@@ -26,6 +32,10 @@ def load_config() -> ModelConfig:
       - THEME_EXTRACTION_MODEL (default: gpt-5)
       - THEME_EXTRACTION_REASONING_EFFORT (default: high)
       - EMBEDDING_MODEL (default: text-embedding-3-large)
+      - CASCADE_FAST_MODEL (default: gpt-4.1-nano; must support logprobs)
+      - EMBEDDING_BACKEND (default: openai; `local` embeds offline, see
+        `src/embeddings.py`)
+      - LOCAL_EMBEDDING_DIM (default: 1024; dimension of the local backend)
     """
     load_dotenv()
 
@@ -36,15 +46,22 @@ def load_config() -> ModelConfig:
             "THEME_EXTRACTION_REASONING_EFFORT", "high"
         ),
         embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-large"),
+        cascade_fast_model=os.getenv("CASCADE_FAST_MODEL", "gpt-4.1-nano"),
+        embedding_backend=os.getenv("EMBEDDING_BACKEND", "openai").lower(),
+        local_embedding_dim=int(os.getenv("LOCAL_EMBEDDING_DIM", "1024")),
     )
 
 
 def get_client() -> OpenAI:
     """Create an OpenAI client using OPENAI_API_KEY from environment."""
+    from openai import OpenAI
+
+    from .profiling import instrument_client
+
     load_dotenv()
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError(
             "OPENAI_API_KEY is missing. Create a .env file (see .env.example) and set OPENAI_API_KEY."
         )
-    return OpenAI(api_key=api_key)
+    return instrument_client(OpenAI(api_key=api_key))
@@ -0,0 +1,370 @@
+"""Pre-flight estimate of the calls, tokens, cost and time a run will need.
+
+Nothing is sent to the API. Every prompt the run would send is rendered from
+the same `PromptTemplate`s the tasks use and its tokens are counted locally:
+exactly with `tiktoken` if it is installed, otherwise with the ~4
+characters-per-token heuristic (`estimate_tokens`). Output tokens cannot be
+counted in advance; they are projected per task from the constants below,
+including the hidden reasoning tokens that reasoning models bill as output.
+
+Calls are grouped by (stage, model) and projected to dollars with
+`ModelRates` and to wall-clock time under the configured concurrency and the
+model's requests- and tokens-per-minute limits, whichever binds first.
+Repeated prompt prefixes of at least `CACHE_MIN_TOKENS` are counted as
+cached input after their first use, as the provider's prompt cache would.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from .llm_tasks import estimate_tokens, format_pack, pack_chunks
+from .prompts import (
+    GENERAL_THEMES,
+    NONVERBAL_BATCH,
+    TRANSLATE,
+    YES_NO,
+    PromptTemplate,
+    codebook_block,
+)
+
+# Projected output tokens per call (visible answer only)
+TRANSLATION_RATIO = 1.1  # English output tokens per source token
+THEME_EXTRACTION_OUTPUT = 2500
+YES_NO_OUTPUT = 1
+NONVERBAL_OUTPUT_PER_CHUNK = 25
+
+# Hidden reasoning tokens per call, billed as output, by reasoning effort
+REASONING_TOKENS = {"minimal": 0, "low": 256, "medium": 1024, "high": 4096}
+
+CACHE_MIN_TOKENS = 1024
+MESSAGE_OVERHEAD = 4  # role and separators per message
+
+
+@dataclass(frozen=True)
+class ModelRates:
+    """USD prices per million tokens and the account's rate limits for a model."""
+
+    input_per_m: float
+    output_per_m: float = 0.0
+    cached_input_per_m: float | None = None
+    rpm: int = 500
+    tpm: int = 200_000
+
+
+# List prices and tier-1 limits at the time of writing; override with a JSON
+# file ({"model": {"input_per_m": ..., "rpm": ..., ...}}) when they differ.
+DEFAULT_RATES: dict[str, ModelRates] = {
+    "gpt-5": ModelRates(1.25, 10.0, 0.125, rpm=500, tpm=500_000),
+    "gpt-5-mini": ModelRates(0.25, 2.0, 0.025, rpm=500, tpm=500_000),
+    "gpt-5-nano": ModelRates(0.05, 0.40, 0.005, rpm=500, tpm=200_000),
+    "gpt-4.1-nano": ModelRates(0.10, 0.40, 0.025, rpm=500, tpm=200_000),
+    "text-embedding-3-large": ModelRates(0.13, rpm=3000, tpm=1_000_000),
+    "text-embedding-3-small": ModelRates(0.02, rpm=3000, tpm=1_000_000),
+}
+
+
+def load_rates(path: Path | None = None) -> dict[str, ModelRates]:
+    """Return the default rates, updated from a JSON file if given."""
+    rates = dict(DEFAULT_RATES)
+    if path is not None:
+        for model, values in json.loads(path.read_text(encoding="utf-8")).items():
+            rates[model] = ModelRates(**values)
+    return rates
+
+
+def is_reasoning_model(model: str) -> bool:
+    """Whether the model spends hidden reasoning tokens (gpt-5*, o-series)."""
+    return model.startswith(("gpt-5", "o1", "o3", "o4"))
+
+
+def reasoning_tokens(model: str, effort: str = "medium") -> int:
+    """Projected reasoning tokens per call for `model` at `effort`."""
+    return REASONING_TOKENS[effort] if is_reasoning_model(model) else 0
+
+
+@cache
+def _encoder(model: str) -> Any:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Count tokens with tiktoken if available, else estimate them."""
+    encoder = _encoder(model)
+    if encoder is None:
+        return estimate_tokens(text)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def message_tokens(messages: list[dict[str, str]], model: str) -> list[int]:
+    """Token count of each rendered message, including per-message overhead."""
+    return [count_tokens(m["content"], model) + MESSAGE_OVERHEAD for m in messages]
+
+
+@dataclass(frozen=True)
+class PlannedCall:
+    """One API request the run would make."""
+
+    stage: str
+    model: str
+    input_tokens: int
+    output_tokens: int = 0
+    cached_tokens: int = 0
+
+
+@dataclass
+class CallPlan:
+    """Every request of a run, built stage by stage."""
+
+    calls: list[PlannedCall] = field(default_factory=list)
+    _seen_prefixes: set[str] = field(default_factory=set, repr=False)
+
+    def add_prompts(
+        self,
+        stage: str,
+        template: PromptTemplate,
+        model: str,
+        items: Iterable[tuple[Mapping[str, Any] | None, str, int]],
+    ) -> None:
+        """Render and count one request per (shared context, text, output tokens)."""
+        for shared, text, output_tokens in items:
+            tokens = message_tokens(template.render(shared, text=text), model)
+            prefix = sum(tokens[:-1])
+            key = f"{model}:{template.cache_key(shared)}"
+            cached = (
+                prefix
+                if prefix >= CACHE_MIN_TOKENS and key in self._seen_prefixes
+                else 0
+            )
+            self._seen_prefixes.add(key)
+            self.calls.append(
+                PlannedCall(
+                    stage=stage,
+                    model=model,
+                    input_tokens=sum(tokens),
+                    output_tokens=output_tokens,
+                    cached_tokens=cached,
+                )
+            )
+
+    def add_embeddings(
+        self, stage: str, model: str, texts: list[str], batch_size: int = 256
+    ) -> None:
+        """Count embedding requests of `batch_size` inputs each."""
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start : start + batch_size]
+            self.calls.append(
+                PlannedCall(
+                    stage=stage,
+                    model=model,
+                    input_tokens=sum(count_tokens(t, model) for t in batch),
+                )
+            )
+
+
+def plan_run(
+    transcript: str,
+    chunks: list[tuple[int, str]],
+    theme_definitions: Mapping[str, str],
+    llm_model: str,
+    embedding_model: str | None,
+    theme_extraction_model: str,
+    theme_extraction_effort: str = "high",
+    nonverbal_chunks: list[tuple[int, str]] | None = None,
+    max_input_tokens: int = 6000,
+    questions: Iterable[str] = (),
+    translate: bool = True,
+    yes_no_samples: int = 1,
+    yes_no_chunks: list[tuple[int, str]] | None = None,
+    translated_chunks: Iterable[tuple[int, str]] = (),
+) -> CallPlan:
+    """Plan every request of the full workflow for one transcript.
+
+    Stages: translation of the transcript (unless `translate=False`), chunk,
+    research question and codebook embeddings, inductive theme extraction,
+    YES/NO coding of every (`yes_no_chunks`, theme) pair (`yes_no_samples`
+    per pair when voting), packed non-verbal coding of `nonverbal_chunks`
+    and the on-demand translation of `translated_chunks`, one request each.
+    `yes_no_chunks` and `nonverbal_chunks` default to `chunks`, the chunks
+    that are embedded. Chunks, questions and codebook themes are embedded
+    256 per request; `embedding_model=None` (the local backend) plans no
+    embedding requests.
+    """
+    plan = CallPlan()
+    if translate:
+        out = math.ceil(count_tokens(transcript, llm_model) * TRANSLATION_RATIO)
+        plan.add_prompts(
+            "translate",
+            TRANSLATE,
+            llm_model,
+            [(None, transcript, out + reasoning_tokens(llm_model))],
+        )
+
+    if embedding_model is not None:
+        plan.add_embeddings("embed", embedding_model, [text for _, text in chunks])
+        plan.add_embeddings("filter", embedding_model, list(questions))
+        plan.add_embeddings(
+            "classify", embedding_model, list(theme_definitions.values())
+        )
+
+    plan.add_prompts(
+        "extract",
+        GENERAL_THEMES,
+        theme_extraction_model,
+        [
+            (
+                None,
+                transcript,
+                THEME_EXTRACTION_OUTPUT
+                + reasoning_tokens(theme_extraction_model, theme_extraction_effort),
+            )
+        ],
+    )
+
+    yes_no_out = YES_NO_OUTPUT + reasoning_tokens(llm_model, "low")
+    codebook = codebook_block(theme_definitions.values())
+    plan.add_prompts(
+        "yes_no",
+        YES_NO,
+        llm_model,
+        (
+            ({"codebook": codebook, "theme_definition": definition}, text, yes_no_out)
+            for definition in theme_definitions.values()
+            for _, text in (chunks if yes_no_chunks is None else yes_no_chunks)
+            for _ in range(yes_no_samples)
+        ),
+    )
+
+    packs = pack_chunks(
+        chunks if nonverbal_chunks is None else nonverbal_chunks, max_input_tokens
+    )
+    plan.add_prompts(
+        "nonverbal",
+        NONVERBAL_BATCH,
+        llm_model,
+        (
+            (
+                None,
+                format_pack(pack),
+                NONVERBAL_OUTPUT_PER_CHUNK * len(pack)
+                + reasoning_tokens(llm_model, "low"),
+            )
+            for pack in packs
+        ),
+    )
+
+    plan.add_prompts(
+        "translate_output",
+        TRANSLATE,
+        llm_model,
+        (
+            (
+                None,
+                text,
+                math.ceil(count_tokens(text, llm_model) * TRANSLATION_RATIO)
+                + reasoning_tokens(llm_model),
+            )
+            for _, text in translated_chunks
+        ),
+    )
+    return plan
+
+
+def project(
+    plan: CallPlan,
+    rates: Mapping[str, ModelRates] | None = None,
+    concurrency: int = 8,
+    base_latency: float = 0.5,
+    output_tokens_per_second: float = 100.0,
+) -> pd.DataFrame:
+    """Project cost and wall-clock time per (stage, model).
+
+    Each call is assumed to take `base_latency` seconds plus its output at
+    `output_tokens_per_second`. Calls run `concurrency` at a time unless the
+    model's rpm or tpm limit is slower. Unknown models get NaN cost and are
+    only limited by concurrency.
+
+    Returns one row per (stage, model) with columns stage, model, calls,
+    input_tokens, cached_tokens, output_tokens, cost_usd and minutes, in the
+    order the stages were planned.
+    """
+    rates = DEFAULT_RATES if rates is None else rates
+    rows: dict[tuple[str, str], dict[str, Any]] = {}
+    for call in plan.calls:
+        row = rows.setdefault(
+            (call.stage, call.model),
+            {
+                "stage": call.stage,
+                "model": call.model,
+                "calls": 0,
+                "input_tokens": 0,
+                "cached_tokens": 0,
+                "output_tokens": 0,
+                "busy_seconds": 0.0,
+            },
+        )
+        row["calls"] += 1
+        row["input_tokens"] += call.input_tokens
+        row["cached_tokens"] += call.cached_tokens
+        row["output_tokens"] += call.output_tokens
+        row["busy_seconds"] += (
+            base_latency + call.output_tokens / output_tokens_per_second
+        )
+
+    for row in rows.values():
+        rate = rates.get(row["model"])
+        parallel = min(concurrency, row["calls"])
+        seconds = row.pop("busy_seconds") / max(parallel, 1)
+        if rate is None:
+            row["cost_usd"] = math.nan
+        else:
+            uncached = row["input_tokens"] - row["cached_tokens"]
+            cached_price = (
+                rate.input_per_m
+                if rate.cached_input_per_m is None
+                else rate.cached_input_per_m
+            )
+            row["cost_usd"] = (
+                uncached * rate.input_per_m
+                + row["cached_tokens"] * cached_price
+                + row["output_tokens"] * rate.output_per_m
+            ) / 1e6
+            seconds = max(
+                seconds,
+                row["calls"] / rate.rpm * 60,
+                (row["input_tokens"] + row["output_tokens"]) / rate.tpm * 60,
+            )
+        row["minutes"] = seconds / 60
+    return pd.DataFrame(
+        list(rows.values()),
+        columns=[
+            "stage",
+            "model",
+            "calls",
+            "input_tokens",
+            "cached_tokens",
+            "output_tokens",
+            "cost_usd",
+            "minutes",
+        ],
+    )
+
+
+def token_counter_name() -> str:
+    """Describe how tokens are being counted, for printing."""
+    return "tiktoken" if _encoder("gpt-4o") is not None else "~4 chars/token estimate"
@@ -0,0 +1,239 @@
+"""CPU, memory and API-wait profiling of a pipeline stage.
+
+`StageProfiler` wraps one stage run (`quali --profile <stage>`) and writes a
+bundle to `outputs/profiles/<stage>-<timestamp>/`:
+
+- `cprofile.prof`: cProfile stats of the main thread (open with snakeviz,
+  gprof2dot or `python -m pstats`); `cprofile.txt` lists the top functions.
+- `stacks.collapsed`: stacks of every thread, sampled every few milliseconds,
+  in the collapsed format of flamegraph.pl, speedscope and `py-spy --format
+  raw`. Unlike cProfile it also covers worker threads.
+- `memory.txt`: tracemalloc peak and the lines allocating the most memory.
+- `summary.json`: wall and CPU time, and time spent waiting on the API.
+
+API waits are measured by wrapping the client's `responses.create` and
+`embeddings.create`; `get_client` does this while a profiler is active. With
+concurrent requests the summed wait exceeds the wall time, so the wall time
+with at least one request in flight is reported as well.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+_active: StageProfiler | None = None
+
+
+class ApiTimer:
+    """Thread-safe record of API call intervals per endpoint."""
+
+    def __init__(self) -> None:
+        """Start with no calls recorded."""
+        self._lock = threading.Lock()
+        self.intervals: list[tuple[float, float]] = []
+        self.calls: Counter[str] = Counter()
+        self.seconds: Counter[str] = Counter()
+
+    def wrap(self, endpoint: str, fn: Any) -> Any:
+        """Return `fn` timed under `endpoint`."""
+
+        @functools.wraps(fn)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                with self._lock:
+                    self.intervals.append((start, end))
+                    self.calls[endpoint] += 1
+                    self.seconds[endpoint] += end - start
+
+        return timed
+
+    def in_flight_seconds(self) -> float:
+        """Wall time during which at least one call was in flight."""
+        total = 0.0
+        current_start = current_end = None
+        for start, end in sorted(self.intervals):
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    total += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            total += current_end - current_start
+        return total
+
+
+def instrument_client[C](client: C) -> C:
+    """Time the client's API calls if a profiler is active; return the client."""
+    if _active is None:
+        return client
+    timer = _active.api
+    for endpoint in ("responses", "embeddings"):
+        resource = getattr(client, endpoint, None)
+        if resource is not None:
+            resource.create = timer.wrap(endpoint, resource.create)
+    return client
+
+
+class StackSampler:
+    """Sample the stacks of all threads into collapsed-stack counts."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        """Prepare a sampler taking one sample every `interval` seconds."""
+        self.interval = interval
+        self.counts: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_qualname} "
+                        f"({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                    )
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                self.counts[";".join(reversed(stack))] += 1
+
+    def write(self, path: Path) -> None:
+        """Write `stack count` lines, most frequent first."""
+        with path.open("w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class StageProfiler:
+    """Context manager that profiles everything run inside it."""
+
+    def __init__(
+        self,
+        stage: str,
+        out_dir: Path = Path("outputs/profiles"),
+        memory: bool = True,
+        sample_interval: float = 0.005,
+        top: int = 40,
+    ) -> None:
+        """Configure a profile of `stage`, written under `out_dir`.
+
+        `memory=False` skips tracemalloc, which slows allocation-heavy code.
+        """
+        self.stage = stage
+        self.bundle = Path(out_dir) / f"{stage}-{time.strftime('%Y%m%d-%H%M%S')}"
+        self.memory = memory
+        self.top = top
+        self.api = ApiTimer()
+        self.sampler = StackSampler(sample_interval)
+        self.profile = cProfile.Profile()
+        self.summary: dict[str, Any] = {}
+
+    def __enter__(self) -> StageProfiler:
+        """Start all profilers."""
+        global _active
+        _active = self
+        if self.memory:
+            tracemalloc.start()
+        self.sampler.start()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Stop the profilers and write the bundle."""
+        global _active
+        self.profile.disable()
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        self.sampler.stop()
+        _active = None
+
+        self.bundle.mkdir(parents=True, exist_ok=True)
+        self.profile.dump_stats(self.bundle / "cprofile.prof")
+        text = io.StringIO()
+        pstats.Stats(self.profile, stream=text).sort_stats("cumulative").print_stats(
+            self.top
+        )
+        (self.bundle / "cprofile.txt").write_text(text.getvalue(), encoding="utf-8")
+        self.sampler.write(self.bundle / "stacks.collapsed")
+
+        in_flight = self.api.in_flight_seconds()
+        self.summary = {
+            "stage": self.stage,
+            "wall_seconds": round(wall, 3),
+            "cpu_seconds": round(cpu, 3),
+            "api_calls": dict(self.api.calls),
+            "api_wait_seconds": {k: round(v, 3) for k, v in self.api.seconds.items()},
+            "api_in_flight_seconds": round(in_flight, 3),
+            "wall_outside_api_seconds": round(wall - in_flight, 3),
+        }
+        if self.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            # leave out the profiler's own allocations (e.g. sampled stacks)
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, __file__),
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                ]
+            )
+            tracemalloc.stop()
+            self.summary["peak_memory_mb"] = round(peak / 2**20, 1)
+            lines = [f"Peak traced memory: {peak / 2**20:.1f} MiB", ""]
+            for stat in snapshot.statistics("lineno")[: self.top]:
+                lines.append(str(stat))
+            (self.bundle / "memory.txt").write_text(
+                "\n".join(lines) + "\n", encoding="utf-8"
+            )
+        (self.bundle / "summary.json").write_text(
+            json.dumps(self.summary, indent=2), encoding="utf-8"
+        )
+
+    def report(self) -> str:
+        """Human-readable summary for printing."""
+        s = self.summary
+        calls = sum(s["api_calls"].values())
+        lines = [
+            f"Profile of '{self.stage}': {self.bundle}",
+            f"  wall time:            {s['wall_seconds']:8.2f} s",
+            f"  CPU time (process):   {s['cpu_seconds']:8.2f} s",
+            f"  API calls in flight:  {s['api_in_flight_seconds']:8.2f} s "
+            f"({calls} calls, {sum(s['api_wait_seconds'].values()):.2f} s summed)",
+            f"  wall outside API:     {s['wall_outside_api_seconds']:8.2f} s",
+        ]
+        if "peak_memory_mb" in s:
+            lines.append(f"  peak traced memory:   {s['peak_memory_mb']:8.1f} MiB")
+        return "\n".join(lines)
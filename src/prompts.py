@@ -0,0 +1,355 @@
+"""Prompt templates laid out for provider-side prompt caching.
+
+Providers cache the longest previously seen prefix of a request. Every template
+therefore renders in a fixed order, from most to least static:
+
+1. developer instructions (identical for every request of the template),
+2. shared context such as the theme definition, codebook or few-shot examples
+   (identical within a sweep or group),
+3. the per-item content (chunk text, transcript), always last.
+
+Sweeps queue their requests theme by theme, so that requests sharing a prefix
+run back-to-back, and `CacheStats` records how many input tokens were served
+from the cache.
+
+Providers only cache prefixes of at least 1024 tokens, so the high-volume
+templates carry their stable material up front: YES_NO starts with a coding
+guide and worked examples followed by the whole codebook (`codebook_block`),
+and only then the theme being coded; NONVERBAL_BATCH starts with a notation
+guide and worked examples. With a codebook the size of the sample one, both
+prefixes pass the minimum and are shared by every request of a sweep.
+`quali estimate` applies the same threshold.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A prompt split into static instructions, shared context and per-item task."""
+
+    name: str
+    version: str
+    instructions: str
+    task: str
+    context: str = ""
+
+    def render(
+        self, shared: Mapping[str, Any] | None = None, **item: Any
+    ) -> list[dict[str, str]]:
+        """Return Responses API input messages, static content first."""
+        messages = [{"role": "developer", "content": self.instructions}]
+        context = self.context.format(**(shared or {}))
+        if context:
+            messages.append({"role": "user", "content": context})
+        messages.append({"role": "user", "content": self.task.format(**item)})
+        return messages
+
+    def cache_key(self, shared: Mapping[str, Any] | None = None) -> str:
+        """Stable key for the static prefix, sent as `prompt_cache_key`."""
+        context = self.context.format(**(shared or {}))
+        digest = hashlib.sha256(context.encode("utf-8")).hexdigest()[:16]
+        return f"{self.name}-{self.version}-{digest}"
+
+
+def codebook_block(definitions: Iterable[str]) -> str:
+    """Render codebook definitions as the shared YES_NO context ('' if none)."""
+    lines = [f"- {d.strip()}" for d in definitions]
+    if not lines:
+        return ""
+    return (
+        "CODEBOOK (every theme in this study, for reference; code only the "
+        "THEME below):\n" + "\n".join(lines) + "\n\n"
+    )
+
+
+@dataclass
+class CacheStats:
+    """Thread-safe tally of input tokens and cached input tokens per template."""
+
+    per_template: dict[str, dict[str, int]] = field(default_factory=dict)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def record(self, template: str, response: Any) -> None:
+        """Add the usage of one Responses API call."""
+        usage = getattr(response, "usage", None)
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        details = getattr(usage, "input_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        with self._lock:
+            row = self.per_template.setdefault(
+                template, {"requests": 0, "input_tokens": 0, "cached_tokens": 0}
+            )
+            row["requests"] += 1
+            row["input_tokens"] += input_tokens
+            row["cached_tokens"] += cached
+
+    @property
+    def input_tokens(self) -> int:
+        """Total input tokens across templates."""
+        return sum(r["input_tokens"] for r in self.per_template.values())
+
+    @property
+    def cached_tokens(self) -> int:
+        """Total cached input tokens across templates."""
+        return sum(r["cached_tokens"] for r in self.per_template.values())
+
+    @property
+    def cached_ratio(self) -> float:
+        """Share of input tokens served from the prompt cache."""
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def summary(self) -> str:
+        """One line per template plus a total, for printing."""
+        lines = []
+        for name, r in sorted(self.per_template.items()):
+            ratio = r["cached_tokens"] / r["input_tokens"] if r["input_tokens"] else 0
+            lines.append(
+                f"{name:24} {r['requests']:6d} requests "
+                f"{r['input_tokens']:10d} input tokens  {ratio:6.1%} cached"
+            )
+        lines.append(
+            f"{'TOTAL':24} {sum(r['requests'] for r in self.per_template.values()):6d} requests "
+            f"{self.input_tokens:10d} input tokens  {self.cached_ratio:6.1%} cached"
+        )
+        return "\n".join(lines)
+
+
+TRANSLATE = PromptTemplate(
+    name="translate",
+    version="1",
+    instructions="You are a translator specializing in Spanish-to-English transcripts.",
+    context=(
+        "Translate the Spanish transcript below into English. "
+        "Keep formatting as close as possible."
+    ),
+    task="TRANSCRIPT:\n{text}",
+)
+
+CANDIDATE_THEMES = PromptTemplate(
+    name="candidate_themes",
+    version="1",
+    instructions=(
+        "You are a PhD-level qualitative researcher. Your job is to propose a codebook (themes) from focus group transcripts. "
+        "Use rigorous, research-appropriate language."
+    ),
+    context=(
+        "I will give you an English focus group transcript.\n"
+        "Please extract candidate themes specifically relevant to the research question below.\n"
+        "Return two sections: 'Helps integration' and 'Hinders integration'.\n\n"
+        "RESEARCH QUESTION:\n{research_question}"
+    ),
+    task="TRANSCRIPT:\n{text}",
+)
+
+GENERAL_THEMES = PromptTemplate(
+    name="general_themes",
+    version="1",
+    instructions=(
+        "You are a PhD-level qualitative researcher. Your job is to analyze "
+        "focus group transcripts and identify recurring themes, patterns, and topics. "
+        "Use rigorous, research-appropriate language."
+    ),
+    context=(
+        "I will give you a focus group transcript.\n"
+        "Please read through the entire transcript and identify the main themes, patterns, and topics discussed.\n"
+        "For each theme:\n"
+        "1. Provide a clear, concise theme name\n"
+        "2. Write a detailed definition (1-2 sentences)\n"
+        "3. Mention key examples or quotes that illustrate the theme\n\n"
+        "Organize themes logically and aim for 8-15 distinct themes that capture the breadth of discussion."
+    ),
+    task="TRANSCRIPT:\n{text}",
+)
+
+YES_NO = PromptTemplate(
+    name="yes_no",
+    version="2",
+    instructions=(
+        "You are a PhD qualitative researcher coding transcript chunks. "
+        "Decide whether the CHUNK substantively discusses the THEME. "
+        "Only output one token: YES or NO.\n\n"
+        "Coding guide:\n"
+        "- Chunks come from focus groups with facilitators, program staff and "
+        "caregivers. A chunk is one moderator question and the answers to it, "
+        "so it may cover several topics; code YES if any part of it "
+        "substantively discusses the THEME.\n"
+        "- Substantive means the speakers describe, explain, evaluate or give "
+        "an example of what the theme defines. A passing mention of a keyword, "
+        "a name or a topic without saying anything about it is NO.\n"
+        "- The moderator's question alone does not make a chunk YES; the "
+        "answers must engage with the theme.\n"
+        "- Code what is said, not what could be inferred. Do not code YES "
+        "because the theme would be plausible in this setting.\n"
+        "- Themes in the codebook can overlap. Code each theme on its own "
+        "definition: a chunk can be YES for several themes, or for none.\n"
+        "- Negative statements count: describing the absence, failure or "
+        "opposite of what the theme defines is still discussing it (YES).\n"
+        "- Chunks may be in Spanish or English. Code the meaning, not the "
+        "wording; transcript notes in brackets such as (risas) or [inaudible] "
+        "are not content.\n\n"
+        "Worked examples (themes from other studies):\n"
+        "THEME: Transport barriers: Distance, cost or lack of transport that "
+        "kept participants from attending.\n"
+        "CHUNK: MODERATOR: What made it hard to come? P1: The bus only passes "
+        "twice a day, so with the baby I sometimes just could not get there.\n"
+        "Answer: YES\n\n"
+        "THEME: Transport barriers: Distance, cost or lack of transport that "
+        "kept participants from attending.\n"
+        "CHUNK: MODERATOR: What did you like most? P2: The songs. We came by "
+        "bus and the kids sang them all the way home.\n"
+        "Answer: NO (transport is mentioned, not as a barrier)\n\n"
+        "THEME: Peer support: Caregivers helping, advising or encouraging one "
+        "another during or after sessions.\n"
+        "CHUNK: P3: At first nobody talked. P1: Yes, there was no trust, we "
+        "did not share anything with each other.\n"
+        "Answer: YES (the absence of peer support is discussed)\n\n"
+        "THEME: Staff workload: Time pressure and competing duties of program "
+        "staff.\n"
+        "CHUNK: MODERATOR: How was the schedule for you? P4: Fine, the session "
+        "was on Tuesdays. (risas) MODERATOR: Good, let's move on.\n"
+        "Answer: NO\n\n"
+        "THEME: Child engagement: How children took part in and responded to "
+        "the activities.\n"
+        "CHUNK: P2: Mi hija ahora pide cantar la canción del lavado de manos "
+        "todos los días, y la enseñó a su hermano.\n"
+        "Answer: YES (the child's response to an activity, told after the "
+        "session)\n\n"
+        "In your reply, output only YES or NO, without the explanation."
+    ),
+    context="{codebook}THEME:\n{theme_definition}",
+    task="CHUNK:\n{text}",
+)
+
+NONVERBAL = PromptTemplate(
+    name="nonverbal",
+    version="1",
+    instructions="You are a qualitative researcher extracting non-verbal cues from transcript notes.",
+    context=(
+        "From the CHUNK below, detect whether there is any explicit non-verbal cue info (e.g., laughter, pauses, confusion). "
+        'Return ONLY valid JSON with exactly these keys: {{"any_cues": "YES"|"NO", "cue_type": <short string or empty>}}.'
+    ),
+    task="CHUNK:\n{text}",
+)
+
+NONVERBAL_BATCH = PromptTemplate(
+    name="nonverbal_batch",
+    version="2",
+    instructions=(
+        "You are a qualitative researcher extracting non-verbal cues from "
+        "transcript notes.\n\n"
+        "Notation guide:\n"
+        "- Transcribers mark what is not speech with short annotations in "
+        "parentheses or brackets, in Spanish or English, e.g. (risas), "
+        "(laughter), [pausa], [silencio], (inaudible), [ininteligible], "
+        "(hablan al mismo tiempo), [crosstalk], (suspira), (llora), (tose), "
+        "(aplausos), (asiente), (gesto), [ruido]. Some are written out in "
+        "words, e.g. (minuto 2 no se le entiende) or [several voices].\n"
+        "- A cue is explicit when such an annotation is present, or when the "
+        "text itself states a non-verbal behaviour: a speaker pausing, "
+        "laughing, crying, sighing, staying silent, or the moderator noting "
+        "that someone nods or that people talk over each other.\n"
+        "- Speech about emotions is not a cue. 'I laughed a lot in the "
+        "sessions' or 'it made me want to cry' is what a participant says, "
+        "not what happened in the room; code it NO unless an annotation is "
+        "also present.\n"
+        "- Hesitation written as ellipses (...) or repeated words is not a "
+        "cue by itself; code it only when the transcriber marks a pause.\n"
+        "- Speaker labels, timestamps, section headers and the moderator's "
+        "questions are not cues.\n"
+        "- Use a short lowercase English cue_type naming the kind of cue: "
+        "laughter, pause, silence, inaudible, crosstalk, sigh, crying, "
+        "cough, applause, nodding, gesture, noise, or another one or two "
+        "words if none fits. List several kinds separated by commas when a "
+        "chunk has more than one, most frequent first.\n"
+        "- Annotations describing the recording rather than the people, e.g. "
+        "(se corta el audio) or [recording resumes], are cues of type "
+        "inaudible when they mean speech was lost, and are not cues "
+        "otherwise.\n"
+        "- Singing, clapping a rhythm or imitating an activity during the "
+        "focus group, when annotated, is a cue of type singing or gesture.\n\n"
+        "Worked examples:\n"
+        "=== CHUNK 101 ===\n"
+        "MODERADORA: ¿Qué les pareció la sesión? P1: Muy bonita (risas), los "
+        "niños bailaron todo el rato. P2: Sí (risas).\n"
+        "Result: chunk_id 101, any_cues YES, cue_type laughter\n\n"
+        "=== CHUNK 102 ===\n"
+        "P3: Para mí fue difícil [pausa] porque mi hijo no quería entrar. "
+        "(hablan al mismo tiempo) MODERADORA: Una a la vez, por favor.\n"
+        "Result: chunk_id 102, any_cues YES, cue_type pause, crosstalk\n\n"
+        "=== CHUNK 103 ===\n"
+        "P4: Me reí mucho con las canciones, y los niños también se reían.\n"
+        "Result: chunk_id 103, any_cues NO, cue_type empty (laughter is "
+        "described, not annotated)\n\n"
+        "=== CHUNK 104 ===\n"
+        "MODERATOR: Anything else? P2: Well... I don't know... maybe the "
+        "schedule.\n"
+        "Result: chunk_id 104, any_cues NO, cue_type empty (ellipses only)\n\n"
+        "=== CHUNK 105 ===\n"
+        "P5: Lo que más me costó fue (minuto 14 no se le entiende) y después "
+        "ya me acostumbré. (suspira)\n"
+        "Result: chunk_id 105, any_cues YES, cue_type inaudible, sigh\n\n"
+        "=== CHUNK 106 ===\n"
+        "MODERATOR: Did the staff help you? P1: Yes. [P2 nods] P3: They "
+        "always explained things again when we did not understand.\n"
+        "Result: chunk_id 106, any_cues YES, cue_type nodding\n\n"
+        "=== CHUNK 107 ===\n"
+        "P2: Hubo un silencio muy largo cuando la facilitadora preguntó por "
+        "los castigos, nadie quería hablar.\n"
+        "Result: chunk_id 107, any_cues YES, cue_type silence (the speaker "
+        "reports a silence in the room)\n\n"
+        "=== CHUNK 108 ===\n"
+        "[00:32:10] MODERADORA: Pasemos a la siguiente pregunta. ¿Cómo se "
+        "organizaban con los horarios del jardín?\n"
+        "Result: chunk_id 108, any_cues NO, cue_type empty (timestamp and "
+        "question only)\n\n"
+        "=== CHUNK 109 ===\n"
+        "P6: The room was loud [noise of children playing] [inaudible] so we "
+        "moved outside. (laughs) P1: (laughs) Yes, to the yard.\n"
+        "Result: chunk_id 109, any_cues YES, cue_type laughter, noise, "
+        "inaudible\n\n"
+        "=== CHUNK 110 ===\n"
+        "P4: (canta) 'A lavarse las manos...' (risas) Esa la cantamos en "
+        "la casa. [se corta el audio] P2: ...y por eso volvimos.\n"
+        "Result: chunk_id 110, any_cues YES, cue_type singing, laughter, "
+        "inaudible\n\n"
+        "=== CHUNK 111 ===\n"
+        "P3: My husband says I get quiet and sad after the meetings, but it "
+        "is good for me to talk about it.\n"
+        "Result: chunk_id 111, any_cues NO, cue_type empty (feelings told, "
+        "nothing observed)\n\n"
+        "Chunks in one request are independent: judge each on its own text "
+        "only, never on the chunks around it. Return exactly one result for "
+        "every chunk, in the order given, and never invent chunk ids."
+    ),
+    context=(
+        "For EACH chunk below, detect whether there is any explicit non-verbal cue info (e.g., laughter, pauses, confusion). "
+        "Return one result per chunk, using the number after 'CHUNK' as chunk_id. "
+        "cue_type is a short string, or empty when any_cues is NO."
+    ),
+    task="{text}",
+)
+
+CLUSTER_LABEL = PromptTemplate(
+    name="cluster_label",
+    version="1",
+    instructions=(
+        "You are a PhD-level qualitative researcher building a codebook from "
+        "clusters of focus group transcript excerpts."
+    ),
+    context=(
+        "The excerpts below are the most typical members of one cluster. "
+        "Identify the single theme they share.\n"
+        "Give a concise theme name (a few words, no colons) and a 1-2 sentence "
+        "definition a coder could apply to new excerpts."
+    ),
+    task="{text}",
+)
@@ -0,0 +1,127 @@
+"""Relevance scoring of many research questions against all chunks at once.
+
+All questions are embedded in one batched request and scored against the
+chunk `EmbeddingMatrix` with a single matrix product per block of chunks.
+Each question keeps the chunks scoring at least its threshold, optionally
+only its `top_k` best. The result is a long (question, chunk_id, score, rank)
+table, so dozens of questions cost one pass over the chunk matrix.
+
+A questions file is either a JSON list or plain text with one question per
+line (blank lines and lines starting with "#" are skipped). JSON entries may
+be strings or objects {"question", "threshold", "top_k"} overriding the
+defaults for that question.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from .embedding_matrix import EmbeddingMatrix
+from .embeddings import get_embeddings
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+DEFAULT_QUESTION = (
+    "What helped facilitators integrate Bloom with Love into existing family services?"
+)
+
+
+@dataclass(frozen=True)
+class ResearchQuestion:
+    """A question, optionally with its own threshold and top-k."""
+
+    text: str
+    threshold: float | None = None
+    top_k: int | None = None
+
+
+def parse_question(item: str | dict) -> ResearchQuestion:
+    """Parse a questions-file entry (a string or a JSON object)."""
+    if isinstance(item, str):
+        return ResearchQuestion(text=item.strip())
+    return ResearchQuestion(
+        text=item["question"].strip(),
+        threshold=item.get("threshold"),
+        top_k=item.get("top_k"),
+    )
+
+
+def load_questions(path: Path) -> list[ResearchQuestion]:
+    """Load research questions from a JSON list or a one-per-line text file."""
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        return [parse_question(item) for item in json.loads(text)]
+    return [
+        ResearchQuestion(text=line.strip())
+        for line in text.splitlines()
+        if line.strip() and not line.lstrip().startswith("#")
+    ]
+
+
+def score_questions(
+    client: OpenAI | None,
+    chunks: EmbeddingMatrix,
+    questions: Sequence[str | ResearchQuestion],
+    threshold: float = 0.20,
+    top_k: int | None = None,
+    batch_size: int = 50_000,
+) -> pd.DataFrame:
+    """Score every question against every chunk and keep the relevant pairs.
+
+    `threshold` and `top_k` apply to questions that do not set their own.
+    Returns columns question, chunk_id, score and rank (1 = most relevant),
+    sorted by question (input order) then rank.
+    """
+    qs = [ResearchQuestion(q) if isinstance(q, str) else q for q in questions]
+    q_matrix = np.asarray(
+        get_embeddings(client, [q.text for q in qs]), dtype=np.float32
+    )
+    thr = np.array(
+        [threshold if q.threshold is None else q.threshold for q in qs],
+        dtype=np.float32,
+    )
+    ks = [top_k if q.top_k is None else q.top_k for q in qs]
+    # Per block, keep at most max_k candidates per question; the global top-k
+    # of a question is always among the union of its per-block top-k.
+    max_k = None if any(k is None for k in ks) else max(ks, default=0)
+
+    q_idx, pos, score = [], [], []
+    for start in range(0, len(chunks), batch_size):
+        block = np.asarray(chunks.vectors[start : start + batch_size], dtype=np.float32)
+        scores = q_matrix @ block.T  # (n_questions, block rows)
+        if max_k is not None and max_k < scores.shape[1]:
+            cols = np.argpartition(-scores, max_k - 1, axis=1)[:, :max_k]
+        else:
+            cols = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        top = np.take_along_axis(scores, cols, axis=1)
+        rows, j = np.nonzero(top >= thr[:, None])
+        q_idx.append(rows)
+        pos.append(cols[rows, j] + start)
+        score.append(top[rows, j])
+
+    q_idx = np.concatenate(q_idx) if q_idx else np.empty(0, dtype=np.intp)
+    pos = np.concatenate(pos) if pos else np.empty(0, dtype=np.intp)
+    score = np.concatenate(score) if score else np.empty(0, dtype=np.float32)
+
+    order = np.lexsort((-score, q_idx))
+    out = pd.DataFrame(
+        {
+            "q": q_idx[order],
+            "chunk_id": chunks.chunk_ids[pos[order]],
+            "score": score[order],
+        }
+    )
+    out["rank"] = out.groupby("q").cumcount() + 1
+    limits = np.array([np.inf if k is None else k for k in ks])
+    out = out[out["rank"].to_numpy() <= limits[out["q"].to_numpy()]]
+    out.insert(0, "question", [qs[i].text for i in out["q"]])
+    return out.drop(columns="q").reset_index(drop=True)
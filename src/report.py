@@ -0,0 +1,833 @@
+"""Streaming HTML reports for theme classification and non-verbal coding.
+
+Rows are grouped once, each group's columns are pulled out as NumPy arrays,
+and the page is written straight to the output file. All transcript text is
+HTML-escaped before it is written.
+
+The static reports hold every shown chunk in one file, which stalls the
+browser for large corpora. The `*_paged` variants write a small HTML shell
+plus one data shard per page of each group (`<report>_data/<group>_<page>.js`)
+and render pages on demand, with client-side pagination and search. Shards
+are compact JSON wrapped in a callback and loaded with <script> tags, which,
+unlike fetch(), also works when the report is opened straight from disk.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from html import escape
+from pathlib import Path
+from typing import TextIO
+
+import numpy as np
+import pandas as pd
+
+from .coding import Theme
+
+# best chunks per theme shown by `write_theme_report`
+EXEMPLARS_PER_THEME = 10
+
+_THEME_CSS = """\
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background: #f5f5f5;
+            line-height: 1.6;
+        }
+        .container {
+            max-width: 1200px;
+            margin: 0 auto;
+            background: white;
+            padding: 30px;
+            border-radius: 8px;
+            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+        }
+        h1 {
+            color: #2c3e50;
+            border-bottom: 3px solid #3498db;
+            padding-bottom: 10px;
+        }
+        h2 {
+            color: #34495e;
+            margin-top: 30px;
+            cursor: pointer;
+            padding: 15px;
+            background: #ecf0f1;
+            border-radius: 5px;
+            user-select: none;
+        }
+        h2:hover {
+            background: #dfe6e9;
+        }
+        .theme-summary {
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
+            gap: 20px;
+            margin: 30px 0;
+        }
+        .theme-card {
+            background: #fff;
+            border: 2px solid #e0e0e0;
+            border-radius: 8px;
+            padding: 20px;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.05);
+        }
+        .theme-card h3 {
+            margin: 0 0 10px 0;
+            color: #3498db;
+            font-size: 0.9em;
+        }
+        .theme-card .count {
+            font-size: 2em;
+            font-weight: bold;
+            color: #2c3e50;
+        }
+        .theme-card .avg-score {
+            color: #7f8c8d;
+            font-size: 0.9em;
+        }
+        .chunk {
+            background: #f8f9fa;
+            border-left: 4px solid #3498db;
+            padding: 15px;
+            margin: 10px 0;
+            border-radius: 4px;
+        }
+        .chunk-meta {
+            font-size: 0.85em;
+            color: #7f8c8d;
+            margin-bottom: 8px;
+        }
+        .score {
+            display: inline-block;
+            background: #3498db;
+            color: white;
+            padding: 3px 8px;
+            border-radius: 3px;
+            font-weight: bold;
+            font-size: 0.85em;
+        }
+        .chunk-text {
+            color: #2c3e50;
+            white-space: pre-wrap;
+            max-height: 200px;
+            overflow-y: auto;
+        }
+        .theme-content {
+            display: none;
+            margin-top: 10px;
+        }
+        .theme-content.active {
+            display: block;
+        }
+        .toggle-indicator {
+            float: right;
+            font-size: 0.8em;
+            color: #7f8c8d;
+        }
+        .stats {
+            background: #e8f4f8;
+            padding: 15px;
+            border-radius: 5px;
+            margin: 20px 0;
+        }
+"""
+
+_NONVERBAL_CSS = """\
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background: #f5f5f5;
+            line-height: 1.6;
+        }
+        .container {
+            max-width: 1200px;
+            margin: 0 auto;
+            background: white;
+            padding: 30px;
+            border-radius: 8px;
+            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+        }
+        h1 {
+            color: #2c3e50;
+            border-bottom: 3px solid #e74c3c;
+            padding-bottom: 10px;
+        }
+        h2 {
+            color: #34495e;
+            margin-top: 30px;
+            cursor: pointer;
+            padding: 15px;
+            background: #ecf0f1;
+            border-radius: 5px;
+            user-select: none;
+        }
+        h2:hover {
+            background: #dfe6e9;
+        }
+        .stats {
+            background: #fee;
+            padding: 20px;
+            border-radius: 5px;
+            margin: 20px 0;
+            border-left: 4px solid #e74c3c;
+        }
+        .stats-grid {
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+            gap: 15px;
+            margin-top: 15px;
+        }
+        .stat-card {
+            background: white;
+            padding: 15px;
+            border-radius: 5px;
+            text-align: center;
+        }
+        .stat-number {
+            font-size: 2em;
+            font-weight: bold;
+            color: #e74c3c;
+        }
+        .stat-label {
+            color: #7f8c8d;
+            font-size: 0.9em;
+        }
+        .cue-type-section {
+            margin: 30px 0;
+        }
+        .chunk {
+            background: #f8f9fa;
+            border-left: 4px solid #e74c3c;
+            padding: 15px;
+            margin: 10px 0;
+            border-radius: 4px;
+        }
+        .chunk-meta {
+            font-size: 0.85em;
+            color: #7f8c8d;
+            margin-bottom: 8px;
+        }
+        .cue-badge {
+            display: inline-block;
+            background: #e74c3c;
+            color: white;
+            padding: 3px 10px;
+            border-radius: 3px;
+            font-weight: bold;
+            font-size: 0.85em;
+            margin-left: 10px;
+        }
+        .chunk-text {
+            color: #2c3e50;
+            white-space: pre-wrap;
+            max-height: 300px;
+            overflow-y: auto;
+            background: white;
+            padding: 10px;
+            border-radius: 3px;
+        }
+        .no-cues {
+            color: #95a5a6;
+            font-style: italic;
+            padding: 20px;
+            text-align: center;
+            background: #ecf0f1;
+            border-radius: 5px;
+        }
+        .toggle-indicator {
+            float: right;
+            font-size: 0.8em;
+            color: #7f8c8d;
+        }
+        .cue-content {
+            display: none;
+            margin-top: 10px;
+        }
+        .cue-content.active {
+            display: block;
+        }
+"""
+
+_TOGGLE_SCRIPT = """
+    <script>
+        function {name}(id) {{
+            const content = document.getElementById(id);
+            content.classList.toggle('active');
+        }}
+    </script>
+</body>
+</html>
+"""
+
+
+def _write_head(f: TextIO, title: str, css: str) -> None:
+    """Write the document head and open the page container."""
+    f.write(
+        '<!DOCTYPE html>\n<html lang="es">\n<head>\n'
+        '    <meta charset="UTF-8">\n'
+        '    <meta name="viewport" content="width=device-width, initial-scale=1.0">\n'
+        f"    <title>{escape(title)}</title>\n"
+        "    <style>\n"
+    )
+    f.write(css)
+    f.write('    </style>\n</head>\n<body>\n    <div class="container">\n')
+
+
+def _write_tail(f: TextIO, toggle_fn: str) -> None:
+    """Close the page container and write the toggle script."""
+    f.write("    </div>\n")
+    f.write(_TOGGLE_SCRIPT.format(name=toggle_fn))
+
+
+def _group_indices(labels: pd.Series) -> dict[str, np.ndarray]:
+    """Map each label to the positional indices of its rows (one hash pass)."""
+    return labels.groupby(labels.to_numpy(), sort=False).indices
+
+
+def _top_n_desc(scores: np.ndarray, n: int) -> np.ndarray:
+    """Return positions of the `n` highest scores, highest first."""
+    if len(scores) > n:
+        part = np.argpartition(-scores, n - 1)[:n]
+        return part[np.argsort(-scores[part], kind="stable")]
+    return np.argsort(-scores, kind="stable")
+
+
+def _write_chunks(f: TextIO, metas: Iterable[str], texts: Iterable[str]) -> None:
+    """Write one `.chunk` block per row from pre-rendered metadata markup."""
+    for meta, text in zip(metas, texts, strict=True):
+        f.write(
+            '\n            <div class="chunk">\n'
+            '                <div class="chunk-meta">\n'
+            f"                    {meta}\n"
+            "                </div>\n"
+            f'                <div class="chunk-text">{escape(text)}</div>\n'
+            "            </div>\n"
+        )
+
+
+def theme_exemplar_ids(
+    df: pd.DataFrame,
+    theme_names: Iterable[str],
+    label_col: str = "most_similar_theme",
+    top_n: int = EXEMPLARS_PER_THEME,
+) -> list[int]:
+    """Chunk ids that `write_theme_report` shows: the `top_n` best per theme."""
+    groups = _group_indices(df[label_col])
+    chunk_ids = df["chunk_id"].to_numpy()
+    out: list[int] = []
+    for name in theme_names:
+        idx = groups.get(name)
+        if idx is not None:
+            scores = df[name].to_numpy()[idx]
+            out.extend(int(c) for c in chunk_ids[idx[_top_n_desc(scores, top_n)]])
+    return out
+
+
+def write_theme_report(
+    df: pd.DataFrame,
+    themes: list[Theme],
+    output_path: Path,
+    label_col: str = "most_similar_theme",
+    top_n: int = EXEMPLARS_PER_THEME,
+    preview_chars: int = 500,
+    text_col: str = "text",
+) -> None:
+    """Write an interactive HTML report of theme classification.
+
+    Expects one similarity column per theme (named by `short_name`) plus the
+    label column from `classify_by_max_theme`. Shows the `top_n` best-scoring
+    chunks per theme, taking their text from `text_col`.
+    """
+    groups = _group_indices(df[label_col])
+    chunk_ids = df["chunk_id"].to_numpy()
+    texts = df[text_col].to_numpy()
+
+    with output_path.open("w", encoding="utf-8") as f:
+        _write_head(f, "Clasificación Temática - Resultados", _THEME_CSS)
+        f.write(
+            "        <h1>📊 Clasificación Temática de Chunks</h1>\n\n"
+            '        <div class="stats">\n'
+            f"            <strong>Total de chunks analizados:</strong> {len(df)}<br>\n"
+            f"            <strong>Total de temas:</strong> {len(themes)}\n"
+            "        </div>\n\n"
+            "        <h2>Resumen por Tema</h2>\n"
+            '        <div class="theme-summary">\n'
+        )
+
+        # Pull each theme's scores for its own rows once; reused below.
+        theme_scores: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for t in themes:
+            idx = groups.get(t.short_name, np.empty(0, dtype=np.intp))
+            scores = df[t.short_name].to_numpy()[idx]
+            theme_scores[t.short_name] = (idx, scores)
+            avg_score = float(scores.mean()) if len(scores) else 0.0
+            f.write(
+                '\n            <div class="theme-card">\n'
+                f"                <h3>{escape(t.short_name)}</h3>\n"
+                f'                <div class="count">{len(idx)}</div>\n'
+                f'                <div class="avg-score">Score promedio: {avg_score:.3f}</div>\n'
+                "            </div>\n"
+            )
+
+        f.write("\n        </div>\n\n        <h2>Chunks por Tema</h2>\n")
+
+        for i, t in enumerate(themes):
+            idx, scores = theme_scores[t.short_name]
+            if len(idx) == 0:
+                continue
+            order = _top_n_desc(scores, top_n)
+            rows = idx[order]
+            f.write(
+                f"\n        <h2 onclick=\"toggleTheme('theme-{i}')\">\n"
+                f"            {escape(t.short_name)} ({len(idx)} chunks)\n"
+                '            <span class="toggle-indicator">▼ Click para expandir</span>\n'
+                "        </h2>\n"
+                f'        <div id="theme-{i}" class="theme-content">\n'
+                f"            <p><strong>Definición:</strong> {escape(t.full_definition)}</p>\n"
+            )
+            previews = (
+                text[:preview_chars] + "..." if len(text) > preview_chars else text
+                for text in texts[rows]
+            )
+            metas = (
+                f'<span class="score">Score: {s:.3f}</span>\n'
+                f"                    Chunk ID: {escape(str(cid))}"
+                for s, cid in zip(scores[order], chunk_ids[rows], strict=True)
+            )
+            _write_chunks(f, metas, previews)
+            f.write("\n        </div>\n")
+
+        _write_tail(f, "toggleTheme")
+
+
+def nonverbal_report_ids(
+    df: pd.DataFrame, flag_col: str = "any_nonverbal_cue"
+) -> list[int]:
+    """Chunk ids both non-verbal reports show: every chunk flagged YES."""
+    return [int(c) for c in df.loc[df[flag_col] == "YES", "chunk_id"]]
+
+
+def write_nonverbal_report(
+    df: pd.DataFrame,
+    output_path: Path,
+    flag_col: str = "any_nonverbal_cue",
+    type_col: str = "cue_type",
+    text_col: str = "text",
+) -> None:
+    """Write an interactive HTML report of non-verbal cue coding.
+
+    Chunks flagged YES are grouped by cue type, largest group first, and shown
+    with their text from `text_col`.
+    """
+    total_chunks = len(df)
+    flagged = df[df[flag_col] == "YES"]
+    chunks_with_cues = len(flagged)
+    pct = chunks_with_cues / total_chunks * 100 if total_chunks > 0 else 0
+
+    cue_types = flagged[type_col].fillna("").astype(str)
+    groups = _group_indices(cue_types)
+    ordered = sorted(groups.items(), key=lambda kv: len(kv[1]), reverse=True)
+    chunk_ids = flagged["chunk_id"].to_numpy()
+    texts = flagged[text_col].to_numpy()
+
+    with output_path.open("w", encoding="utf-8") as f:
+        _write_head(f, "Códigos No Verbales - Resultados", _NONVERBAL_CSS)
+        f.write(
+            "        <h1>🎭 Análisis de Códigos No Verbales</h1>\n\n"
+            '        <div class="stats">\n'
+            "            <strong>Resumen General</strong>\n"
+            '            <div class="stats-grid">\n'
+            '                <div class="stat-card">\n'
+            f'                    <div class="stat-number">{total_chunks}</div>\n'
+            '                    <div class="stat-label">Total chunks analizados</div>\n'
+            "                </div>\n"
+            '                <div class="stat-card">\n'
+            f'                    <div class="stat-number">{chunks_with_cues}</div>\n'
+            '                    <div class="stat-label">Chunks con señales no verbales</div>\n'
+            "                </div>\n"
+            '                <div class="stat-card">\n'
+            f'                    <div class="stat-number">{pct:.1f}%</div>\n'
+            '                    <div class="stat-label">Porcentaje con señales</div>\n'
+            "                </div>\n"
+            "            </div>\n"
+            "        </div>\n"
+        )
+
+        if ordered:
+            f.write("\n        <h2>Tipos de Señales No Verbales</h2>\n")
+            for i, (cue_type, idx) in enumerate(ordered):
+                if not cue_type.strip():
+                    continue
+                label = escape(cue_type)
+                f.write(
+                    f"\n        <h2 onclick=\"toggleCue('cue-{i}')\">\n"
+                    f"            {label} ({len(idx)} chunks)\n"
+                    '            <span class="toggle-indicator">▼ Click para expandir</span>\n'
+                    "        </h2>\n"
+                    f'        <div id="cue-{i}" class="cue-content">\n'
+                )
+                metas = (
+                    f"Chunk ID: {escape(str(cid))}\n"
+                    f'                    <span class="cue-badge">{label}</span>'
+                    for cid in chunk_ids[idx]
+                )
+                _write_chunks(f, metas, texts[idx])
+                f.write("\n        </div>\n")
+        else:
+            f.write(
+                '\n        <div class="no-cues">\n'
+                "            No se detectaron señales no verbales en los chunks analizados.\n"
+                "        </div>\n"
+            )
+
+        _write_tail(f, "toggleCue")
+
+
+_PAGED_CSS = """\
+        .pager {
+            display: flex;
+            gap: 10px;
+            align-items: center;
+            margin: 10px 0;
+            color: #7f8c8d;
+            font-size: 0.9em;
+        }
+        .pager input {
+            flex: 1;
+            padding: 6px 10px;
+            border: 1px solid #ccc;
+            border-radius: 4px;
+        }
+        .pager button {
+            padding: 5px 12px;
+            border: 1px solid #ccc;
+            border-radius: 4px;
+            background: white;
+            cursor: pointer;
+        }
+        .pager button:disabled {
+            cursor: default;
+            opacity: 0.4;
+        }
+"""
+
+_PAGED_SCRIPT = """
+    <script>
+        const DATA_DIR = {data_dir};
+        const PAGE_SIZE = {page_size};
+        const GROUPS = {groups};
+        const BADGE_CLASS = {badge_class};
+        const BADGE_FIRST = {badge_first};
+        const cache = {{}};
+        const waiting = {{}};
+        const state = GROUPS.map(() => ({{ page: 0, query: "", shown: false }}));
+
+        function qualiReportPage(group, page, rows) {{
+            const key = group + "/" + page;
+            cache[key] = rows;
+            (waiting[key] || []).forEach((resolve) => resolve(rows));
+            delete waiting[key];
+        }}
+
+        function loadPage(group, page) {{
+            const key = group + "/" + page;
+            if (key in cache) return Promise.resolve(cache[key]);
+            return new Promise((resolve) => {{
+                if (waiting[key]) {{ waiting[key].push(resolve); return; }}
+                waiting[key] = [resolve];
+                const script = document.createElement("script");
+                script.src = DATA_DIR + "/" + group + "_" + page + ".js";
+                document.head.appendChild(script);
+            }});
+        }}
+
+        async function matches(group, query) {{
+            const pages = [];
+            for (let p = 0; p < GROUPS[group].pages; p++) pages.push(loadPage(group, p));
+            const q = query.toLowerCase();
+            return (await Promise.all(pages)).flat().filter(
+                (row) => String(row[0]) === q || row[1].toLowerCase().includes(q)
+            );
+        }}
+
+        function renderRow(group, row) {{
+            const chunk = document.createElement("div");
+            chunk.className = "chunk";
+            const meta = document.createElement("div");
+            meta.className = "chunk-meta";
+            const badge = document.createElement("span");
+            badge.className = BADGE_CLASS;
+            badge.textContent = row[2] || GROUPS[group].badge;
+            const id = document.createTextNode(" Chunk ID: " + row[0] + " ");
+            if (BADGE_FIRST) meta.append(badge, id); else meta.append(id, badge);
+            const text = document.createElement("div");
+            text.className = "chunk-text";
+            text.textContent = row[1];
+            chunk.append(meta, text);
+            return chunk;
+        }}
+
+        async function render(group) {{
+            const s = state[group];
+            let rows, pages;
+            if (s.query) {{
+                const found = await matches(group, s.query);
+                pages = Math.max(1, Math.ceil(found.length / PAGE_SIZE));
+                s.page = Math.min(s.page, pages - 1);
+                rows = found.slice(s.page * PAGE_SIZE, (s.page + 1) * PAGE_SIZE);
+            }} else {{
+                pages = GROUPS[group].pages;
+                rows = await loadPage(group, s.page);
+            }}
+            const list = document.getElementById("rows-" + group);
+            list.replaceChildren(...rows.map((row) => renderRow(group, row)));
+            document.getElementById("info-" + group).textContent =
+                "Página " + (s.page + 1) + " de " + pages;
+            document.getElementById("prev-" + group).disabled = s.page === 0;
+            document.getElementById("next-" + group).disabled = s.page >= pages - 1;
+        }}
+
+        function toggleGroup(group) {{
+            const content = document.getElementById("group-" + group);
+            content.classList.toggle("active");
+            if (!state[group].shown) {{
+                state[group].shown = true;
+                render(group);
+            }}
+        }}
+
+        function turnPage(group, step) {{
+            state[group].page = Math.max(0, state[group].page + step);
+            render(group);
+        }}
+
+        const timers = {{}};
+        function search(group, value) {{
+            clearTimeout(timers[group]);
+            timers[group] = setTimeout(() => {{
+                state[group].query = value.trim();
+                state[group].page = 0;
+                render(group);
+            }}, 250);
+        }}
+    </script>
+</body>
+</html>
+"""
+
+
+def _paged_data_dir(output_path: Path) -> Path:
+    return output_path.with_name(output_path.stem + "_data")
+
+
+def _write_paged(
+    output_path: Path,
+    title: str,
+    css: str,
+    header: str,
+    groups: list[tuple[str, str, str, list[list[object]]]],
+    badge_class: str,
+    badge_first: bool,
+    content_class: str,
+    page_size: int,
+) -> None:
+    """Write the HTML shell and the page shards of a paged report.
+
+    `groups` holds (heading, intro HTML, default badge, rows); each row is
+    [chunk_id, text, badge or None].
+    """
+    data_dir = _paged_data_dir(output_path)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for stale in data_dir.glob("*.js"):
+        stale.unlink()
+
+    meta = []
+    for g, (heading, _, badge, rows) in enumerate(groups):
+        pages = max(1, -(-len(rows) // page_size))
+        for p in range(pages):
+            shard = json.dumps(
+                rows[p * page_size : (p + 1) * page_size],
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            (data_dir / f"{g}_{p}.js").write_text(
+                f"qualiReportPage({g},{p},{shard});\n", encoding="utf-8"
+            )
+        meta.append({"label": heading, "badge": badge, "pages": pages})
+
+    with output_path.open("w", encoding="utf-8") as f:
+        _write_head(f, title, css + _PAGED_CSS)
+        f.write(header)
+        for g, (heading, intro, _, rows) in enumerate(groups):
+            f.write(
+                f'\n        <h2 onclick="toggleGroup({g})">\n'
+                f"            {escape(heading)} ({len(rows)} chunks)\n"
+                '            <span class="toggle-indicator">▼ Click para expandir</span>\n'
+                "        </h2>\n"
+                f'        <div id="group-{g}" class="{content_class}">\n'
+                f"{intro}"
+                '            <div class="pager">\n'
+                f'                <input type="search" placeholder="Buscar texto o chunk ID" oninput="search({g}, this.value)">\n'
+                f'                <button id="prev-{g}" onclick="turnPage({g}, -1)">◀</button>\n'
+                f'                <span id="info-{g}"></span>\n'
+                f'                <button id="next-{g}" onclick="turnPage({g}, 1)">▶</button>\n'
+                "            </div>\n"
+                f'            <div id="rows-{g}"></div>\n'
+                "        </div>\n"
+            )
+        f.write("    </div>\n")
+        f.write(
+            _PAGED_SCRIPT.format(
+                data_dir=json.dumps(data_dir.name),
+                page_size=page_size,
+                groups=json.dumps(meta, ensure_ascii=False).replace("</", "<\\/"),
+                badge_class=json.dumps(badge_class),
+                badge_first=json.dumps(badge_first),
+            )
+        )
+
+
+def write_theme_report_paged(
+    df: pd.DataFrame,
+    themes: list[Theme],
+    output_path: Path,
+    label_col: str = "most_similar_theme",
+    text_col: str = "text",
+    page_size: int = 50,
+) -> None:
+    """Write the theme report as an HTML shell plus lazily loaded page shards.
+
+    Unlike `write_theme_report`, every chunk of each theme is listed (best
+    score first), `page_size` per page, with search; the HTML file itself only
+    holds the summary.
+    """
+    groups = _group_indices(df[label_col])
+    chunk_ids = df["chunk_id"].to_numpy()
+    texts = df[text_col].to_numpy()
+
+    cards = []
+    sections = []
+    for t in themes:
+        idx = groups.get(t.short_name, np.empty(0, dtype=np.intp))
+        scores = df[t.short_name].to_numpy()[idx]
+        avg_score = float(scores.mean()) if len(scores) else 0.0
+        cards.append(
+            '\n            <div class="theme-card">\n'
+            f"                <h3>{escape(t.short_name)}</h3>\n"
+            f'                <div class="count">{len(idx)}</div>\n'
+            f'                <div class="avg-score">Score promedio: {avg_score:.3f}</div>\n'
+            "            </div>\n"
+        )
+        if len(idx) == 0:
+            continue
+        order = np.argsort(-scores, kind="stable")
+        rows = [
+            [int(cid), str(text), f"Score: {s:.3f}"]
+            for cid, text, s in zip(
+                chunk_ids[idx[order]], texts[idx[order]], scores[order], strict=True
+            )
+        ]
+        intro = f"            <p><strong>Definición:</strong> {escape(t.full_definition)}</p>\n"
+        sections.append((t.short_name, intro, "", rows))
+
+    header = (
+        "        <h1>📊 Clasificación Temática de Chunks</h1>\n\n"
+        '        <div class="stats">\n'
+        f"            <strong>Total de chunks analizados:</strong> {len(df)}<br>\n"
+        f"            <strong>Total de temas:</strong> {len(themes)}\n"
+        "        </div>\n\n"
+        "        <h2>Resumen por Tema</h2>\n"
+        '        <div class="theme-summary">\n'
+        + "".join(cards)
+        + "\n        </div>\n\n        <h2>Chunks por Tema</h2>\n"
+    )
+    _write_paged(
+        output_path,
+        "Clasificación Temática - Resultados",
+        _THEME_CSS,
+        header,
+        sections,
+        badge_class="score",
+        badge_first=True,
+        content_class="theme-content",
+        page_size=page_size,
+    )
+
+
+def write_nonverbal_report_paged(
+    df: pd.DataFrame,
+    output_path: Path,
+    flag_col: str = "any_nonverbal_cue",
+    type_col: str = "cue_type",
+    text_col: str = "text",
+    page_size: int = 50,
+) -> None:
+    """Write the non-verbal report as an HTML shell plus lazily loaded shards."""
+    total_chunks = len(df)
+    flagged = df[df[flag_col] == "YES"]
+    chunks_with_cues = len(flagged)
+    pct = chunks_with_cues / total_chunks * 100 if total_chunks > 0 else 0
+
+    cue_types = flagged[type_col].fillna("").astype(str)
+    groups = _group_indices(cue_types)
+    ordered = sorted(groups.items(), key=lambda kv: len(kv[1]), reverse=True)
+    chunk_ids = flagged["chunk_id"].to_numpy()
+    texts = flagged[text_col].to_numpy()
+
+    sections = [
+        (
+            cue_type,
+            "",
+            cue_type,
+            [
+                [int(cid), str(text), None]
+                for cid, text in zip(chunk_ids[idx], texts[idx], strict=True)
+            ],
+        )
+        for cue_type, idx in ordered
+        if cue_type.strip()
+    ]
+
+    header = (
+        "        <h1>🎭 Análisis de Códigos No Verbales</h1>\n\n"
+        '        <div class="stats">\n'
+        "            <strong>Resumen General</strong>\n"
+        '            <div class="stats-grid">\n'
+        '                <div class="stat-card">\n'
+        f'                    <div class="stat-number">{total_chunks}</div>\n'
+        '                    <div class="stat-label">Total chunks analizados</div>\n'
+        "                </div>\n"
+        '                <div class="stat-card">\n'
+        f'                    <div class="stat-number">{chunks_with_cues}</div>\n'
+        '                    <div class="stat-label">Chunks con señales no verbales</div>\n'
+        "                </div>\n"
+        '                <div class="stat-card">\n'
+        f'                    <div class="stat-number">{pct:.1f}%</div>\n'
+        '                    <div class="stat-label">Porcentaje con señales</div>\n'
+        "                </div>\n"
+        "            </div>\n"
+        "        </div>\n"
+    )
+    if sections:
+        header += "\n        <h2>Tipos de Señales No Verbales</h2>\n"
+    else:
+        header += (
+            '\n        <div class="no-cues">\n'
+            "            No se detectaron señales no verbales en los chunks analizados.\n"
+            "        </div>\n"
+        )
+    _write_paged(
+        output_path,
+        "Códigos No Verbales - Resultados",
+        _NONVERBAL_CSS,
+        header,
+        sections,
+        badge_class="cue-badge",
+        badge_first=False,
+        content_class="cue-content",
+        page_size=page_size,
+    )
@@ -0,0 +1,107 @@
+"""On-demand translation of the chunks that reach the outputs.
+
+`text-embedding-3-large` is multilingual, so chunking, embedding and coding
+can run on the Spanish source. Translating the whole transcript up front
+(step 01) is then unnecessary; only chunks a stage actually shows are
+translated (top relevant chunks, theme exemplars, cue examples).
+
+`translate_chunks` sends them concurrently and caches every translation in a
+`ResultJournal`, keyed by chunk id and a digest of the source text. A later
+stage or rerun that shows the same chunk pays nothing, and an edited chunk is
+translated again.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from .journal import ResultJournal, text_digest
+from .llm_tasks import translate_to_english
+from .prompts import TRANSLATE, CacheStats
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+DEFAULT_CACHE = Path("outputs/journal/translations.jsonl")
+
+
+def translate_chunks(
+    client: OpenAI,
+    chunks: Iterable[tuple[int, str]],
+    cache: ResultJournal | None = None,
+    max_workers: int = 8,
+    stats: CacheStats | None = None,
+) -> dict[int, str]:
+    """Translate (chunk_id, text) pairs to English, reusing cached translations.
+
+    Returns {chunk_id: english_text}.
+    """
+    todo = {int(chunk_id): text for chunk_id, text in chunks}
+    out: dict[int, str] = {}
+    if cache is not None:
+        for chunk_id, text in list(todo.items()):
+            hit = cache.get(
+                (TRANSLATE.name, chunk_id, text_digest(text), TRANSLATE.version)
+            )
+            if hit is not None:
+                out[chunk_id] = hit["english"]
+                del todo[chunk_id]
+
+    def translate(item: tuple[int, str]) -> str:
+        chunk_id, text = item
+        english = translate_to_english(client, text, stats=stats)
+        if cache is not None:
+            cache.record(
+                TRANSLATE.name,
+                chunk_id,
+                {"english": english},
+                theme=text_digest(text),
+                version=TRANSLATE.version,
+            )
+        return english
+
+    items = list(todo.items())
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        out.update(zip(todo, pool.map(translate, items), strict=True))
+    return out
+
+
+def with_translations(
+    df: pd.DataFrame,
+    translations: Mapping[int, str],
+    text_col: str = "text",
+    out_col: str = "text_en",
+) -> pd.DataFrame:
+    """Add `out_col`: the translation where available, else the source text."""
+    df = df.copy()
+    df[out_col] = [
+        translations.get(int(chunk_id), text)
+        for chunk_id, text in zip(df["chunk_id"], df[text_col], strict=True)
+    ]
+    return df
+
+
+def translate_selected(
+    client: OpenAI,
+    df: pd.DataFrame,
+    chunk_ids: Iterable[int],
+    cache_path: Path = DEFAULT_CACHE,
+    max_workers: int = 8,
+) -> pd.DataFrame:
+    """Translate only the given chunks of `df` and add them as a `text_en` column."""
+    wanted = {int(c) for c in chunk_ids}
+    selected = df[df["chunk_id"].astype(int).isin(wanted)]
+    with ResultJournal(cache_path) as cache:
+        translations = translate_chunks(
+            client,
+            zip(selected["chunk_id"], selected["text"], strict=True),
+            cache=cache,
+            max_workers=max_workers,
+        )
+    print(f"Translated {len(translations)}/{len(df)} chunks selected for output.")
+    return with_translations(df, translations)
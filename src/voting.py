@@ -0,0 +1,210 @@
+"""Self-consistency voting with early stopping for YES/NO theme coding.
+
+A single sampled answer is noisy; voting over `max_samples` answers is more
+reliable but multiplies the cost. Here samples are drawn in waves: each wave
+holds the fewest extra votes that could settle the outcome, all sent
+concurrently, and voting stops as soon as the majority can no longer change.
+With the default of three samples, a pair the model answers consistently
+costs two calls and only split pairs get a third.
+
+Every result records the vote counts and a confidence score (the winning
+share of valid votes), so borderline pairs are visible downstream.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from .llm_tasks import code_yes_no_for_theme
+from .prompts import CacheStats, codebook_block
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+@dataclass
+class VoteStats:
+    """Call counts and how many samples pairs needed."""
+
+    pairs: int = 0
+    calls: int = 0
+    # number of samples drawn -> number of pairs
+    samples_used: Counter[int] = field(default_factory=Counter)
+    unanimous: int = 0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def record(self, result: Mapping[str, Any]) -> None:
+        """Add the outcome of one pair."""
+        with self._lock:
+            self.pairs += 1
+            self.calls += result["samples"]
+            self.samples_used[result["samples"]] += 1
+            self.unanimous += result["confidence"] == 1.0
+
+    @property
+    def calls_per_pair(self) -> float:
+        """Average number of samples per pair."""
+        return self.calls / self.pairs if self.pairs else 0.0
+
+    def summary(self) -> str:
+        """Human-readable counts for printing."""
+        lines = [
+            f"pairs: {self.pairs}",
+            f"calls: {self.calls} ({self.calls_per_pair:.2f} per pair)",
+            f"unanimous: {self.unanimous}",
+        ]
+        lines += [
+            f"  {n} samples: {count} pairs"
+            for n, count in sorted(self.samples_used.items())
+        ]
+        return "\n".join(lines)
+
+
+def wave_size(yes: int, no: int, drawn: int, max_samples: int) -> int:
+    """Return the fewest extra votes that could settle the majority (0 if settled).
+
+    Ties resolve to NO (see `tally`), so YES is settled once its lead exceeds
+    the votes left, and NO once its lead (zero on a tie) reaches them.
+    Invalid answers use up a sample without counting for either side.
+    """
+    remaining = max_samples - drawn
+    if yes > no:
+        lead = yes - no
+        if lead > remaining:
+            return 0
+        return (remaining - lead) // 2 + 1
+    lead = no - yes
+    if lead >= remaining:
+        return 0
+    return (remaining - lead + 1) // 2
+
+
+def tally(answers: list[str]) -> dict[str, Any]:
+    """Summarize sampled answers as a vote result.
+
+    Returns a dict with keys:
+      - answer: 'YES'|'NO' by majority ('NO' on a tie)
+      - yes, no: vote counts
+      - abstained: empty or unparseable answers, which count for neither side
+      - samples: number of answers drawn
+      - confidence: the answer's share of the YES/NO votes
+    """
+    yes = answers.count("YES")
+    no = answers.count("NO")
+    answer = "YES" if yes > no else "NO"
+    valid = yes + no
+    return {
+        "answer": answer,
+        "yes": yes,
+        "no": no,
+        "abstained": len(answers) - valid,
+        "samples": len(answers),
+        "confidence": max(yes, no) / valid if valid else 0.0,
+    }
+
+
+def _sample(
+    client: OpenAI,
+    chunk_text: str,
+    theme_definition: str,
+    stats: CacheStats | None,
+    codebook: str,
+) -> str:
+    return code_yes_no_for_theme(
+        client, chunk_text, theme_definition, stats=stats, codebook=codebook
+    ).strip(".")
+
+
+def code_yes_no_vote(
+    client: OpenAI,
+    chunk_text: str,
+    theme_definition: str,
+    max_samples: int = 3,
+    stats: VoteStats | None = None,
+    cache_stats: CacheStats | None = None,
+    codebook: str = "",
+) -> dict[str, Any]:
+    """Code one (chunk, theme) pair by majority vote with early stopping.
+
+    `codebook` is passed on to `code_yes_no_for_theme`. Returns the dict
+    described in `tally`.
+    """
+    answers: list[str] = []
+    with ThreadPoolExecutor(max_workers=max_samples) as pool:
+        while n := wave_size(
+            answers.count("YES"), answers.count("NO"), len(answers), max_samples
+        ):
+            answers += pool.map(
+                lambda _: _sample(
+                    client, chunk_text, theme_definition, cache_stats, codebook
+                ),
+                range(n),
+            )
+    result = tally(answers)
+    if stats is not None:
+        stats.record(result)
+    return result
+
+
+def vote_sweep(
+    client: OpenAI,
+    chunks: list[tuple[int, str]],
+    theme_definitions: Mapping[str, str],
+    max_samples: int = 3,
+    max_workers: int = 8,
+    stats: VoteStats | None = None,
+    cache_stats: CacheStats | None = None,
+) -> dict[tuple[int, str], dict[str, Any]]:
+    """Vote on every (chunk, theme) pair, in waves across all pairs.
+
+    Each wave sends the next samples of every unsettled pair through one
+    thread pool, grouped by theme so shared prompt prefixes stay cached.
+
+    Returns {(chunk_id, theme_name): result of `tally`}.
+    """
+    codebook = codebook_block(theme_definitions.values())
+    pairs = [
+        (int(chunk_id), text, name)
+        for name in theme_definitions
+        for chunk_id, text in chunks
+    ]
+    answers: dict[tuple[int, str], list[str]] = {
+        (chunk_id, name): [] for chunk_id, _, name in pairs
+    }
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            wave = [
+                (chunk_id, text, name)
+                for chunk_id, text, name in pairs
+                for _ in range(
+                    wave_size(
+                        answers[chunk_id, name].count("YES"),
+                        answers[chunk_id, name].count("NO"),
+                        len(answers[chunk_id, name]),
+                        max_samples,
+                    )
+                )
+            ]
+            if not wave:
+                break
+            results = pool.map(
+                lambda p: _sample(
+                    client, p[1], theme_definitions[p[2]], cache_stats, codebook
+                ),
+                wave,
+            )
+            for (chunk_id, _, name), answer in zip(wave, results, strict=True):
+                answers[chunk_id, name].append(answer)
+
+    out = {key: tally(votes) for key, votes in answers.items()}
+    if stats is not None:
+        for result in out.values():
+            stats.record(result)
+    return out
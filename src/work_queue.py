@@ -0,0 +1,423 @@
+"""SQLite work queue for spreading LLM coding across processes or machines.
+
+Items are (task, chunk_id, theme) rows with a JSON payload. Any number of
+workers sharing the database file pull from it:
+
+- `lease` atomically claims up to n pending items for `lease_seconds`. Items
+  whose lease has expired (their worker died or hung) are handed out again.
+- While a worker holds items, a heartbeat thread keeps extending their leases.
+- `complete` stores the result only if the item is not already done, so a
+  result from a worker that lost its lease is harmless; the first write wins.
+- `fail` returns the item to the queue, or marks it failed after
+  `max_attempts`.
+- Rate-limit (429) and timeout errors are not failures of the item: `defer`
+  releases it without counting an attempt, as an unowned lease that expires
+  (and is re-dispatched) after the backoff. The worker that hit the limit
+  also pauses for that long, honouring `Retry-After`, so adding workers
+  saturates a shared rate limit instead of burning attempts against it.
+
+Leased items are ordered by (task, theme), so each worker sends requests that
+share a prompt prefix back-to-back. The database relies on SQLite file
+locking; use a local disk or a shared filesystem with working POSIX locks.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .cascade import code_yes_no_cascade
+from .llm_tasks import code_nonverbal_cues, code_yes_no_for_theme, translate_to_english
+from .prompts import codebook_block
+from .voting import code_yes_no_vote
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    task TEXT NOT NULL,
+    chunk_id INTEGER NOT NULL,
+    theme TEXT NOT NULL DEFAULT '',
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated REAL,
+    PRIMARY KEY (task, chunk_id, theme)
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status, task, theme);
+"""
+
+ItemKey = tuple[str, int, str]
+
+
+@dataclass(frozen=True)
+class WorkItem:
+    """One unit of work: a task applied to a chunk (and optionally a theme)."""
+
+    task: str
+    chunk_id: int
+    payload: dict[str, Any]
+    theme: str = ""
+
+    @property
+    def key(self) -> ItemKey:
+        """Primary key in the queue."""
+        return (self.task, self.chunk_id, self.theme)
+
+
+class WorkQueue:
+    """Lease-based queue stored in a SQLite file."""
+
+    def __init__(
+        self, path: Path, lease_seconds: float = 120.0, max_attempts: int = 5
+    ) -> None:
+        """Open (creating if needed) the queue database at `path`."""
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 60000")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, items: Iterable[WorkItem]) -> int:
+        """Add items; ones already in the queue are left untouched.
+
+        Returns the number of new items.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO items (task, chunk_id, theme, payload, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        i.task,
+                        int(i.chunk_id),
+                        i.theme,
+                        json.dumps(i.payload, ensure_ascii=False),
+                        time.time(),
+                    )
+                    for i in items
+                ),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return conn.total_changes - before
+
+    def lease(self, worker_id: str, n: int = 1) -> list[WorkItem]:
+        """Claim up to `n` pending or lease-expired items for `worker_id`."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE items SET status = ?, error = 'lease expired', "
+                "lease_owner = NULL, updated = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, self.max_attempts),
+            )
+            rows = conn.execute(
+                "SELECT task, chunk_id, theme, payload FROM items "
+                "WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                "ORDER BY task, theme, chunk_id LIMIT ?",
+                (PENDING, LEASED, now, n),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE items SET status = ?, lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? "
+                "WHERE task = ? AND chunk_id = ? AND theme = ?",
+                (
+                    (LEASED, worker_id, now + self.lease_seconds, now, t, c, th)
+                    for t, c, th, _ in rows
+                ),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [
+            WorkItem(task=t, chunk_id=c, theme=th, payload=json.loads(p))
+            for t, c, th, p in rows
+        ]
+
+    def heartbeat(self, worker_id: str, keys: Iterable[ItemKey]) -> int:
+        """Extend the leases `worker_id` still holds; returns how many."""
+        expires = time.time() + self.lease_seconds
+        cur = self._conn().executemany(
+            "UPDATE items SET lease_expires = ? "
+            "WHERE task = ? AND chunk_id = ? AND theme = ? "
+            "AND status = ? AND lease_owner = ?",
+            ((expires, t, c, th, LEASED, worker_id) for t, c, th in keys),
+        )
+        return cur.rowcount
+
+    def complete(self, key: ItemKey, result: dict[str, Any]) -> bool:
+        """Store a result unless the item is already done (idempotent).
+
+        Returns False if another worker completed it first.
+        """
+        cur = self._conn().execute(
+            "UPDATE items SET status = ?, result = ?, lease_owner = NULL, "
+            "error = NULL, updated = ? "
+            "WHERE task = ? AND chunk_id = ? AND theme = ? AND status != ?",
+            (DONE, json.dumps(result, ensure_ascii=False), time.time(), *key, DONE),
+        )
+        return cur.rowcount == 1
+
+    def fail(self, worker_id: str, key: ItemKey, error: str) -> None:
+        """Release a leased item after an error; give up after `max_attempts`."""
+        self._conn().execute(
+            "UPDATE items SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+            "error = ?, lease_owner = NULL, updated = ? "
+            "WHERE task = ? AND chunk_id = ? AND theme = ? "
+            "AND status = ? AND lease_owner = ?",
+            (
+                self.max_attempts,
+                FAILED,
+                PENDING,
+                error,
+                time.time(),
+                *key,
+                LEASED,
+                worker_id,
+            ),
+        )
+
+    def defer(self, worker_id: str, key: ItemKey, delay: float, error: str) -> None:
+        """Release a leased item for `delay` seconds without counting an attempt."""
+        now = time.time()
+        self._conn().execute(
+            "UPDATE items SET lease_owner = NULL, lease_expires = ?, "
+            "attempts = MAX(attempts - 1, 0), error = ?, updated = ? "
+            "WHERE task = ? AND chunk_id = ? AND theme = ? "
+            "AND status = ? AND lease_owner = ?",
+            (now + delay, error, now, *key, LEASED, worker_id),
+        )
+
+    def counts(self) -> dict[str, int]:
+        """Return the number of items per status."""
+        rows = (
+            self._conn()
+            .execute("SELECT status, COUNT(*) FROM items GROUP BY status")
+            .fetchall()
+        )
+        return {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+    def results(self, task: str) -> dict[tuple[int, str], dict[str, Any]]:
+        """Return {(chunk_id, theme): result} for the completed items of a task."""
+        rows = (
+            self._conn()
+            .execute(
+                "SELECT chunk_id, theme, result FROM items WHERE task = ? AND status = ?",
+                (task, DONE),
+            )
+            .fetchall()
+        )
+        return {(c, th): json.loads(r) for c, th, r in rows}
+
+
+# task name -> function(client, payload) -> JSON-serializable result
+TASKS: dict[str, Callable[[OpenAI, dict[str, Any]], dict[str, Any]]] = {
+    "yes_no": lambda client, p: {
+        "answer": code_yes_no_for_theme(
+            client, p["text"], p["theme_definition"], codebook=p.get("codebook", "")
+        )
+    },
+    "yes_no_vote": lambda client, p: code_yes_no_vote(
+        client, p["text"], p["theme_definition"], codebook=p.get("codebook", "")
+    ),
+    "yes_no_cascade": lambda client, p: code_yes_no_cascade(
+        client, p["text"], p["theme_definition"], codebook=p.get("codebook", "")
+    ),
+    "nonverbal": lambda client, p: code_nonverbal_cues(client, p["text"]),
+    "translate": lambda client, p: {"english": translate_to_english(client, p["text"])},
+}
+
+
+def yes_no_items(
+    chunks: Iterable[tuple[int, str]],
+    theme_definitions: dict[str, str],
+    task: str = "yes_no",
+) -> list[WorkItem]:
+    """Work items for coding every chunk against every theme.
+
+    `task` is "yes_no", "yes_no_vote" (self-consistency voting) or
+    "yes_no_cascade" (fast model first, see `src/cascade.py`). Each payload
+    carries the whole codebook, the shared prompt prefix of every pair.
+    """
+    chunks = list(chunks)
+    codebook = codebook_block(theme_definitions.values())
+    return [
+        WorkItem(
+            task=task,
+            chunk_id=int(chunk_id),
+            theme=name,
+            payload={
+                "text": text,
+                "theme_definition": definition,
+                "codebook": codebook,
+            },
+        )
+        for name, definition in theme_definitions.items()
+        for chunk_id, text in chunks
+    ]
+
+
+def chunk_items(task: str, chunks: Iterable[tuple[int, str]]) -> list[WorkItem]:
+    """Work items for a per-chunk task such as "nonverbal" or "translate"."""
+    return [
+        WorkItem(task=task, chunk_id=int(chunk_id), payload={"text": text})
+        for chunk_id, text in chunks
+    ]
+
+
+def retry_delay(exc: BaseException, streak: int = 1) -> float | None:
+    """Seconds to back off after a rate-limit or timeout error, else None.
+
+    Uses the `Retry-After` (or `retry-after-ms`) header when the API sends
+    one, otherwise exponential backoff with jitter on the number of
+    consecutive throttled calls, `streak`, capped at one minute.
+    """
+    import openai
+
+    if isinstance(exc, openai.APIStatusError) and exc.status_code == 429:
+        headers = exc.response.headers
+        try:
+            if "retry-after-ms" in headers:
+                return float(headers["retry-after-ms"]) / 1000
+            if "retry-after" in headers:
+                return float(headers["retry-after"])
+        except ValueError:
+            pass  # an HTTP date; fall back to backoff
+    elif not isinstance(exc, (openai.APITimeoutError, TimeoutError)):
+        return None
+    return min(60.0, 2.0 ** min(streak, 6)) * random.uniform(0.5, 1.0)
+
+
+def default_worker_id() -> str:
+    """Return a worker id unique across hosts and processes."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def run_worker(
+    queue: WorkQueue,
+    client: OpenAI,
+    worker_id: str | None = None,
+    concurrency: int = 8,
+    batch_size: int = 16,
+    poll_interval: float = 5.0,
+    stop_when_empty: bool = True,
+) -> int:
+    """Lease items, run their task functions concurrently, write results.
+
+    Leases are renewed every third of `lease_seconds` while a batch is in
+    flight. Rate-limited or timed-out items are deferred (see `defer`) and
+    the worker holds off new requests until the backoff has passed. With
+    `stop_when_empty`, the worker exits once nothing is pending or leased;
+    otherwise it keeps polling every `poll_interval` seconds.
+
+    Returns the number of results this worker wrote.
+    """
+    worker_id = worker_id or default_worker_id()
+    in_flight: set[ItemKey] = set()
+    written = 0
+    throttled = 0  # consecutive rate-limited or timed-out calls
+    pause_until = 0.0
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def wait_for_backoff() -> None:
+        with lock:
+            delay = pause_until - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def beat() -> None:
+        while not stop.wait(queue.lease_seconds / 3):
+            with lock:
+                keys = list(in_flight)
+            if keys:
+                queue.heartbeat(worker_id, keys)
+
+    def run(item: WorkItem) -> None:
+        nonlocal written, throttled, pause_until
+        wait_for_backoff()
+        try:
+            result = TASKS[item.task](client, item.payload)
+        except Exception as exc:  # recorded on the item and retried
+            error = f"{type(exc).__name__}: {exc}"
+            with lock:
+                throttled += 1
+                delay = retry_delay(exc, throttled)
+                if delay is None:
+                    throttled -= 1
+                else:
+                    pause_until = max(pause_until, time.time() + delay)
+            if delay is None:
+                queue.fail(worker_id, item.key, error)
+            else:
+                queue.defer(worker_id, item.key, delay, error)
+            return
+        finally:
+            with lock:
+                in_flight.discard(item.key)
+        with lock:
+            throttled = 0
+        if queue.complete(item.key, result):
+            with lock:
+                written += 1
+
+    heartbeat = threading.Thread(target=beat, daemon=True)
+    heartbeat.start()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while True:
+                items = queue.lease(worker_id, batch_size)
+                if not items:
+                    counts = queue.counts()
+                    if stop_when_empty and counts[PENDING] + counts[LEASED] == 0:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                wait_for_backoff()
+                with lock:
+                    in_flight.update(i.key for i in items)
+                list(pool.map(run, items))
+    finally:
+        stop.set()
+        heartbeat.join()
+    return written
@@ -0,0 +1,80 @@
+"""Start-up checks for the `quali` command.
+
+Run with `python -m unittest discover tests` from the repository root.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import re
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# `quali --help` must stay instant: seconds spent importing src.cli
+IMPORT_BUDGET = 0.2
+HEAVY_MODULES = ("openai", "pandas", "polars", "numpy", "sklearn", "matplotlib", "tqdm")
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds of every module `module` pulls in.
+
+    Parsed from `python -X importtime` in a fresh interpreter.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+class ImportTimeTest(unittest.TestCase):
+    """`import src.cli` stays light and within the start-up budget."""
+
+    def test_no_heavy_modules(self) -> None:
+        """No heavy library is imported before a stage is chosen."""
+        loaded = import_times("src.cli")
+        heavy = sorted(m for m in HEAVY_MODULES if m in loaded)
+        self.assertEqual(heavy, [], "heavy modules imported at start-up")
+
+    def test_within_budget(self) -> None:
+        """Importing src.cli takes less than IMPORT_BUDGET seconds."""
+        seconds = import_times("src.cli")["src.cli"] / 1e6
+        self.assertLess(seconds, IMPORT_BUDGET)
+
+
+class MissingExamplesTest(unittest.TestCase):
+    """Without the stage scripts, `quali` fails with a clear message."""
+
+    def test_missing_examples_dir(self) -> None:
+        """A stage whose script is missing exits with a usage error."""
+        from src import cli
+
+        stderr = io.StringIO()
+        with (
+            mock.patch.object(cli, "EXAMPLES_DIR", ROOT / "no-such-dir"),
+            contextlib.redirect_stderr(stderr),
+            self.assertRaises(SystemExit) as exit_,
+        ):
+            cli.main(["translate"])
+        self.assertEqual(exit_.exception.code, 2)
+        self.assertIn("source checkout", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()